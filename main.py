@@ -5,12 +5,15 @@ from session_1.primitives.tools_chat import demonstrate_tools_chat
 from session_1.primitives.artisan_agent import demonstrate_artisan_agent
 from session_2.rag.rag_agent import demonstrate_rag_agent
 from session_2.rag.importer import main as importer_main
+from session_1.primitives.client_registry import warm_up_from_env
 
 def main():
     """
     Main function with menu to choose what demonstration to run.
     Shows different Azure OpenAI capabilities and LLM fundamentals.
     """
+    # Pre-connect to Azure OpenAI / Qdrant while the menu is shown (CLIENT_WARMUP=true).
+    warm_up_from_env(background=True)
     print("""
 ╔═════════════════════════════════════════════════════════════════════════════╗
 ║                                                                             ║
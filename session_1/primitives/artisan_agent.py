@@ -1,7 +1,11 @@
+import asyncio
 import os
 import json
 import time
-from session_1.primitives.shared_utils import create_azure_openai_client
+from session_1.primitives.async_core import run_tool_loop
+from session_1.primitives.client_registry import close_async_clients
+from session_1.primitives.shared_utils import create_async_azure_openai_client
+from session_1.primitives.tool_executor import CachedTool, ToolExecutor
 
 # Define artisan tools for building
 def use_measuring_tape(item: str, dimension: str = "all"):
@@ -223,9 +227,10 @@ artisan_tools = [
     }
 ]
 
-# Map function names to actual functions and emoticons
+# Map function names to actual functions and emoticons.
+# Measurements are pure lookups, so repeated ones are served from a cache.
 available_tools = {
-    "use_measuring_tape": use_measuring_tape,
+    "use_measuring_tape": CachedTool(use_measuring_tape, ttl=3600),
     "use_saw": use_saw,
     "use_drill": use_drill,
     "use_hammer": use_hammer,
@@ -297,7 +302,6 @@ def demonstrate_artisan_agent():
     print(f"\n🎯 Project: {selected_project['name']}")
     print(f"📝 Description: {selected_project['description']}\n")
     
-    client = create_azure_openai_client()
     deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4")
     
     # Initialize the artisan's context
@@ -312,86 +316,59 @@ def demonstrate_artisan_agent():
     
     print("🤔 Artisan is planning the build...\n")
     
-    try:
-        # Initial planning response
-        response = client.chat.completions.create(
-            model=deployment_name,
-            messages=messages,
-            tools=artisan_tools,
-            tool_choice="auto",
-            temperature=0.7
-        )
-        
-        response_message = response.choices[0].message
-        messages.append(response_message)
-        
-        # Process multiple rounds of tool usage
-        step_count = 0
-        # Adjust max steps based on complexity
-        max_steps = {"1": 6, "2": 8, "3": 10}[choice]
-        
-        while step_count < max_steps:
-            tool_calls = response_message.tool_calls
-            
-            if tool_calls:
-                print(f"\n📋 Step {step_count + 1}:")
-                
-                for tool_call in tool_calls:
-                    function_name = tool_call.function.name
-                    function_args = json.loads(tool_call.function.arguments)
-                    
-                    # Get emoticon for the tool
-                    tool_emoji = tool_emoticons.get(function_name, "🔧")
-                    tool_display_name = function_name.replace('use_', '').replace('_', ' ').title()
-                    
-                    print(f"   {tool_emoji} Using {tool_display_name}")
-                    print(f"      → {function_args}")
-                    
-                    # Execute the tool
-                    function_to_call = available_tools[function_name]
-                    function_response = function_to_call(**function_args)
-                    
-                    # Add tool response to messages
-                    messages.append({
-                        "tool_call_id": tool_call.id,
-                        "role": "tool",
-                        "name": function_name,
-                        "content": function_response
-                    })
-                
-                # Get next response
-                response = client.chat.completions.create(
-                    model=deployment_name,
-                    messages=messages,
-                    tools=artisan_tools,
-                    tool_choice="auto",
-                    temperature=0.7
-                )
-                
-                response_message = response.choices[0].message
-                messages.append(response_message)
-                
-                # If there's a text response, print it
-                if response_message.content:
-                    print(f"\n💭 Artisan: {response_message.content}")
-                
-                step_count += 1
-            else:
-                # No more tools to use, print final message
-                if response_message.content:
-                    print(f"\n✅ Artisan: {response_message.content}")
-                    print(f"\n📊 Total steps taken: {step_count}")
-                    usage = response.usage
-                    print(f"📊 Tokens - Input: {usage.prompt_tokens}, Output: {usage.completion_tokens}, Total: {usage.total_tokens}")
-                break
-                
-    except Exception as e:
-        print(f"Error: {e}")
+    # Adjust max steps based on complexity
+    max_steps = {"1": 6, "2": 8, "3": 10}[choice]
+    asyncio.run(_build(messages, deployment_name, max_steps))
     
     print("\n" + "="*60)
     print("🏠 The artisan has demonstrated the decision-making loop!")
     print("Notice how it planned the work and selected appropriate tools")
     print("="*60)
 
+def _print_step(step, turn):
+    print(f"\n📋 Step {step + 1}:")
+    for result in turn.results:
+        # Get emoticon for the tool
+        tool_emoji = tool_emoticons.get(result.name, "🔧")
+        tool_display_name = result.name.replace('use_', '').replace('_', ' ').title()
+        
+        source = "cached" if result.cached else f"{result.seconds:.2f}s"
+        print(f"   {tool_emoji} Using {tool_display_name} ({source})")
+        print(f"      → {result.arguments}")
+        if result.error:
+            print(f"      ⚠️ {result.error}")
+    print(f"   ⏱️  {turn.summary()}")
+
+def _print_thought(message):
+    # Text that comes along with further tool calls
+    if message.content and message.tool_calls:
+        print(f"\n💭 Artisan: {message.content}")
+
+async def _build(messages, deployment_name, max_steps):
+    """The decision-making loop: plan, use tools (independent ones at the same time), repeat."""
+    try:
+        result = await run_tool_loop(
+            create_async_azure_openai_client(),
+            deployment_name,
+            messages,
+            artisan_tools,
+            ToolExecutor(available_tools),
+            max_steps=max_steps,
+            tools_in_follow_up=True,
+            on_turn=_print_step,
+            on_reply=_print_thought,
+        )
+        if result.step_limit_reached:
+            print(f"\n⚠️ Artisan stopped at the {max_steps}-step limit: {result.content}")
+        elif result.content:
+            print(f"\n✅ Artisan: {result.content}")
+            print(f"\n📊 Total steps taken: {result.steps}")
+            usage = result.usage
+            print(f"📊 Tokens - Input: {usage['input_tokens']}, Output: {usage['output_tokens']}, Total: {usage['total_tokens']}")
+    except Exception as e:
+        print(f"Error: {e}")
+    finally:
+        await close_async_clients()
+
 if __name__ == "__main__":
-    demonstrate_artisan_agent()
\ No newline at end of file
+    demonstrate_artisan_agent()
@@ -0,0 +1,220 @@
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from session_1.primitives.history import ConversationHistory, llm_summarizer
+from session_1.primitives.shared_utils import (
+    StreamedReply,
+    create_async_azure_openai_client,
+    stream_chat_completion_async,
+    usage_dict,
+)
+from session_1.primitives.tool_executor import ToolExecutor, ToolTurn
+from session_1.primitives.tracing import span
+
+
+# Stands in for the answer when the step limit cut the loop off mid tool call:
+# an assistant message needs content or tool calls to be valid history.
+STEP_LIMIT_REPLY = "I stopped after {steps} tool round(s) without reaching a final answer."
+
+
+class ToolLoopResult(NamedTuple):
+    content: Optional[str]
+    usage: Dict[str, int]
+    steps: int
+    turns: List[ToolTurn]
+    # The model still wanted to call tools when max_steps ran out.
+    step_limit_reached: bool = False
+
+
+async def _complete(client, stream: bool, on_text, stage: str = "chat_completion", **request):
+    """One completion, traced as `stage`; returns (message, the StreamedReply or the response)."""
+    with span(stage) as s:
+        if stream:
+            reply = await stream_chat_completion_async(client, on_text=on_text, **request)
+            s.add_usage(reply.usage)
+            return reply.message, reply
+        response = await client.chat.completions.create(**request)
+        s.add_usage(usage_dict(response.usage))
+        return response.choices[0].message, response
+
+
+def _usage(result, turn_started: float) -> Dict[str, Any]:
+    if isinstance(result, StreamedReply):
+        return result.usage_with_timing(turn_started)
+    return usage_dict(result.usage)
+
+
+async def run_tool_loop(
+    client,
+    deployment_name: str,
+    messages: List[Any],
+    tools: List[Dict],
+    executor: ToolExecutor,
+    max_steps: int = 1,
+    temperature: float = 0.7,
+    tools_in_follow_up: bool = False,
+    on_turn: Optional[Callable[[int, ToolTurn], None]] = None,
+    on_reply: Optional[Callable[[Any], None]] = None,
+    stream: bool = False,
+    on_text: Optional[Callable[[str], None]] = None,
+) -> ToolLoopResult:
+    """Let the model call tools until it answers in text or `max_steps` tool rounds ran.
+
+    `messages` is extended in place with the assistant tool-call messages,
+    the tool results and the final assistant answer. Follow-up requests only
+    offer the tools again when `tools_in_follow_up` is set (the artisan loop);
+    the chat and RAG loops answer right after one round. `on_turn(step, turn)`
+    sees each round's tool results, `on_reply(message)` each follow-up reply.
+
+    With `stream=True` every completion is streamed: text deltas go to
+    `on_text` as they arrive, tool-call arguments are assembled from their
+    fragments, and the usage also carries the turn's time to first token
+    (counted from the user's message, tool rounds included), tokens/sec
+    and total latency.
+
+    If the model still calls tools after `max_steps` rounds, those calls are
+    dropped and the result has `step_limit_reached` set; without any text
+    from the model its content is STEP_LIMIT_REPLY.
+
+    Traced stages: tool_loop.turn (the whole call), tool_loop.first_completion,
+    tool_loop.tools and tool_loop.follow_up (each round).
+    """
+    with span("tool_loop.turn"):
+        turn_started = time.perf_counter()
+        message, result = await _complete(
+            client,
+            stream,
+            on_text,
+            "tool_loop.first_completion",
+            model=deployment_name,
+            messages=messages,
+            tools=tools,
+            tool_choice="auto",
+            temperature=temperature,
+        )
+        steps, turns = 0, []
+        while message.tool_calls and steps < max_steps:
+            messages.append(message)
+            with span("tool_loop.tools"):
+                turn = await executor.run_async(message.tool_calls)
+            turns.append(turn)
+            if on_turn:
+                on_turn(steps, turn)
+            messages.extend(turn.messages())
+            extra = {"tools": tools, "tool_choice": "auto"} if tools_in_follow_up else {}
+            message, result = await _complete(
+                client,
+                stream,
+                on_text,
+                "tool_loop.follow_up",
+                model=deployment_name,
+                messages=messages,
+                temperature=temperature,
+                **extra,
+            )
+            steps += 1
+            if on_reply:
+                on_reply(message)
+        # Tool calls left unanswered at the step limit are dropped so the history stays valid.
+        limited = bool(message.tool_calls)
+        content = message.content
+        if limited and not content:
+            content = STEP_LIMIT_REPLY.format(steps=steps)
+        messages.append({"role": "assistant", "content": content})
+        return ToolLoopResult(content, _usage(result, turn_started), steps, turns, limited)
+
+
+class ChatSession:
+    """A stateful conversation on the shared async client.
+
+    Sessions hold nothing but their history, so one event loop can run
+    many of them concurrently over the same connection pool. The history
+    is token-budgeted (see ConversationHistory.from_env): long sessions
+    level off at a fixed input cost instead of growing every turn.
+    """
+
+    def __init__(
+        self,
+        system_prompt: str,
+        deployment_name: str,
+        temperature: float = 0.7,
+        client=None,
+        stream: bool = False,
+        history: Optional[ConversationHistory] = None,
+    ):
+        self.client = client or create_async_azure_openai_client()
+        self.deployment_name = deployment_name
+        self.temperature = temperature
+        self.stream = stream
+        self.history = history or ConversationHistory.from_env(
+            system_prompt, summarizer=llm_summarizer(self.client, deployment_name)
+        )
+
+    @property
+    def messages(self) -> List[Any]:
+        return self.history.messages()
+
+    async def send(self, user_input: str, on_text=None):
+        """Returns (response_text, usage_info); the history is unchanged if the call fails.
+
+        Streaming sessions pass text deltas to `on_text` and add timing to the usage.
+        """
+        turn_started = time.perf_counter()
+        user_message = {"role": "user", "content": user_input}
+        messages = await self.history.prepare(user_message)
+        message, result = await _complete(
+            self.client,
+            self.stream,
+            on_text,
+            model=self.deployment_name,
+            messages=messages,
+            temperature=self.temperature,
+        )
+        self.history.commit([user_message, {"role": "assistant", "content": message.content}])
+        return message.content, _usage(result, turn_started)
+
+
+class ToolChatSession(ChatSession):
+    """A ChatSession whose turns may call tools (see run_tool_loop)."""
+
+    def __init__(
+        self,
+        system_prompt: str,
+        deployment_name: str,
+        tools: List[Dict],
+        executor: ToolExecutor,
+        temperature: float = 0.7,
+        max_steps: int = 1,
+        tools_in_follow_up: bool = False,
+        client=None,
+        stream: bool = False,
+        history: Optional[ConversationHistory] = None,
+    ):
+        super().__init__(system_prompt, deployment_name, temperature, client, stream, history)
+        self.tools = tools
+        self.executor = executor
+        self.max_steps = max_steps
+        self.tools_in_follow_up = tools_in_follow_up
+
+    async def send(self, user_input: str, on_turn=None, on_reply=None, on_text=None) -> ToolLoopResult:
+        """One user turn; the history is unchanged if a model call fails."""
+        user_message = {"role": "user", "content": user_input}
+        messages = await self.history.prepare(user_message)
+        start = len(messages) - 1
+        result = await run_tool_loop(
+            self.client,
+            self.deployment_name,
+            messages,
+            self.tools,
+            self.executor,
+            max_steps=self.max_steps,
+            temperature=self.temperature,
+            tools_in_follow_up=self.tools_in_follow_up,
+            on_turn=on_turn,
+            on_reply=on_reply,
+            stream=self.stream,
+            on_text=on_text,
+        )
+        # The user message, tool calls, tool results and the answer form one turn.
+        self.history.commit(messages[start:])
+        return result
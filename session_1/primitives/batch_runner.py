@@ -0,0 +1,346 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from session_1.primitives.async_core import ToolChatSession
+from session_1.primitives.client_registry import close_async_clients
+from session_1.primitives.rate_limiter import rate_limit_stats
+from session_1.primitives.shared_utils import async_single_chat_completion, create_async_azure_openai_client
+from session_1.primitives.tool_executor import ToolExecutor
+
+
+PROMPT_FIELDS = ("prompt", "input", "question", "body", "text")
+ID_FIELDS = ("id", "request_id")
+DEFAULT_SYSTEM_PROMPT = "You are a helpful assistant."
+RAG_SYSTEM_PROMPT = (
+    "You are a helpful assistant that answers using a retriever tool when helpful."
+    " When tool results are available, cite relevant snippets concisely."
+)
+
+
+def read_prompts(path: str, field: Optional[str], template: Optional[str]) -> Iterator[Tuple[int, str, str]]:
+    """Yield (index, id, prompt) for each JSONL record, reading the file lazily.
+
+    The prompt is `template` formatted with the record's fields, the given
+    `field`, or the first of PROMPT_FIELDS the record has. The id is the
+    record's "id" / "request_id", else "line-<n>".
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for index, line in enumerate(f):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {"prompt": record}
+            if template:
+                prompt = template.format(**record)
+            elif field:
+                prompt = record[field]
+            else:
+                prompt = next((record[k] for k in PROMPT_FIELDS if k in record), None)
+                if prompt is None:
+                    raise ValueError(f"{path}:{index + 1}: no prompt field (tried {', '.join(PROMPT_FIELDS)})")
+            record_id = next((str(record[k]) for k in ID_FIELDS if k in record), f"line-{index + 1}")
+            yield index, record_id, str(prompt)
+
+
+def completed_ids(path: str) -> Set[str]:
+    """Ids already answered without error in `path`; a torn last line is cut off."""
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            # The previous run died mid-write: drop the partial record.
+            f.truncate(data.rfind(b"\n") + 1)
+            data = data[: data.rfind(b"\n") + 1]
+    for line in data.splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if not record.get("error"):
+            done.add(record["id"])
+    return done
+
+
+def compact_results(path: str):
+    """Keep only the last record per id, so a retried prompt's old error record goes away.
+
+    Records keep their positions; the file is replaced atomically, and left
+    alone when no id appears twice.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [line for line in f if line.strip()]
+    ids = []
+    for line in lines:
+        try:
+            ids.append(json.loads(line).get("id"))
+        except json.JSONDecodeError:
+            ids.append(None)
+    last = {record_id: n for n, record_id in enumerate(ids) if record_id is not None}
+    if len(last) == sum(record_id is not None for record_id in ids):
+        return
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.writelines(line for n, line in enumerate(lines) if ids[n] is None or last[ids[n]] == n)
+    os.replace(tmp_path, path)
+
+
+class BatchPipeline:
+    """Answers one prompt: a single chat completion ("chat") or a RAG tool turn ("rag")."""
+
+    def __init__(self, kind: str, system_prompt: Optional[str] = None, temperature: float = 0.0, max_tokens: int = 500):
+        self.kind = kind
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        if kind == "chat":
+            self.deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4")
+            self.system_prompt = system_prompt or DEFAULT_SYSTEM_PROMPT
+        else:
+            # The RAG stack is only imported when it is used.
+            from session_2.rag.rag_agent import retrieve_passages_async, tools
+
+            self.deployment_name = os.getenv("AZURE_DEPLOYMENT_NAME") or os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4")
+            self.system_prompt = system_prompt or RAG_SYSTEM_PROMPT
+            self.tools = tools
+            self.functions = {"retrieve_passages": retrieve_passages_async}
+
+    async def run(self, prompt: str) -> Dict[str, Any]:
+        if self.kind == "chat":
+            text, usage = await async_single_chat_completion(
+                create_async_azure_openai_client(),
+                self.deployment_name,
+                self.system_prompt,
+                prompt,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                raise_errors=True,
+            )
+            return {"response": text, "usage": usage}
+        # One fresh session per prompt: batch prompts are independent.
+        session = ToolChatSession(
+            self.system_prompt,
+            self.deployment_name,
+            self.tools,
+            ToolExecutor(self.functions),
+            temperature=self.temperature,
+        )
+        result = await session.send(prompt)
+        calls = [{"name": r.name, "arguments": r.arguments, "error": r.error} for t in result.turns for r in t.results]
+        return {"response": result.content, "usage": result.usage, "tool_calls": calls}
+
+
+class _Writer:
+    """Appends result records to the output JSONL, in input order or as they finish."""
+
+    def __init__(self, path: str, ordered: bool):
+        self.f = open(path, "a", encoding="utf-8")
+        self.ordered = ordered
+        self.pending: Dict[int, Optional[Dict[str, Any]]] = {}
+        self.next_position = 0
+
+    def _write(self, record: Dict[str, Any]):
+        self.f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.f.flush()
+
+    def add(self, position: int, record: Optional[Dict[str, Any]]) -> int:
+        """Hand over the result for input `position` (None: skipped); returns how many positions got flushed."""
+        if not self.ordered:
+            if record is not None:
+                self._write(record)
+            return 1
+        self.pending[position] = record
+        flushed = 0
+        while self.next_position in self.pending:
+            record = self.pending.pop(self.next_position)
+            if record is not None:
+                self._write(record)
+            self.next_position += 1
+            flushed += 1
+        return flushed
+
+    def close(self):
+        self.f.close()
+
+
+async def run_batch(
+    input_path: str,
+    output_path: str,
+    pipeline: BatchPipeline,
+    concurrency: int = 8,
+    ordered: bool = True,
+    field: Optional[str] = None,
+    template: Optional[str] = None,
+    limit: Optional[int] = None,
+    resume: bool = True,
+) -> Dict[str, Any]:
+    """Stream the prompts in `input_path` through `pipeline`, writing one JSONL record per answer.
+
+    At most `concurrency` prompts are in flight, and reading stays at most
+    4 x `concurrency` prompts ahead of what has been written, so memory
+    stays flat for any input size even when one slow prompt holds up
+    ordered output. With `resume`, ids already answered in `output_path`
+    are skipped and failed ones are retried; once the run ends the retried
+    ids' old error records are dropped, leaving one record per id.
+    """
+    concurrency = max(1, concurrency)
+    if not resume and os.path.exists(output_path):
+        os.remove(output_path)
+    done = completed_ids(output_path)
+    writer = _Writer(output_path, ordered)
+    window = asyncio.Semaphore(concurrency * 4)
+
+    def flush(position: int, record: Optional[Dict[str, Any]]):
+        for _ in range(writer.add(position, record)):
+            window.release()
+
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency)
+    latencies: List[float] = []
+    totals = {"submitted": 0, "ok": 0, "errors": 0, "skipped": 0, "cached": 0, "input_tokens": 0, "output_tokens": 0}
+
+    async def produce():
+        position = 0
+        for index, record_id, prompt in read_prompts(input_path, field, template):
+            if limit is not None and totals["submitted"] >= limit:
+                break
+            await window.acquire()
+            if record_id in done:
+                totals["skipped"] += 1
+                flush(position, None)
+            else:
+                totals["submitted"] += 1
+                await queue.put((position, index, record_id, prompt))
+            position += 1
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def work():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            position, index, record_id, prompt = item
+            started = time.perf_counter()
+            record: Dict[str, Any] = {"id": record_id, "index": index}
+            try:
+                record.update(await pipeline.run(prompt))
+                record["error"] = None
+            except Exception as e:
+                record.update({"response": None, "error": f"{type(e).__name__}: {e}"})
+            elapsed = time.perf_counter() - started
+            record["latency_ms"] = round(elapsed * 1000, 1)
+            if record["error"]:
+                totals["errors"] += 1
+            else:
+                totals["ok"] += 1
+                latencies.append(elapsed * 1000)
+                usage = record.get("usage") or {}
+                totals["cached"] += bool(usage.get("cached"))
+                totals["input_tokens"] += usage.get("input_tokens", 0)
+                totals["output_tokens"] += usage.get("output_tokens", 0)
+            flush(position, record)
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(produce(), *(work() for _ in range(concurrency)))
+    finally:
+        writer.close()
+        compact_results(output_path)
+        await close_async_clients()
+    wall = time.perf_counter() - started
+
+    ordered_latencies = sorted(latencies)
+
+    def pct(q: float) -> Optional[float]:
+        if not ordered_latencies:
+            return None
+        return round(ordered_latencies[min(len(ordered_latencies) - 1, int(round(q * (len(ordered_latencies) - 1))))], 1)
+
+    return {
+        **totals,
+        "wall_seconds": round(wall, 2),
+        "prompts_per_second": round(totals["submitted"] / wall, 2) if wall else 0.0,
+        "output_tokens_per_second": round(totals["output_tokens"] / wall, 1) if wall else 0.0,
+        "latency_ms": {
+            "p50": round(statistics.median(ordered_latencies), 1) if ordered_latencies else None,
+            "p95": pct(0.95),
+            "p99": pct(0.99),
+            "max": round(ordered_latencies[-1], 1) if ordered_latencies else None,
+        },
+        "rate_limits": rate_limit_stats(),
+    }
+
+
+def print_summary(summary: Dict[str, Any]):
+    latency = summary["latency_ms"]
+    print("\n📦 Batch summary")
+    print(
+        f"   prompts: {summary['submitted']} run, {summary['ok']} ok, {summary['errors']} failed, "
+        f"{summary['skipped']} already done, {summary['cached']} from the response cache"
+    )
+    print(
+        f"   throughput: {summary['prompts_per_second']:.2f} prompts/s, "
+        f"{summary['output_tokens_per_second']:.1f} output tokens/s over {summary['wall_seconds']:.1f}s"
+    )
+    print(f"   tokens: {summary['input_tokens']} input, {summary['output_tokens']} output")
+    if latency["p50"] is not None:
+        print(
+            f"   latency: p50 {latency['p50']:.0f} ms, p95 {latency['p95']:.0f} ms, "
+            f"p99 {latency['p99']:.0f} ms, max {latency['max']:.0f} ms"
+        )
+    for deployment, limits in summary.get("rate_limits", {}).items():
+        print(
+            f"   {deployment}: {limits['requests']} requests, {limits['throttled']} throttled (429), "
+            f"{limits['retries']} retries, {limits['waited_seconds']:.1f}s spent waiting (summed over callers)"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a JSONL file of prompts through the chat or RAG pipeline")
+    parser.add_argument("input", type=str, help="JSONL file, one prompt record per line")
+    parser.add_argument("-o", "--output", type=str, default=None, help="Results JSONL (default: <input>.results.jsonl)")
+    parser.add_argument("--pipeline", choices=["chat", "rag"], default="chat")
+    parser.add_argument("--concurrency", type=int, default=8, help="Prompts in flight at once")
+    parser.add_argument("--unordered", action="store_true", help="Write results as they finish instead of in input order")
+    parser.add_argument("--field", type=str, default=None, help=f"Prompt field (default: first of {', '.join(PROMPT_FIELDS)})")
+    parser.add_argument("--template", type=str, default=None, help='Prompt template over the record, e.g. "{title}\\n\\n{body}"')
+    parser.add_argument("--system", type=str, default=None, help="System prompt")
+    parser.add_argument("--temperature", type=float, default=0.0)
+    parser.add_argument("--max-tokens", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=None, help="Run at most this many prompts")
+    parser.add_argument("--restart", action="store_true", help="Discard existing results instead of resuming")
+    parser.add_argument("--summary-json", type=str, default=None, help="Also write the summary to this file")
+    args = parser.parse_args()
+
+    output = args.output or os.path.splitext(args.input)[0] + ".results.jsonl"
+    pipeline = BatchPipeline(args.pipeline, args.system, args.temperature, args.max_tokens)
+    summary = asyncio.run(
+        run_batch(
+            args.input,
+            output,
+            pipeline,
+            concurrency=args.concurrency,
+            ordered=not args.unordered,
+            field=args.field,
+            template=args.template.replace("\\n", "\n") if args.template else None,
+            limit=args.limit,
+            resume=not args.restart,
+        )
+    )
+    print(f"Results: {output}")
+    print_summary(summary)
+    if args.summary_json:
+        with open(args.summary_json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
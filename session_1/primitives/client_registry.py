@@ -0,0 +1,231 @@
+import asyncio
+import atexit
+import os
+import threading
+import weakref
+from typing import Dict, Optional, Tuple
+
+import httpx
+from openai import AsyncAzureOpenAI, AzureOpenAI
+from qdrant_client import AsyncQdrantClient, QdrantClient
+
+from session_1.primitives.rate_limiter import AsyncRateLimitedTransport, RateLimitedTransport
+
+
+# Connection pool limits for every HTTP client handed out here.
+DEFAULT_MAX_CONNECTIONS = 20
+DEFAULT_MAX_KEEPALIVE = 10
+DEFAULT_KEEPALIVE_EXPIRY = 60.0
+DEFAULT_TIMEOUT = 60.0
+
+_lock = threading.Lock()
+_openai_clients: Dict[Tuple, AzureOpenAI] = {}
+_qdrant_clients: Dict[Tuple, QdrantClient] = {}
+# Async clients hold connections bound to one event loop, so they are kept per loop.
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple, object]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def pool_limits() -> httpx.Limits:
+    """Pool limits from HTTP_MAX_CONNECTIONS, HTTP_MAX_KEEPALIVE and HTTP_KEEPALIVE_EXPIRY."""
+    return httpx.Limits(
+        max_connections=int(os.getenv("HTTP_MAX_CONNECTIONS", DEFAULT_MAX_CONNECTIONS)),
+        max_keepalive_connections=int(os.getenv("HTTP_MAX_KEEPALIVE", DEFAULT_MAX_KEEPALIVE)),
+        keepalive_expiry=float(os.getenv("HTTP_KEEPALIVE_EXPIRY", DEFAULT_KEEPALIVE_EXPIRY)),
+    )
+
+
+def _timeout() -> float:
+    return float(os.getenv("HTTP_TIMEOUT", DEFAULT_TIMEOUT))
+
+
+def _openai_settings() -> Tuple[Optional[str], str, Optional[str]]:
+    return (
+        os.getenv("AZURE_OPENAI_ENDPOINT"),
+        os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview"),
+        os.getenv("AZURE_OPENAI_API_KEY"),
+    )
+
+
+def get_openai_client() -> AzureOpenAI:
+    """The process-wide Azure OpenAI client for the current AZURE_OPENAI_* settings.
+
+    It owns one pooled, keep-alive httpx client, so repeated calls reuse
+    TCP/TLS connections instead of handshaking again. Its transport paces
+    requests per deployment and retries throttled ones (see rate_limiter),
+    so the SDK's own retries are switched off.
+    """
+    key = _openai_settings()
+    client = _openai_clients.get(key)
+    if client is None:
+        with _lock:
+            client = _openai_clients.get(key)
+            if client is None:
+                endpoint, api_version, api_key = key
+                client = AzureOpenAI(
+                    api_key=api_key,
+                    api_version=api_version,
+                    azure_endpoint=endpoint,
+                    max_retries=0,
+                    http_client=httpx.Client(transport=RateLimitedTransport(limits=pool_limits()), timeout=_timeout()),
+                )
+                _openai_clients[key] = client
+    return client
+
+
+def get_qdrant_client(url: str, api_key: Optional[str] = None, prefer_grpc: bool = False) -> QdrantClient:
+    """The process-wide QdrantClient for `url` (":memory:" is one shared in-process instance).
+
+    REST clients get the same pool limits as the OpenAI client; qdrant-client
+    would otherwise disable keep-alive for localhost.
+    """
+    key = (url, api_key, prefer_grpc)
+    client = _qdrant_clients.get(key)
+    if client is None:
+        with _lock:
+            client = _qdrant_clients.get(key)
+            if client is None:
+                if url == ":memory:":
+                    client = QdrantClient(location=":memory:")
+                else:
+                    client = QdrantClient(
+                        url=url,
+                        api_key=api_key,
+                        prefer_grpc=prefer_grpc,
+                        timeout=int(_timeout()),
+                        limits=pool_limits(),
+                    )
+                _qdrant_clients[key] = client
+    return client
+
+
+def _loop_clients() -> Dict[Tuple, object]:
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.get(loop)
+        if clients is None:
+            clients = _async_clients[loop] = {}
+        return clients
+
+
+def get_async_openai_client() -> AsyncAzureOpenAI:
+    """Like get_openai_client(), for the running event loop."""
+    clients = _loop_clients()
+    key = ("openai", *_openai_settings())
+    client = clients.get(key)
+    if client is None:
+        _, endpoint, api_version, api_key = key
+        client = clients[key] = AsyncAzureOpenAI(
+            api_key=api_key,
+            api_version=api_version,
+            azure_endpoint=endpoint,
+            max_retries=0,
+            http_client=httpx.AsyncClient(transport=AsyncRateLimitedTransport(limits=pool_limits()), timeout=_timeout()),
+        )
+    return client
+
+
+def get_async_qdrant_client(url: str, api_key: Optional[str] = None, prefer_grpc: bool = False) -> AsyncQdrantClient:
+    """Like get_qdrant_client(), for the running event loop (remote URLs only)."""
+    clients = _loop_clients()
+    key = ("qdrant", url, api_key, prefer_grpc)
+    client = clients.get(key)
+    if client is None:
+        client = clients[key] = AsyncQdrantClient(
+            url=url,
+            api_key=api_key,
+            prefer_grpc=prefer_grpc,
+            timeout=int(_timeout()),
+            limits=pool_limits(),
+        )
+    return client
+
+
+async def close_async_clients():
+    """Close the running loop's async clients; call before the loop ends."""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        clients = _async_clients.pop(loop, {})
+    for client in clients.values():
+        try:
+            await client.close()
+        except Exception:
+            pass
+
+
+def warm_up(openai: bool = True, qdrant_url: Optional[str] = None) -> Dict[str, str]:
+    """Open connections ahead of the first real request.
+
+    Makes one cheap call per client (list models / list collections) so the
+    TCP and TLS handshakes are paid at startup. Failures are reported, not
+    raised: warm-up must never stop an app from starting.
+    """
+    status: Dict[str, str] = {}
+    if openai:
+        try:
+            get_openai_client().models.list()
+            status["openai"] = "ok"
+        except Exception as e:
+            status["openai"] = f"failed: {e}"
+    if qdrant_url and qdrant_url.startswith(("http://", "https://")):
+        try:
+            get_qdrant_client(qdrant_url, os.getenv("QDRANT_API_KEY")).get_collections()
+            status["qdrant"] = "ok"
+        except Exception as e:
+            status["qdrant"] = f"failed: {e}"
+    return status
+
+
+async def warm_up_async(openai: bool = True, qdrant_url: Optional[str] = None) -> Dict[str, str]:
+    """warm_up() for the running event loop's async clients."""
+    status: Dict[str, str] = {}
+    if openai:
+        try:
+            await get_async_openai_client().models.list()
+            status["openai"] = "ok"
+        except Exception as e:
+            status["openai"] = f"failed: {e}"
+    if qdrant_url and qdrant_url.startswith(("http://", "https://")):
+        try:
+            await get_async_qdrant_client(qdrant_url, os.getenv("QDRANT_API_KEY")).get_collections()
+            status["qdrant"] = "ok"
+        except Exception as e:
+            status["qdrant"] = f"failed: {e}"
+    return status
+
+
+def _warm_up_enabled() -> bool:
+    return os.getenv("CLIENT_WARMUP", "").lower() in ("1", "true", "yes")
+
+
+def warm_up_from_env(background: bool = False):
+    """Warm up if CLIENT_WARMUP is set, for the configured Azure endpoint and
+    VECTOR_STORE_URL / QDRANT_URL. `background=True` returns immediately."""
+    if not _warm_up_enabled():
+        return
+    qdrant_url = os.getenv("VECTOR_STORE_URL") or os.getenv("QDRANT_URL")
+    if background:
+        threading.Thread(target=warm_up, kwargs={"qdrant_url": qdrant_url}, daemon=True).start()
+    else:
+        warm_up(qdrant_url=qdrant_url)
+
+
+async def warm_up_from_env_async():
+    """warm_up_from_env() for the running event loop's async clients."""
+    if _warm_up_enabled():
+        await warm_up_async(qdrant_url=os.getenv("VECTOR_STORE_URL") or os.getenv("QDRANT_URL"))
+
+
+def close_clients():
+    with _lock:
+        for client in list(_openai_clients.values()) + list(_qdrant_clients.values()):
+            try:
+                client.close()
+            except Exception:
+                pass
+        _openai_clients.clear()
+        _qdrant_clients.clear()
+
+
+atexit.register(close_clients)
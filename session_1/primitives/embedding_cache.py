@@ -0,0 +1,149 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional
+
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "embeddings.sqlite")
+DEFAULT_MAX_ENTRIES = 50000
+# SQLite caps the number of bound parameters per statement.
+_SQL_BATCH = 500
+
+
+def _text_hash(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    """Persistent embedding cache backed by SQLite.
+
+    Rows are keyed by (deployment, dimensions, sha256(text)); vectors are stored
+    as packed float32 blobs. Once more than `max_entries` rows exist, the least
+    recently used ones are evicted.
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                deployment TEXT NOT NULL,
+                dimensions INTEGER NOT NULL,
+                text_hash BLOB NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (deployment, dimensions, text_hash)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_lru ON embeddings(last_used)")
+        self._conn.commit()
+        self._size = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def get_many(self, deployment: str, dimensions: Optional[int], texts: List[str]) -> Dict[int, List[float]]:
+        """Return {position in `texts`: vector} for every text already cached."""
+        dims = dimensions or 0
+        positions: Dict[bytes, List[int]] = {}
+        for i, text in enumerate(texts):
+            positions.setdefault(_text_hash(text), []).append(i)
+        hashes = list(positions)
+        found: Dict[int, List[float]] = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(hashes), _SQL_BATCH):
+                part = hashes[start : start + _SQL_BATCH]
+                marks = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE deployment = ? AND dimensions = ? AND text_hash IN ({marks})",
+                    (deployment, dims, *part),
+                ).fetchall()
+                for text_hash, blob in rows:
+                    vector = array("f")
+                    vector.frombytes(blob)
+                    for i in positions[text_hash]:
+                        found[i] = vector.tolist()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE deployment = ? AND dimensions = ? AND text_hash = ?",
+                    [(now, deployment, dims, text_hash) for text_hash, _ in rows],
+                )
+            self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(texts) - len(found)
+        return found
+
+    def put_many(self, deployment: str, dimensions: Optional[int], texts: List[str], vectors: List[List[float]]):
+        dims = dimensions or 0
+        now = time.time()
+        rows = [
+            (deployment, dims, _text_hash(text), array("f", vector).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany("INSERT OR IGNORE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows)
+            self._size += self._conn.total_changes - before
+            if self._size > self.max_entries:
+                self._evict(self._size - self.max_entries)
+            self._conn.commit()
+
+    def _evict(self, count: int):
+        # Evict a little extra so we don't run a DELETE on every insert at capacity.
+        count += self.max_entries // 20
+        cur = self._conn.execute(
+            "DELETE FROM embeddings WHERE (deployment, dimensions, text_hash) IN "
+            "(SELECT deployment, dimensions, text_hash FROM embeddings ORDER BY last_used LIMIT ?)",
+            (count,),
+        )
+        self._size -= cur.rowcount
+        self.evictions += cur.rowcount
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": self._size,
+            "evictions": self.evictions,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._size = 0
+
+
+_cache: Optional[EmbeddingCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Process-wide cache configured from the environment.
+
+    EMBEDDING_CACHE_PATH sets the SQLite file (empty string disables caching);
+    EMBEDDING_CACHE_MAX_ENTRIES bounds its size.
+    """
+    global _cache
+    path = os.getenv("EMBEDDING_CACHE_PATH", DEFAULT_CACHE_PATH)
+    if not path:
+        return None
+    with _cache_lock:
+        if _cache is None or _cache.path != path:
+            max_entries = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES))
+            _cache = EmbeddingCache(path, max_entries=max_entries)
+        return _cache
@@ -0,0 +1,307 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from session_1.primitives.tokens import estimate_tokens
+
+
+# Defaults of the knobs POST /_fake/config changes (see FakeAzureServer.configure).
+DEFAULT_CONFIG: Dict[str, Any] = {
+    # Seconds before a completion's first byte / an embedding response.
+    "chat_latency": 0.05,
+    "embedding_latency": 0.01,
+    # Streamed completions send their tokens at this rate (0: all at once).
+    "tokens_per_second": 0.0,
+    "completion_tokens": 32,
+    "embedding_dim": 1536,
+    # Tool rounds to play when a request offers tools: a list of rounds, each
+    # a list of {"name", "arguments"} calls. The string "{user}" in an
+    # argument is replaced by the last user message.
+    "tool_script": [],
+}
+_WORD = re.compile(r"\w+")
+
+
+def _estimate_tokens(value: Any) -> int:
+    return estimate_tokens(json.dumps(value))
+
+
+class _FakeState:
+    def __init__(self, config: Dict[str, Any]):
+        self.config = {**DEFAULT_CONFIG, **config}
+        self.counts: Dict[str, int] = {"chat": 0, "embeddings": 0, "tool_rounds": 0}
+        self.lock = threading.Lock()
+        self._word_vectors: Dict[str, np.ndarray] = {}
+
+    def count(self, kind: str):
+        with self.lock:
+            self.counts[kind] += 1
+
+    def embed(self, text: str) -> List[float]:
+        """Bag-of-words vector: texts sharing words are close, so retrieval results mean something."""
+        dim = self.config["embedding_dim"]
+        vec = np.zeros(dim, dtype=np.float32)
+        for word in _WORD.findall(text.casefold()):
+            word_vec = self._word_vectors.get(word)
+            if word_vec is None or len(word_vec) != dim:
+                seed = int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "little")
+                word_vec = self._word_vectors[word] = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+            vec += word_vec
+        norm = float(np.linalg.norm(vec))
+        return (vec / norm if norm else vec + 1 / np.sqrt(dim)).round(6).tolist()
+
+    def reply(self, request: Dict) -> Dict:
+        """The scripted assistant message for a chat request."""
+        messages = request.get("messages") or []
+        user = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+        # Tool rounds already played since the user's message.
+        played = 0
+        for m in reversed(messages):
+            if m.get("role") == "user":
+                break
+            if m.get("role") == "assistant" and m.get("tool_calls"):
+                played += 1
+        script = self.config["tool_script"]
+        if request.get("tools") and played < len(script):
+            self.count("tool_rounds")
+            calls = []
+            for i, call in enumerate(script[played]):
+                arguments = {
+                    k: v.replace("{user}", user) if isinstance(v, str) else v for k, v in call.get("arguments", {}).items()
+                }
+                calls.append(
+                    {
+                        "id": f"call_{played}_{i}",
+                        "type": "function",
+                        "function": {"name": call["name"], "arguments": json.dumps(arguments)},
+                    }
+                )
+            return {"role": "assistant", "content": None, "tool_calls": calls}
+        words = " ".join(f"w{i % 97}" for i in range(self.config["completion_tokens"]))
+        return {"role": "assistant", "content": words}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body leave in one segment: small separate writes would
+    # add Nagle/delayed-ACK stalls (~40 ms) to every response.
+    disable_nagle_algorithm = True
+    wbufsize = 1 << 16
+    state: _FakeState
+
+    def log_message(self, *args):
+        pass
+
+    def _json(self, obj: Any, status: int = 200):
+        body = json.dumps(obj).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.startswith("/_fake/stats"):
+            with self.state.lock:
+                return self._json(dict(self.state.counts))
+        self._json({"error": {"message": f"Unknown path {self.path}"}}, 404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.path.startswith("/_fake/config"):
+            reset = request.pop("reset_counts", False)
+            with self.state.lock:
+                self.state.config.update(request)
+                if reset:
+                    self.state.counts = dict.fromkeys(self.state.counts, 0)
+            return self._json(self.state.config)
+        if "/chat/completions" in self.path:
+            return self._chat(request)
+        if "/embeddings" in self.path:
+            return self._embeddings(request)
+        self._json({"error": {"message": f"Unknown path {self.path}"}}, 404)
+
+    def _embeddings(self, request: Dict):
+        self.state.count("embeddings")
+        time.sleep(self.state.config["embedding_latency"])
+        inputs = request.get("input") or []
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        tokens = sum(_estimate_tokens(text) for text in inputs)
+        self._json(
+            {
+                "object": "list",
+                "model": request.get("model", "fake"),
+                "data": [{"object": "embedding", "index": i, "embedding": self.state.embed(t)} for i, t in enumerate(inputs)],
+                "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+            }
+        )
+
+    def _chat(self, request: Dict):
+        self.state.count("chat")
+        time.sleep(self.state.config["chat_latency"])
+        message = self.state.reply(request)
+        prompt = _estimate_tokens(request.get("messages")) + (_estimate_tokens(request["tools"]) if request.get("tools") else 0)
+        completion = _estimate_tokens(message["tool_calls"]) if message.get("tool_calls") else self.state.config["completion_tokens"]
+        usage = {"prompt_tokens": prompt, "completion_tokens": completion, "total_tokens": prompt + completion}
+        if request.get("stream"):
+            return self._stream(message, usage, request)
+        self._json(
+            {
+                "id": "fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "fake"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": "tool_calls" if message.get("tool_calls") else "stop",
+                        "message": message,
+                    }
+                ],
+                "usage": usage,
+            }
+        )
+
+    def _stream(self, message: Dict, usage: Dict, request: Dict):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        base = {"id": "fake", "object": "chat.completion.chunk", "created": int(time.time()), "model": request.get("model", "fake")}
+        rate = self.state.config["tokens_per_second"]
+
+        def event(data: Any):
+            line = ("data: " + (data if isinstance(data, str) else json.dumps(data)) + "\n\n").encode()
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+            self.wfile.flush()
+
+        def delta(d: Dict, finish: Optional[str] = None):
+            event({**base, "choices": [{"index": 0, "delta": d, "finish_reason": finish}]})
+
+        if message.get("tool_calls"):
+            for i, call in enumerate(message["tool_calls"]):
+                head = {"index": i, "id": call["id"], "type": "function", "function": {"name": call["function"]["name"], "arguments": ""}}
+                delta({"role": "assistant", "tool_calls": [head]})
+                delta({"tool_calls": [{"index": i, "function": {"arguments": call["function"]["arguments"]}}]})
+            delta({}, "tool_calls")
+        else:
+            delta({"role": "assistant", "content": ""})
+            for word in message["content"].split(" "):
+                if rate:
+                    time.sleep(1 / rate)
+                delta({"content": word + " "})
+            delta({}, "stop")
+        if (request.get("stream_options") or {}).get("include_usage"):
+            event({**base, "choices": [], "usage": usage})
+        event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+def serve(port: int = 0, config: Optional[Dict[str, Any]] = None, ready=None):
+    """Serve the fake endpoints on 127.0.0.1:`port` until killed; the bound port goes to `ready`."""
+    handler = type("Handler", (_Handler,), {"state": _FakeState(config or {})})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    if ready is not None:
+        ready.send(server.server_address[1])
+    server.serve_forever()
+
+
+class FakeAzureServer:
+    """A local stand-in for the Azure OpenAI chat and embeddings endpoints.
+
+    It runs in its own process, so encoding responses does not compete
+    for the GIL with the code being measured. Completions are scripted:
+    requests that offer tools get the next round of `tool_script`, anything
+    else a fixed-length text answer; embeddings are deterministic
+    bag-of-words vectors. Usage counts use the ~4 characters per token
+    estimate. Use as a context manager; `env()` holds the AZURE_OPENAI_*
+    settings that point the clients at it.
+    """
+
+    def __init__(self, **config):
+        self.config = {**DEFAULT_CONFIG, **config}
+        self.port: Optional[int] = None
+        self._process: Optional[multiprocessing.Process] = None
+
+    @property
+    def endpoint(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self) -> "FakeAzureServer":
+        receiver, sender = multiprocessing.Pipe(duplex=False)
+        self._process = multiprocessing.Process(target=serve, args=(0, self.config, sender), daemon=True)
+        self._process.start()
+        if not receiver.poll(30):
+            self.stop()
+            raise RuntimeError("Fake Azure OpenAI server did not start")
+        self.port = receiver.recv()
+        return self
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
+
+    def __enter__(self) -> "FakeAzureServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def configure(self, reset_counts: bool = False, **changes):
+        """Change latency, token counts or the tool script of the running server."""
+        self.config.update(changes)
+        httpx.post(f"{self.endpoint}/_fake/config", json={**changes, "reset_counts": reset_counts}).raise_for_status()
+
+    def stats(self) -> Dict[str, int]:
+        """Requests served per kind (chat, embeddings) and tool rounds played."""
+        return httpx.get(f"{self.endpoint}/_fake/stats").json()
+
+    def env(self) -> Dict[str, str]:
+        return {
+            "AZURE_OPENAI_ENDPOINT": self.endpoint,
+            "AZURE_OPENAI_API_KEY": "fake",
+            "AZURE_OPENAI_API_VERSION": "2024-02-15-preview",
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve fake Azure OpenAI chat/embeddings endpoints for offline runs")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--chat-latency", type=float, default=DEFAULT_CONFIG["chat_latency"], help="Seconds per completion")
+    parser.add_argument("--embedding-latency", type=float, default=DEFAULT_CONFIG["embedding_latency"])
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Streaming pace (0: all at once)")
+    parser.add_argument("--completion-tokens", type=int, default=DEFAULT_CONFIG["completion_tokens"])
+    parser.add_argument("--tool-script", type=str, default=None, help="JSON file with the tool rounds to play")
+    args = parser.parse_args()
+    config = {
+        "chat_latency": args.chat_latency,
+        "embedding_latency": args.embedding_latency,
+        "tokens_per_second": args.tokens_per_second,
+        "completion_tokens": args.completion_tokens,
+    }
+    if args.tool_script:
+        with open(args.tool_script, "r", encoding="utf-8") as f:
+            config["tool_script"] = json.load(f)
+    print(f"Fake Azure OpenAI on http://127.0.0.1:{args.port} (AZURE_OPENAI_ENDPOINT); Ctrl+C to stop")
+    try:
+        serve(args.port, config)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
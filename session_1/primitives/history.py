@@ -0,0 +1,203 @@
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from session_1.primitives.shared_utils import usage_dict
+from session_1.primitives.tokens import estimate_tokens
+from session_1.primitives.tracing import span
+
+
+DEFAULT_HISTORY_TOKEN_BUDGET = 4000
+DEFAULT_SUMMARY_TOKENS = 300
+# Role, separators and the like cost a few tokens per message on top of the content.
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+logger = logging.getLogger(__name__)
+
+# (previous summary or None, messages being folded) -> updated summary
+Summarizer = Callable[[Optional[str], List[Any]], Awaitable[str]]
+
+
+def _field(message, name: str):
+    return message.get(name) if isinstance(message, dict) else getattr(message, name, None)
+
+
+def message_tokens(message) -> int:
+    """Estimated prompt tokens of one chat message, tool calls included."""
+    tokens = MESSAGE_OVERHEAD_TOKENS + estimate_tokens(_field(message, "content") or "")
+    for call in _field(message, "tool_calls") or ():
+        function = _field(call, "function")
+        tokens += estimate_tokens(_field(function, "name") or "") + estimate_tokens(_field(function, "arguments") or "")
+    return tokens
+
+
+def render_for_summary(messages: List[Any], max_chars: int = 2000) -> str:
+    lines = []
+    for message in messages:
+        role = _field(message, "role")
+        content = (_field(message, "content") or "")[:max_chars]
+        if role == "tool":
+            lines.append(f"tool {_field(message, 'name')}: {content}")
+            continue
+        for call in _field(message, "tool_calls") or ():
+            function = _field(call, "function")
+            lines.append(f"{role} called {_field(function, 'name')}({_field(function, 'arguments')})")
+        if content:
+            lines.append(f"{role}: {content}")
+    return "\n".join(lines)
+
+
+def llm_summarizer(client, deployment_name: str, max_tokens: int = DEFAULT_SUMMARY_TOKENS) -> Summarizer:
+    """A Summarizer that asks the chat deployment to update the running summary."""
+
+    async def summarize(previous: Optional[str], messages: List[Any]) -> str:
+        with span("history.summarize") as s:
+            response = await client.chat.completions.create(
+                model=deployment_name,
+                messages=[
+                    {
+                        "role": "system",
+                        "content": (
+                            "You maintain the running summary of a conversation between a user and an assistant. "
+                            "Rewrite the summary so it also covers the new exchanges. Keep facts, names, numbers, "
+                            "decisions, user preferences and open questions; drop small talk. "
+                            f"Stay under {int(max_tokens * 0.75)} words."
+                        ),
+                    },
+                    {
+                        "role": "user",
+                        "content": f"Current summary:\n{previous or '(none)'}\n\nNew exchanges:\n{render_for_summary(messages)}",
+                    },
+                ],
+                temperature=0,
+                max_tokens=max_tokens,
+            )
+            s.add_usage(usage_dict(response.usage))
+        return response.choices[0].message.content or previous or ""
+
+    return summarize
+
+
+class ConversationHistory:
+    """Chat history that stays within a token budget.
+
+    The system prompt is pinned; the most recent turns are kept verbatim;
+    older turns are folded into a rolling summary sent as a second system
+    message. A turn is a user message plus every assistant and tool message
+    after it, so tool calls are never separated from their results.
+
+    Folding starts when the prompt would exceed `budget_tokens` and then
+    shrinks the verbatim part to half of what is left after the system
+    prompt and summary, so the summarizer runs every few turns rather than
+    on each one. `budget_tokens=None` keeps everything.
+    """
+
+    def __init__(
+        self,
+        system_prompt: str,
+        budget_tokens: Optional[int] = None,
+        summary_tokens: int = DEFAULT_SUMMARY_TOKENS,
+        summarizer: Optional[Summarizer] = None,
+    ):
+        self.system = {"role": "system", "content": system_prompt}
+        self.budget_tokens = budget_tokens
+        self.summary_tokens = summary_tokens
+        self.summarizer = summarizer
+        self.summary: Optional[str] = None
+        self.turns: List[List[Any]] = []
+        self.folded_turns = 0
+        self.omitted_turns = 0
+        self.last_folded = 0
+
+    @classmethod
+    def from_env(cls, system_prompt: str, summarizer: Optional[Summarizer] = None) -> "ConversationHistory":
+        """Budget from HISTORY_TOKEN_BUDGET (0 disables), summary size from HISTORY_SUMMARY_TOKENS."""
+        budget = int(os.getenv("HISTORY_TOKEN_BUDGET", DEFAULT_HISTORY_TOKEN_BUDGET))
+        return cls(
+            system_prompt,
+            budget_tokens=budget or None,
+            summary_tokens=int(os.getenv("HISTORY_SUMMARY_TOKENS", DEFAULT_SUMMARY_TOKENS)),
+            summarizer=summarizer,
+        )
+
+    def _head(self) -> List[Dict[str, str]]:
+        head = [self.system]
+        summary = self.summary or ""
+        if self.omitted_turns:
+            summary += f"\n({self.omitted_turns} earlier turn(s) omitted)"
+        if summary:
+            head.append({"role": "system", "content": SUMMARY_PREFIX + summary.strip()})
+        return head
+
+    def messages(self) -> List[Any]:
+        """What to send: system prompt, summary (if any), then the verbatim turns."""
+        return self._head() + [m for turn in self.turns for m in turn]
+
+    def prompt_tokens(self, pending: Optional[List[Any]] = None) -> int:
+        return sum(message_tokens(m) for m in self.messages() + list(pending or ()))
+
+    async def prepare(self, user_message) -> List[Any]:
+        """Fold old turns if `user_message` would overflow the budget; return the prompt to send.
+
+        The message itself is not recorded until commit(), so a failed call
+        leaves the history as it was.
+        """
+        self.last_folded = 0
+        if self.budget_tokens and self.turns and self.prompt_tokens([user_message]) > self.budget_tokens:
+            await self._fold(user_message)
+        return self.messages() + [user_message]
+
+    def commit(self, turn_messages: List[Any]):
+        """Record a finished turn: the user message and everything the turn appended."""
+        self.turns.append(list(turn_messages))
+
+    async def _fold(self, user_message):
+        head = sum(message_tokens(m) for m in self._head()) + message_tokens(user_message)
+        keep = max(0, (self.budget_tokens - head - self.summary_tokens) // 2)
+        kept, kept_tokens = [], 0
+        for turn in reversed(self.turns):
+            tokens = sum(message_tokens(m) for m in turn)
+            if kept_tokens + tokens > keep:
+                break
+            kept.insert(0, turn)
+            kept_tokens += tokens
+        folding = self.turns[: len(self.turns) - len(kept)]
+        if not folding:
+            return
+        summary = None
+        if self.summarizer:
+            try:
+                summary = await self.summarizer(self.summary, [m for turn in folding for m in turn])
+            except Exception:
+                logger.warning(
+                    "Summarizing %d turn(s) failed; dropping them without a summary", len(folding), exc_info=True
+                )
+                summary = None
+        if summary:
+            self.summary = summary
+        else:
+            # Without a summary the turns are still dropped: staying inside
+            # the context window matters more than remembering them.
+            self.omitted_turns += len(folding)
+        self.turns = kept
+        self.folded_turns += len(folding)
+        self.last_folded = len(folding)
+
+    def describe_fold(self) -> Optional[str]:
+        """A one-line note if the last prepare() folded turns, else None."""
+        if not self.last_folded:
+            return None
+        return (
+            f"🗜️  Folded {self.last_folded} earlier turn(s) into the summary; "
+            f"{len(self.turns)} kept verbatim (~{self.prompt_tokens()} history tokens)"
+        )
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "verbatim_turns": len(self.turns),
+            "folded_turns": self.folded_turns,
+            "summary_tokens": estimate_tokens(self.summary) if self.summary else 0,
+            "prompt_tokens": self.prompt_tokens(),
+        }
@@ -0,0 +1,136 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+from typing import Dict, List
+
+from session_1.primitives.async_core import ChatSession, ToolChatSession
+from session_1.primitives.client_registry import close_async_clients, pool_limits
+from session_1.primitives.tool_executor import ToolExecutor
+
+
+QUESTIONS = [
+    "Give me one tip for learning a new language.",
+    "What's the weather in Paris?",
+    "Compare the weather in Rome and in Oslo.",
+    "Summarize what we talked about so far in one sentence.",
+]
+
+
+def _make_session(scenario: str):
+    if scenario == "chat":
+        return ChatSession(
+            "You are a helpful assistant who loves to help with learning.",
+            os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4"),
+        )
+    if scenario == "tools":
+        from session_1.primitives.tools_chat import available_functions, tools
+
+        return ToolChatSession(
+            "You are a helpful assistant with access to tools. Use them when needed to answer questions accurately.",
+            os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4"),
+            tools,
+            ToolExecutor(available_functions),
+        )
+    from session_2.rag.rag_agent import retrieve_passages_async, tools
+
+    return ToolChatSession(
+        "You are a helpful assistant that answers using a retriever tool when helpful.",
+        os.getenv("AZURE_DEPLOYMENT_NAME", "gpt-4"),
+        tools,
+        ToolExecutor({"retrieve_passages": retrieve_passages_async}),
+        temperature=0.3,
+    )
+
+
+async def _run_session(scenario: str, turns: int, think_time: float, latencies: List[float], errors: List[str]):
+    session = _make_session(scenario)
+    for i in range(turns):
+        started = time.perf_counter()
+        try:
+            await session.send(QUESTIONS[i % len(QUESTIONS)])
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+            return
+        latencies.append((time.perf_counter() - started) * 1000)
+        if think_time:
+            await asyncio.sleep(think_time)
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def run_level(scenario: str, sessions: int, turns: int, think_time: float) -> Dict:
+    """Run `sessions` concurrent conversations of `turns` turns each on this loop."""
+    latencies: List[float] = []
+    errors: List[str] = []
+    started = time.perf_counter()
+    await asyncio.gather(*(_run_session(scenario, turns, think_time, latencies, errors) for _ in range(sessions)))
+    wall = time.perf_counter() - started
+    ordered = sorted(latencies) or [float("nan")]
+    return {
+        "sessions": sessions,
+        "turns": len(latencies),
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "wall_seconds": round(wall, 3),
+        "turns_per_second": round(len(latencies) / wall, 2) if wall else 0.0,
+        "p50_ms": round(statistics.median(ordered), 1),
+        "p95_ms": round(_percentile(ordered, 0.95), 1),
+    }
+
+
+async def ramp(scenario: str, levels: List[int], turns: int, think_time: float, slo_ms: float, keep_going: bool):
+    results = []
+    try:
+        for sessions in levels:
+            result = await run_level(scenario, sessions, turns, think_time)
+            result["ok"] = not result["errors"] and result["p95_ms"] <= slo_ms
+            results.append(result)
+            print(
+                f"{sessions:>5} sessions  {result['turns']:>6} turns  {result['turns_per_second']:>8.2f} turns/s  "
+                f"p50 {result['p50_ms']:>8.1f} ms  p95 {result['p95_ms']:>8.1f} ms  "
+                f"errors {result['errors']:>4}  {'ok' if result['ok'] else 'over SLO'}"
+            )
+            if result["first_error"]:
+                print(f"       first error: {result['first_error']}")
+            if not result["ok"] and not keep_going:
+                break
+    finally:
+        await close_async_clients()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="How many concurrent chat sessions one process sustains on the async core"
+    )
+    parser.add_argument("--scenario", choices=["chat", "tools", "rag"], default="chat")
+    parser.add_argument("--levels", type=str, default="1,2,4,8,16,32,64", help="Comma-separated session counts to ramp through")
+    parser.add_argument("--turns", type=int, default=3, help="User turns per session")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Seconds a simulated user waits between turns")
+    parser.add_argument("--slo-ms", type=float, default=5000.0, help="p95 turn latency a level must stay under")
+    parser.add_argument("--keep-going", action="store_true", help="Run every level even after one fails")
+    parser.add_argument("--json", type=str, default=None, help="Also write the results to this file")
+    args = parser.parse_args()
+
+    levels = [int(x) for x in args.levels.split(",") if x.strip()]
+    limits = pool_limits()
+    print(
+        f"scenario={args.scenario} turns/session={args.turns} think={args.think_time}s slo(p95)={args.slo_ms:.0f} ms "
+        f"HTTP_MAX_CONNECTIONS={limits.max_connections} "
+        f"TOOL_EXECUTOR_MAX_WORKERS={os.getenv('TOOL_EXECUTOR_MAX_WORKERS', '8')}"
+    )
+    results = asyncio.run(ramp(args.scenario, levels, args.turns, args.think_time, args.slo_ms, args.keep_going))
+    sustained = max((r["sessions"] for r in results if r["ok"]), default=0)
+    print(f"Sustained: {sustained} concurrent session(s) with p95 under {args.slo_ms:.0f} ms and no errors")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"scenario": args.scenario, "sustained_sessions": sustained, "levels": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
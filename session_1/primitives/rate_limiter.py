@@ -0,0 +1,298 @@
+import asyncio
+import json
+import os
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+from session_1.primitives.tokens import estimate_tokens
+
+
+DEFAULT_MAX_RETRIES = 6
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_CAP_SECONDS = 30.0
+# Completion budget assumed when a chat request sets no max_tokens.
+DEFAULT_COMPLETION_TOKENS = 256
+# Statuses worth retrying: throttling and transient server errors.
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Transport failures worth retrying: the SDK's own retries are off (max_retries=0)
+# on clients using these transports, so timeouts and dropped connections land here.
+RETRY_EXCEPTIONS = (httpx.ConnectError, httpx.TimeoutException, httpx.RemoteProtocolError)
+# After a 429 the deployment runs at this fraction of its configured rate,
+# recovering a little with every successful request.
+MIN_RATE_FACTOR = 0.5
+# Azure checks quotas over short windows rather than the whole minute, so
+# the buckets hold at most this many seconds' worth of budget.
+BURST_SECONDS = 10.0
+THROTTLE_RATE_STEP = 0.85
+RECOVERY_STEP = 0.01
+
+_DEPLOYMENT_PATH = re.compile(r"/openai/deployments/([^/]+)/")
+
+
+def backoff_delay(attempt: int) -> float:
+    """Exponential backoff with full jitter: uniform(0, min(cap, base * 2^attempt))."""
+    return random.uniform(0, min(BACKOFF_CAP_SECONDS, BACKOFF_BASE_SECONDS * 2**attempt))
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """The server's requested wait, from retry-after-ms or Retry-After (seconds or HTTP date)."""
+    value = response.headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class RateLimiter:
+    """Requests/min and tokens/min budget of one deployment, shared by all its callers.
+
+    Two token buckets refill continuously at `rpm` and `tpm` per minute
+    (None: unlimited) and hold up to BURST_SECONDS of budget. A 429 pauses every caller until Retry-After has
+    passed and lowers the effective rate, which then creeps back up as
+    requests succeed; x-ratelimit-remaining-* headers pull the buckets
+    down to what the server reports. Thread-safe; usable from threads and
+    event loops alike.
+    """
+
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.factor = 1.0
+        self.max_requests = max(1.0, rpm * BURST_SECONDS / 60) if rpm else 0.0
+        self.max_tokens = tpm * BURST_SECONDS / 60 if tpm else 0.0
+        self.requests = self.max_requests
+        self.tokens = self.max_tokens
+        self.cooldown_until = 0.0
+        self.stats = {"requests": 0, "throttled": 0, "retries": 0, "waited_seconds": 0.0}
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rpm:
+            self.requests = min(self.max_requests, self.requests + elapsed * self.rpm * self.factor / 60)
+        if self.tpm:
+            self.tokens = min(self.max_tokens, self.tokens + elapsed * self.tpm * self.factor / 60)
+
+    def reserve(self, tokens: int) -> float:
+        """Take one request and `tokens` from the budget, or return how long to wait first."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self.cooldown_until:
+                # Spread the callers that resume after a throttle.
+                wait = self.cooldown_until - now
+                return wait + random.uniform(0, min(1.0, 0.1 * wait))
+            tokens = min(tokens, self.max_tokens) if self.tpm else tokens
+            waits = []
+            if self.rpm and self.requests < 1:
+                waits.append((1 - self.requests) * 60 / (self.rpm * self.factor))
+            if self.tpm and self.tokens < tokens:
+                waits.append((tokens - self.tokens) * 60 / (self.tpm * self.factor))
+            if waits:
+                return max(waits)
+            if self.rpm:
+                self.requests -= 1
+            if self.tpm:
+                self.tokens -= tokens
+            self.stats["requests"] += 1
+            return 0.0
+
+    def acquire(self, tokens: int):
+        while True:
+            wait = self.reserve(tokens)
+            if wait <= 0:
+                return
+            self.count("waited_seconds", wait)
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: int):
+        while True:
+            wait = self.reserve(tokens)
+            if wait <= 0:
+                return
+            self.count("waited_seconds", wait)
+            await asyncio.sleep(wait)
+
+    def count(self, stat: str, amount: float = 1):
+        with self._lock:
+            self.stats[stat] += amount
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self.stats)
+
+    def throttled(self, delay: float):
+        """A 429 came back: pause everyone for `delay` seconds and slow down."""
+        with self._lock:
+            now = time.monotonic()
+            self.cooldown_until = max(self.cooldown_until, now + delay)
+            self.factor = max(MIN_RATE_FACTOR, self.factor * THROTTLE_RATE_STEP)
+            self.requests = min(self.requests, 0.0)
+            self.tokens = min(self.tokens, 0.0)
+            self.stats["throttled"] += 1
+
+    def succeeded(self, headers: httpx.Headers):
+        with self._lock:
+            self.factor = min(1.0, self.factor + RECOVERY_STEP)
+            remaining = headers.get("x-ratelimit-remaining-requests")
+            if self.rpm and remaining and remaining.isdigit():
+                self.requests = min(self.requests, float(remaining))
+            remaining = headers.get("x-ratelimit-remaining-tokens")
+            if self.tpm and remaining and remaining.isdigit():
+                self.tokens = min(self.tokens, float(remaining))
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _env_limit(deployment: str, kind: str) -> Optional[float]:
+    specific = "RATE_LIMIT_" + re.sub(r"[^A-Za-z0-9]", "_", deployment).upper() + "_" + kind
+    value = os.getenv(specific) or os.getenv(f"RATE_LIMIT_{kind}")
+    return float(value) if value else None
+
+
+def get_rate_limiter(deployment: str) -> RateLimiter:
+    """The process-wide limiter for `deployment`.
+
+    Limits come from RATE_LIMIT_<DEPLOYMENT>_RPM / _TPM (deployment name
+    upper-cased, other characters as "_"), else RATE_LIMIT_RPM / RATE_LIMIT_TPM.
+    Unset limits are unlimited, but 429s are still honoured.
+    """
+    limiter = _limiters.get(deployment)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(deployment)
+            if limiter is None:
+                limiter = _limiters[deployment] = RateLimiter(
+                    _env_limit(deployment, "RPM"), _env_limit(deployment, "TPM")
+                )
+    return limiter
+
+
+def rate_limit_stats() -> Dict[str, Dict[str, float]]:
+    return {name: limiter.snapshot() for name, limiter in list(_limiters.items())}
+
+
+def _max_retries() -> int:
+    return int(os.getenv("RATE_LIMIT_MAX_RETRIES", DEFAULT_MAX_RETRIES))
+
+
+def describe_request(request: httpx.Request) -> Tuple[Optional[str], int]:
+    """(deployment, estimated tokens) of an Azure OpenAI request; (None, 0) for anything else.
+
+    Chat requests count their prompt plus max_tokens, which is how Azure
+    charges a request against the tokens-per-minute quota up front.
+    """
+    match = _DEPLOYMENT_PATH.search(request.url.path)
+    if not match:
+        return None, 0
+    try:
+        body = json.loads(request.content or b"{}")
+    except (ValueError, httpx.RequestNotRead):
+        return match.group(1), DEFAULT_COMPLETION_TOKENS
+    if "messages" in body:
+        prompt = estimate_tokens(json.dumps(body["messages"]))
+        if body.get("tools"):
+            prompt += estimate_tokens(json.dumps(body["tools"]))
+        return match.group(1), prompt + (body.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+    inputs = body.get("input") or ""
+    if isinstance(inputs, str):
+        inputs = [inputs]
+    return match.group(1), sum(estimate_tokens(str(text)) for text in inputs)
+
+
+class RateLimitedTransport(httpx.HTTPTransport):
+    """HTTP transport that paces Azure OpenAI calls and retries throttled ones.
+
+    Every request waits for its deployment's limiter; 429s, 5xx, timeouts
+    and failed or dropped connections are retried with jittered exponential
+    backoff (never shorter than Retry-After) up to RATE_LIMIT_MAX_RETRIES
+    times.
+    """
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        deployment, tokens = describe_request(request)
+        if deployment is None:
+            return super().handle_request(request)
+        limiter = get_rate_limiter(deployment)
+        retries = _max_retries()
+        attempt = 0
+        while True:
+            limiter.acquire(tokens)
+            try:
+                response = super().handle_request(request)
+            except RETRY_EXCEPTIONS:
+                if attempt == retries:
+                    raise
+                limiter.count("retries")
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                if response.status_code < 400:
+                    limiter.succeeded(response.headers)
+                return response
+            delay = max(retry_after_seconds(response) or 0.0, backoff_delay(attempt))
+            response.close()
+            limiter.count("retries")
+            if response.status_code == 429:
+                # The limiter holds back every caller of this deployment until then.
+                limiter.throttled(delay)
+            else:
+                time.sleep(delay)
+            attempt += 1
+
+
+class AsyncRateLimitedTransport(httpx.AsyncHTTPTransport):
+    """RateLimitedTransport for async clients; both share the per-deployment limiters."""
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        deployment, tokens = describe_request(request)
+        if deployment is None:
+            return await super().handle_async_request(request)
+        limiter = get_rate_limiter(deployment)
+        retries = _max_retries()
+        attempt = 0
+        while True:
+            await limiter.acquire_async(tokens)
+            try:
+                response = await super().handle_async_request(request)
+            except RETRY_EXCEPTIONS:
+                if attempt == retries:
+                    raise
+                limiter.count("retries")
+                await asyncio.sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+            if response.status_code not in RETRY_STATUSES or attempt == retries:
+                if response.status_code < 400:
+                    limiter.succeeded(response.headers)
+                return response
+            delay = max(retry_after_seconds(response) or 0.0, backoff_delay(attempt))
+            await response.aclose()
+            limiter.count("retries")
+            if response.status_code == 429:
+                limiter.throttled(delay)
+            else:
+                await asyncio.sleep(delay)
+            attempt += 1
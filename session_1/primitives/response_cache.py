@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from session_1.primitives.ttl_cache import TTLCache
+
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "responses.sqlite")
+DEFAULT_MEMORY_ENTRIES = 256
+DEFAULT_DISK_MAX_ENTRIES = 10000
+DEFAULT_TTL = 24 * 3600.0
+
+# "deterministic" only caches temperature-0 calls; "always" caches every call.
+POLICIES = ("deterministic", "always")
+
+
+def response_key(deployment: str, messages: List[Dict[str, Any]], temperature: float, max_tokens: Optional[int]) -> str:
+    payload = json.dumps(
+        {"deployment": deployment, "messages": messages, "temperature": temperature, "max_tokens": max_tokens},
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Chat completion responses keyed by (deployment, messages, temperature, max_tokens).
+
+    A TTLCache holds the hot entries in memory; with a `path`, every entry is
+    also written to SQLite, so answers survive restarts and the memory tier
+    can stay small. Both tiers evict least recently used entries and expire
+    entries `ttl` seconds after they were stored.
+    """
+
+    def __init__(
+        self,
+        policy: str = "deterministic",
+        memory_entries: int = DEFAULT_MEMORY_ENTRIES,
+        ttl: Optional[float] = DEFAULT_TTL,
+        path: Optional[str] = None,
+        disk_max_entries: int = DEFAULT_DISK_MAX_ENTRIES,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown response cache policy {policy!r}; choose from {', '.join(POLICIES)}")
+        self.policy = policy
+        self.ttl = ttl
+        self.path = path
+        self.disk_max_entries = disk_max_entries
+        self.memory = TTLCache(memory_entries, ttl=ttl)
+        self.disk_hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        if path:
+            if path != ":memory:":
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    content TEXT NOT NULL,
+                    usage TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL
+                ) WITHOUT ROWID
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses(last_used)")
+            self._conn.commit()
+            self._size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def cacheable(self, temperature: float) -> bool:
+        return self.policy == "always" or temperature == 0
+
+    def get(self, key: str) -> Optional[Tuple[str, Dict[str, int]]]:
+        """(content, usage of the original call), or None on a miss."""
+        entry = self.memory.get(key)
+        if entry is not None:
+            return entry
+        if self._conn is not None:
+            now = time.time()
+            with self._lock:
+                row = self._conn.execute("SELECT content, usage, created FROM responses WHERE key = ?", (key,)).fetchone()
+                if row and (self.ttl is None or row[2] + self.ttl > now):
+                    self._conn.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+                    self._conn.commit()
+                    self.disk_hits += 1
+                    entry = (row[0], json.loads(row[1]))
+            if entry is not None:
+                self.memory.put(key, entry)
+                return entry
+        self.misses += 1
+        return None
+
+    def put(self, key: str, content: str, usage: Dict[str, int]):
+        self.memory.put(key, (content, usage))
+        if self._conn is None:
+            return
+        now = time.time()
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, content, json.dumps(usage), now, now),
+            )
+            if not exists:
+                self._size += 1
+            if self._size > self.disk_max_entries:
+                self._evict(self._size - self.disk_max_entries)
+            self._conn.commit()
+
+    def _evict(self, count: int):
+        expired_before = time.time() - self.ttl if self.ttl is not None else None
+        if expired_before is not None:
+            cur = self._conn.execute("DELETE FROM responses WHERE created <= ?", (expired_before,))
+            self._size -= cur.rowcount
+            self.evictions += cur.rowcount
+            count -= cur.rowcount
+        if count > 0:
+            # Evict a little extra so we don't run a DELETE on every insert at capacity.
+            count += self.disk_max_entries // 20
+            cur = self._conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used LIMIT ?)",
+                (count,),
+            )
+            self._size -= cur.rowcount
+            self.evictions += cur.rowcount
+
+    def stats(self) -> Dict[str, float]:
+        memory_hits = self.memory.hits
+        hits = memory_hits + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "hits": hits,
+            "memory_hits": memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_entries": len(self.memory),
+            "disk_entries": self._size if self._conn is not None else 0,
+            "evictions": self.memory.evictions + self.evictions,
+        }
+
+    def describe(self) -> str:
+        stats = self.stats()
+        return (
+            f"🗃️  response cache ({self.policy}): {stats['hits']} hits "
+            f"({stats['memory_hits']} memory, {stats['disk_hits']} disk) / {stats['misses']} misses "
+            f"({stats['hit_rate']:.0%}), {stats['skipped']} skipped by policy"
+        )
+
+    def clear(self):
+        self.memory.clear()
+        if self._conn is not None:
+            with self._lock:
+                self._conn.execute("DELETE FROM responses")
+                self._conn.commit()
+                self._size = 0
+
+
+_cache: Optional[ResponseCache] = None
+_cache_settings: Optional[Tuple] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Process-wide response cache, or None unless RESPONSE_CACHE is set.
+
+    RESPONSE_CACHE picks the policy ("deterministic" or "always"),
+    RESPONSE_CACHE_PATH the SQLite spill file (empty: memory only),
+    RESPONSE_CACHE_MEMORY_ENTRIES / RESPONSE_CACHE_DISK_MAX_ENTRIES the
+    sizes and RESPONSE_CACHE_TTL the lifetime in seconds. The cache is
+    rebuilt when any of them changes, like get_embedding_cache.
+    """
+    global _cache, _cache_settings
+    policy = os.getenv("RESPONSE_CACHE", "").strip().lower()
+    if policy in ("", "0", "off", "false", "no"):
+        return None
+    settings = (
+        policy,
+        int(os.getenv("RESPONSE_CACHE_MEMORY_ENTRIES", DEFAULT_MEMORY_ENTRIES)),
+        float(os.getenv("RESPONSE_CACHE_TTL", DEFAULT_TTL)),
+        os.getenv("RESPONSE_CACHE_PATH", DEFAULT_CACHE_PATH) or None,
+        int(os.getenv("RESPONSE_CACHE_DISK_MAX_ENTRIES", DEFAULT_DISK_MAX_ENTRIES)),
+    )
+    with _cache_lock:
+        if _cache is None or _cache_settings != settings:
+            policy, memory_entries, ttl, path, disk_max_entries = settings
+            _cache = ResponseCache(
+                policy=policy, memory_entries=memory_entries, ttl=ttl, path=path, disk_max_entries=disk_max_entries
+            )
+            _cache_settings = settings
+        return _cache
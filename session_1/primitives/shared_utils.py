@@ -1,67 +1,357 @@
 import os
-from typing import List, Optional
-from openai import AzureOpenAI
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
 from dotenv import load_dotenv
+from openai import BadRequestError
+from openai.types.chat import ChatCompletionMessage, ChatCompletionMessageToolCall
+from openai.types.chat.chat_completion_message_tool_call import Function
+from session_1.primitives.client_registry import get_async_openai_client, get_openai_client
+from session_1.primitives.embedding_cache import get_embedding_cache
+from session_1.primitives.response_cache import get_response_cache, response_key
+from session_1.primitives.tokens import CHARS_PER_TOKEN, estimate_tokens  # noqa: F401 (re-exported)
+from session_1.primitives.tracing import span
 
 # Load environment variables from .env file
 load_dotenv()
 
 def create_azure_openai_client():
     """
-    Creates and returns an Azure OpenAI client instance.
+    Returns the shared, connection-pooled Azure OpenAI client
+    (see client_registry.get_openai_client).
     Requires the following environment variables:
     - AZURE_OPENAI_API_KEY
     - AZURE_OPENAI_ENDPOINT
     - AZURE_OPENAI_API_VERSION
     """
-    client = AzureOpenAI(
-        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
-        api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview"),
-        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-    )
-    return client
+    return get_openai_client()
+
+def create_async_azure_openai_client():
+    """
+    Returns the shared AsyncAzureOpenAI client for the running event loop.
+    Same environment variables as create_azure_openai_client().
+    """
+    return get_async_openai_client()
 
-def embed_texts(texts: List[str], model: Optional[str] = None) -> List[List[float]]:
+def embed_texts(
+    texts: List[str],
+    model: Optional[str] = None,
+    dimensions: Optional[int] = None,
+    use_cache: bool = True,
+) -> List[List[float]]:
     """Create embeddings for a list of texts using the specified Azure deployment.
 
     If `model` is None, falls back to env `AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME`
     (default: text-embedding-3-small).
+
+    Vectors are looked up in the persistent embedding cache first; only texts
+    that are missing (deduplicated) are sent to the API.
     """
-    client = create_azure_openai_client()
+    deployment, cache, vectors, missing = _cached_embeddings(texts, model, dimensions, use_cache)
+    if missing:
+        client = get_openai_client()
+        extra = {"dimensions": dimensions} if dimensions else {}
+        with span("embedding") as s:
+            resp = client.embeddings.create(model=deployment, input=missing, **extra)
+            s.add_usage(_embedding_usage(resp))
+        _merge_embeddings(texts, vectors, missing, [d.embedding for d in resp.data], cache, deployment, dimensions)
+    return [vectors[i] for i in range(len(texts))]
+
+
+async def embed_texts_async(
+    texts: List[str],
+    model: Optional[str] = None,
+    dimensions: Optional[int] = None,
+    use_cache: bool = True,
+) -> List[List[float]]:
+    """embed_texts() on the async client; the (local) cache is consulted the same way."""
+    deployment, cache, vectors, missing = _cached_embeddings(texts, model, dimensions, use_cache)
+    if missing:
+        client = get_async_openai_client()
+        extra = {"dimensions": dimensions} if dimensions else {}
+        with span("embedding") as s:
+            resp = await client.embeddings.create(model=deployment, input=missing, **extra)
+            s.add_usage(_embedding_usage(resp))
+        _merge_embeddings(texts, vectors, missing, [d.embedding for d in resp.data], cache, deployment, dimensions)
+    return [vectors[i] for i in range(len(texts))]
+
+
+def _cached_embeddings(texts, model, dimensions, use_cache):
+    """Resolve the deployment and split `texts` into cached vectors and missing (deduplicated) texts."""
     deployment = model or os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME", "text-embedding-3-small")
-    resp = client.embeddings.create(model=deployment, input=texts)
-    return [d.embedding for d in resp.data]
+    cache = get_embedding_cache() if use_cache else None
+    vectors = cache.get_many(deployment, dimensions, texts) if cache else {}
+    missing = list(dict.fromkeys(t for i, t in enumerate(texts) if i not in vectors))
+    return deployment, cache, vectors, missing
+
+
+def _embedding_usage(resp) -> Optional[Dict[str, int]]:
+    return {"input_tokens": resp.usage.prompt_tokens} if getattr(resp, "usage", None) else None
+
+
+def _merge_embeddings(texts, vectors, missing, fresh, cache, deployment, dimensions):
+    if cache:
+        cache.put_many(deployment, dimensions, missing, fresh)
+    by_text = dict(zip(missing, fresh))
+    for i, text in enumerate(texts):
+        if i not in vectors:
+            vectors[i] = by_text[text]
+
 
+def embed_query(text: str, model: Optional[str] = None, dimensions: Optional[int] = None) -> List[float]:
+    return embed_texts([text], model=model, dimensions=dimensions)[0]
 
-def embed_query(text: str, model: Optional[str] = None) -> List[float]:
-    return embed_texts([text], model=model)[0]
 
-def single_chat_completion(client, deployment_name, system_prompt, user_message):
+async def embed_query_async(text: str, model: Optional[str] = None, dimensions: Optional[int] = None) -> List[float]:
+    return (await embed_texts_async([text], model=model, dimensions=dimensions))[0]
+
+def single_chat_completion(
+    client, deployment_name, system_prompt, user_message,
+    stream=False, on_text=None, temperature=0.7, max_tokens=500, cache=None,
+):
     """
     Helper function that makes a single chat completion call.
     Used by both stateless and stateful chat demonstrations.
+    With stream=True the answer is streamed (each text delta goes to
+    `on_text`) and the usage info also carries the turn's timing.
+    Answers come from the response cache when one is configured (`cache`,
+    default: RESPONSE_CACHE, see response_cache) and its policy allows the
+    call; cached answers have usage_info["cached"] set.
     Returns tuple: (response_text, usage_info)
     """
+    request = _single_request(deployment_name, system_prompt, user_message, temperature, max_tokens)
+    key, hit = _lookup_response(cache, request, on_text)
+    if hit:
+        return hit
     try:
-        response = client.chat.completions.create(
-            model=deployment_name,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message}
-            ],
-            temperature=0.7,
-            max_tokens=500,
-        )
-        
-        response_text = response.choices[0].message.content
-        usage = response.usage
-        usage_info = {
-            "input_tokens": usage.prompt_tokens,
-            "output_tokens": usage.completion_tokens,
-            "total_tokens": usage.total_tokens
-        }
-        
-        return response_text, usage_info
+        with span("chat_completion") as s:
+            if stream:
+                reply = stream_chat_completion(client, on_text=on_text, **request)
+                response_text, usage = reply.message.content, reply.usage_with_timing()
+            else:
+                response = client.chat.completions.create(**request)
+                response_text, usage = response.choices[0].message.content, usage_dict(response.usage)
+            s.add_usage(usage)
     except Exception as e:
         print(f"Error calling Azure OpenAI: {e}")
         return None, None
+    _store_response(cache, key, response_text, usage)
+    return response_text, usage
+
+async def async_single_chat_completion(
+    client, deployment_name, system_prompt, user_message,
+    stream=False, on_text=None, temperature=0.7, max_tokens=500, cache=None, raise_errors=False,
+):
+    """
+    single_chat_completion() for an AsyncAzureOpenAI client.
+    Returns tuple: (response_text, usage_info), or (None, None) on error
+    (with raise_errors=True the exception propagates instead).
+    """
+    request = _single_request(deployment_name, system_prompt, user_message, temperature, max_tokens)
+    key, hit = _lookup_response(cache, request, on_text)
+    if hit:
+        return hit
+    try:
+        with span("chat_completion") as s:
+            if stream:
+                reply = await stream_chat_completion_async(client, on_text=on_text, **request)
+                response_text, usage = reply.message.content, reply.usage_with_timing()
+            else:
+                response = await client.chat.completions.create(**request)
+                response_text, usage = response.choices[0].message.content, usage_dict(response.usage)
+            s.add_usage(usage)
+    except Exception as e:
+        if raise_errors:
+            raise
+        print(f"Error calling Azure OpenAI: {e}")
+        return None, None
+    _store_response(cache, key, response_text, usage)
+    return response_text, usage
+
+def _single_request(deployment_name, system_prompt, user_message, temperature, max_tokens):
+    return dict(
+        model=deployment_name,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_message}
+        ],
+        temperature=temperature,
+        max_tokens=max_tokens,
+    )
+
+def _lookup_response(cache, request, on_text):
+    """Returns (cache key or None, cached (text, usage) or None); a hit is replayed to `on_text`."""
+    cache = cache or get_response_cache()
+    if cache is None:
+        return None, None
+    if not cache.cacheable(request["temperature"]):
+        cache.skipped += 1
+        return None, None
+    key = response_key(request["model"], request["messages"], request["temperature"], request["max_tokens"])
+    hit = cache.get(key)
+    if hit is None:
+        return key, None
+    text, usage = hit
+    if on_text:
+        on_text(text)
+    return key, (text, {**usage, "cached": True})
+
+def _store_response(cache, key, text, usage):
+    if key is None or text is None:
+        return
+    cache = cache or get_response_cache()
+    # Only the token counts are kept; timing belongs to the original call.
+    cache.put(key, text, {k: usage[k] for k in ("input_tokens", "output_tokens", "total_tokens")})
+
+def usage_dict(usage):
+    return {
+        "input_tokens": usage.prompt_tokens,
+        "output_tokens": usage.completion_tokens,
+        "total_tokens": usage.total_tokens
+    }
+
+def streaming_enabled() -> bool:
+    """Whether the interactive demos stream answers (CHAT_STREAMING, default on)."""
+    return os.getenv("CHAT_STREAMING", "true").lower() in ("1", "true", "yes")
+
+class StreamedReply(NamedTuple):
+    """A streamed completion, reassembled, with its timing (perf_counter timestamps)."""
+
+    message: ChatCompletionMessage
+    usage: Dict[str, Any]
+    started: float
+    first_token_at: Optional[float]
+    finished: float
+
+    def usage_with_timing(self, turn_started: Optional[float] = None) -> Dict[str, Any]:
+        """usage_dict() plus time-to-first-token, tokens/sec and total latency.
+
+        Times count from `turn_started` (default: when this request was sent),
+        so a tool turn can report the latency the user actually saw.
+        """
+        started = self.started if turn_started is None else turn_started
+        first = self.first_token_at or self.finished
+        generating = self.finished - first
+        return {
+            **self.usage,
+            "ttft_seconds": first - started,
+            "tokens_per_second": self.usage["output_tokens"] / generating if generating > 0 else 0.0,
+            "latency_seconds": self.finished - started,
+        }
+
+def format_timing(usage: Dict[str, Any]) -> str:
+    approx = "~" if usage.get("estimated") else ""
+    return (
+        f"⚡ TTFT {usage['ttft_seconds']:.2f}s, {approx}{usage['tokens_per_second']:.1f} tokens/s, "
+        f"total {usage['latency_seconds']:.2f}s"
+    )
+
+class _StreamAssembler:
+    """Rebuilds the assistant message (text and tool calls) from stream chunks."""
+
+    def __init__(self, on_text: Optional[Callable[[str], None]]):
+        self.on_text = on_text
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.content: List[str] = []
+        self.tool_calls: Dict[int, Dict[str, str]] = {}
+        self.usage = None
+
+    def add(self, chunk):
+        if chunk.usage:
+            self.usage = usage_dict(chunk.usage)
+        if not chunk.choices:
+            return
+        delta = chunk.choices[0].delta
+        if delta.content or delta.tool_calls:
+            if self.first_token_at is None:
+                self.first_token_at = time.perf_counter()
+        if delta.content:
+            self.content.append(delta.content)
+            if self.on_text:
+                self.on_text(delta.content)
+        # Tool-call arguments arrive as JSON fragments, keyed by the call's index.
+        for part in delta.tool_calls or ():
+            call = self.tool_calls.setdefault(part.index, {"id": "", "name": "", "arguments": ""})
+            if part.id:
+                call["id"] = part.id
+            if part.function and part.function.name:
+                call["name"] += part.function.name
+            if part.function and part.function.arguments:
+                call["arguments"] += part.function.arguments
+
+    def reply(self, messages) -> StreamedReply:
+        content = "".join(self.content) if self.content else None
+        tool_calls = [
+            ChatCompletionMessageToolCall(
+                id=call["id"], type="function", function=Function(name=call["name"], arguments=call["arguments"])
+            )
+            for _, call in sorted(self.tool_calls.items())
+        ]
+        usage = self.usage
+        if usage is None:
+            # The endpoint did not report usage for the stream; estimate it.
+            output = estimate_tokens((content or "") + "".join(c["arguments"] for c in self.tool_calls.values()))
+            prompt = sum(estimate_tokens(str(_message_content(m))) for m in messages)
+            usage = {"input_tokens": prompt, "output_tokens": output, "total_tokens": prompt + output, "estimated": True}
+        message = ChatCompletionMessage(role="assistant", content=content, tool_calls=tool_calls or None)
+        return StreamedReply(message, usage, self.started, self.first_token_at, time.perf_counter())
+
+def _message_content(message):
+    return message.get("content") if isinstance(message, dict) else getattr(message, "content", None)
+
+# Older Azure API versions reject stream_options; after the first refusal we
+# stream without it and estimate usage instead.
+_stream_usage = {"supported": True}
+
+def _is_stream_options_error(e: BadRequestError) -> bool:
+    return "stream_options" in str(e)
+
+def stream_chat_completion(client, on_text=None, **request) -> StreamedReply:
+    """chat.completions.create(**request), streamed; `on_text` sees each text delta."""
+    assembler = _StreamAssembler(on_text)
+    try:
+        stream = client.chat.completions.create(stream=True, **_usage_option(), **request)
+    except BadRequestError as e:
+        if not (_stream_usage["supported"] and _is_stream_options_error(e)):
+            raise
+        _stream_usage["supported"] = False
+        stream = client.chat.completions.create(stream=True, **request)
+    for chunk in stream:
+        assembler.add(chunk)
+    return assembler.reply(request.get("messages", ()))
+
+async def stream_chat_completion_async(client, on_text=None, **request) -> StreamedReply:
+    """stream_chat_completion() for an AsyncAzureOpenAI client."""
+    assembler = _StreamAssembler(on_text)
+    try:
+        stream = await client.chat.completions.create(stream=True, **_usage_option(), **request)
+    except BadRequestError as e:
+        if not (_stream_usage["supported"] and _is_stream_options_error(e)):
+            raise
+        _stream_usage["supported"] = False
+        stream = await client.chat.completions.create(stream=True, **request)
+    async for chunk in stream:
+        assembler.add(chunk)
+    return assembler.reply(request.get("messages", ()))
+
+def _usage_option() -> Dict[str, Any]:
+    return {"stream_options": {"include_usage": True}} if _stream_usage["supported"] else {}
+
+class TextPrinter:
+    """An `on_text` callback that prints deltas as they arrive, after a prefix."""
+
+    def __init__(self, prefix: str = "Assistant: "):
+        self.prefix = prefix
+        self.started = False
+
+    def __call__(self, text: str):
+        if not self.started:
+            print(self.prefix, end="", flush=True)
+            self.started = True
+        print(text, end="", flush=True)
+
+    def finish(self):
+        """End the streamed line; returns whether anything was printed."""
+        if self.started:
+            print()
+        return self.started
@@ -1,5 +1,8 @@
+import asyncio
 import os
-from session_1.primitives.shared_utils import create_azure_openai_client
+from session_1.primitives.async_core import ChatSession
+from session_1.primitives.client_registry import close_async_clients
+from session_1.primitives.shared_utils import TextPrinter, format_timing, streaming_enabled
 
 def demonstrate_stateful_chat():
     """
@@ -7,51 +10,52 @@ def demonstrate_stateful_chat():
     Conversation history is preserved - the model remembers context.
     Type 'quit' to exit.
     """
+    asyncio.run(_stateful_chat())
+
+async def _stateful_chat():
     print("\n" + "="*60)
     print("STATEFUL CHAT DEMONSTRATION")
     print("Conversation history is preserved - the model remembers context")
     print("Type 'quit' to exit")
     print("="*60 + "\n")
     
-    client = create_azure_openai_client()
     deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4")
     
-    # Initialize conversation with system prompt
-    messages = [
-        {"role": "system", "content": "You are a helpful assistant who loves to help with learning."}
-    ]
+    # The session keeps the conversation history, starting with the system prompt
+    session = ChatSession(
+        "You are a helpful assistant who loves to help with learning.",
+        deployment_name,
+        stream=streaming_enabled(),
+    )
     
-    while True:
-        # Get user input
-        user_input = input("\nYou: ")
-        if user_input.lower() == 'quit':
-            print("Goodbye!")
-            break
-        
-        # Add user message to conversation history
-        messages.append({"role": "user", "content": user_input})
-        
-        try:
-            # Send entire conversation history with each request
-            response = client.chat.completions.create(
-                model=deployment_name,
-                messages=messages,
-                temperature=0.7
-            )
-            
-            # Extract assistant's response and usage info
-            assistant_message = response.choices[0].message.content
-            usage = response.usage
-            
-            print(f"Assistant: {assistant_message}")
-            print(f"📊 Tokens - Input: {usage.prompt_tokens}, Output: {usage.completion_tokens}, Total: {usage.total_tokens}")
-            
-            # Add assistant's response to conversation history
-            messages.append({"role": "assistant", "content": assistant_message})
+    try:
+        while True:
+            # Get user input (in a thread, so the event loop stays free)
+            user_input = await asyncio.to_thread(input, "\nYou: ")
+            if user_input.lower() == 'quit':
+                print("Goodbye!")
+                break
             
-        except Exception as e:
-            print(f"Error: {e}")
-            break
+            try:
+                # Send entire conversation history with each request;
+                # the answer is printed as it streams in
+                printer = TextPrinter("Assistant: ")
+                assistant_message, usage = await session.send(user_input, on_text=printer)
+                
+                if not printer.finish():
+                    print(f"Assistant: {assistant_message}")
+                print(f"📊 Tokens - Input: {usage['input_tokens']}, Output: {usage['output_tokens']}, Total: {usage['total_tokens']}")
+                if "ttft_seconds" in usage:
+                    print(format_timing(usage))
+                # Older turns are folded into a summary once the history outgrows its budget
+                if session.history.describe_fold():
+                    print(session.history.describe_fold())
+                
+            except Exception as e:
+                # The failed turn left the history untouched; just try again.
+                print(f"Error: {e}")
+    finally:
+        await close_async_clients()
     
     print("\n✅ Notice: In this mode, the assistant remembers everything from your conversation!")
 
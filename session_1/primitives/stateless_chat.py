@@ -1,5 +1,14 @@
+import asyncio
 import os
-from session_1.primitives.shared_utils import create_azure_openai_client, single_chat_completion
+from session_1.primitives.client_registry import close_async_clients
+from session_1.primitives.response_cache import get_response_cache
+from session_1.primitives.shared_utils import (
+    TextPrinter,
+    async_single_chat_completion,
+    create_async_azure_openai_client,
+    format_timing,
+    streaming_enabled,
+)
 
 def demonstrate_stateless_chat():
     """
@@ -7,31 +16,48 @@ def demonstrate_stateless_chat():
     Each call is independent - the model has no memory of previous interactions.
     Type 'quit' to exit.
     """
+    asyncio.run(_stateless_chat())
+
+async def _stateless_chat():
     print("\n" + "="*60)
     print("STATELESS CHAT DEMONSTRATION")
     print("Each call is independent - no memory between calls")
     print("Type 'quit' to exit")
     print("="*60 + "\n")
     
-    client = create_azure_openai_client()
+    client = create_async_azure_openai_client()
     deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4")
     
     system_prompt = "You are a helpful assistant who responds to the user's input always referring to him as 'Hey Bro! and using a rap style'"
     
-    while True:
-        # Get user input
-        user_input = input("\nYou: ")
-        if user_input.lower() == 'quit':
-            print("Goodbye!")
-            break
-        
-        # Make a fresh call every time - NO conversation history
-        response, usage = single_chat_completion(client, deployment_name, system_prompt, user_input)
-        if response:
-            print(f"Assistant: {response}")
-            print(f"📊 Tokens - Input: {usage['input_tokens']}, Output: {usage['output_tokens']}, Total: {usage['total_tokens']}")
-        else:
-            print("Error getting response. Try again or type 'quit' to exit.")
+    try:
+        while True:
+            # Get user input (in a thread, so the event loop stays free)
+            user_input = await asyncio.to_thread(input, "\nYou: ")
+            if user_input.lower() == 'quit':
+                print("Goodbye!")
+                if get_response_cache():
+                    print(get_response_cache().describe())
+                break
+            
+            # Make a fresh call every time - NO conversation history
+            # (streamed, so the answer appears as it is generated)
+            printer = TextPrinter("Assistant: ")
+            response, usage = await async_single_chat_completion(
+                client, deployment_name, system_prompt, user_input, stream=streaming_enabled(), on_text=printer
+            )
+            if response:
+                if not printer.finish():
+                    print(f"Assistant: {response}")
+                print(f"📊 Tokens - Input: {usage['input_tokens']}, Output: {usage['output_tokens']}, Total: {usage['total_tokens']}")
+                if "ttft_seconds" in usage:
+                    print(format_timing(usage))
+                if usage.get("cached"):
+                    print("💾 Served from the response cache (no API call)")
+            else:
+                print("Error getting response. Try again or type 'quit' to exit.")
+    finally:
+        await close_async_clients()
     
     print("\n⚠️  Notice: In this mode, the assistant never remembers what you said before!")
 
@@ -1,5 +1,14 @@
+import asyncio
 import os
-from session_1.primitives.shared_utils import create_azure_openai_client, single_chat_completion
+from session_1.primitives.client_registry import close_async_clients
+from session_1.primitives.response_cache import get_response_cache
+from session_1.primitives.shared_utils import (
+    TextPrinter,
+    async_single_chat_completion,
+    create_async_azure_openai_client,
+    format_timing,
+    streaming_enabled,
+)
 
 def demonstrate_stateless_chat_with_context():
     """
@@ -8,6 +17,9 @@ def demonstrate_stateless_chat_with_context():
     Each call is independent but includes the same context.
     Type 'quit' to exit.
     """
+    asyncio.run(_stateless_chat_with_context())
+
+async def _stateless_chat_with_context():
     print("\n" + "="*60)
     print("STATELESS CHAT WITH CONTEXT DEMONSTRATION")
     print("Ask questions about the three Eminem songs below")
@@ -44,7 +56,7 @@ Verse: Living in a world of screens, reality's getting blurred
     print("Example: 'What's the theme of Digital Dreams?'")
     print("Example: 'Which song is about overcoming challenges?'\n")
     
-    client = create_azure_openai_client()
+    client = create_async_azure_openai_client()
     deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4")
     
     # System prompt includes the context about the fake songs
@@ -56,21 +68,42 @@ When users ask questions about Eminem's songs, answer based ONLY on the three so
 Be specific and reference the actual lyrics or themes from these songs.
 If asked about songs not in this list, politely say you only have information about these three songs."""
     
-    while True:
-        # Get user input
-        user_input = input("\nYou: ")
-        if user_input.lower() == 'quit':
-            print("Goodbye!")
-            break
-        
-        # Make a fresh call every time - NO conversation history
-        # But the system prompt always includes the song context
-        response, usage = single_chat_completion(client, deployment_name, system_prompt, user_input)
-        if response:
-            print(f"\nAssistant: {response}")
-            print(f"\n📊 Tokens - Input: {usage['input_tokens']}, Output: {usage['output_tokens']}, Total: {usage['total_tokens']}")
-        else:
-            print("Error getting response. Try again or type 'quit' to exit.")
+    # RESPONSE_CACHE=deterministic only reuses temperature-0 answers; the
+    # demo drops to 0 in that case and otherwise keeps its usual 0.7.
+    cache = get_response_cache()
+    temperature = 0 if cache and not cache.cacheable(0.7) else 0.7
+    if temperature == 0:
+        print("💾 Response cache on: answering at temperature 0 so repeated questions can be reused")
+
+    try:
+        while True:
+            # Get user input (in a thread, so the event loop stays free)
+            user_input = await asyncio.to_thread(input, "\nYou: ")
+            if user_input.lower() == 'quit':
+                print("Goodbye!")
+                if cache:
+                    print(cache.describe())
+                break
+            
+            # Make a fresh call every time - NO conversation history
+            # But the system prompt always includes the song context
+            printer = TextPrinter("\nAssistant: ")
+            response, usage = await async_single_chat_completion(
+                client, deployment_name, system_prompt, user_input,
+                stream=streaming_enabled(), on_text=printer, temperature=temperature,
+            )
+            if response:
+                if not printer.finish():
+                    print(f"\nAssistant: {response}")
+                print(f"\n📊 Tokens - Input: {usage['input_tokens']}, Output: {usage['output_tokens']}, Total: {usage['total_tokens']}")
+                if "ttft_seconds" in usage:
+                    print(format_timing(usage))
+                if usage.get("cached"):
+                    print("💾 Served from the response cache (no API call)")
+            else:
+                print("Error getting response. Try again or type 'quit' to exit.")
+    finally:
+        await close_async_clients()
     
 
 if __name__ == "__main__":
@@ -0,0 +1,11 @@
+# Rough average for English text with OpenAI tokenizers.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text).
+
+    Good enough for sizing embedding batches, history budgets and rate-limit
+    reservations without pulling in a tokenizer.
+    """
+    return max(1, (len(text or "") + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN)
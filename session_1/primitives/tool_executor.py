@@ -0,0 +1,265 @@
+import asyncio
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from session_1.primitives.tracing import span
+from session_1.primitives.ttl_cache import TTLCache
+
+
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_TOOL_TIMEOUT = 30.0
+DEFAULT_TOOL_CACHE_ENTRIES = 1024
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _shared_pool() -> ThreadPoolExecutor:
+    """One bounded pool (TOOL_EXECUTOR_MAX_WORKERS) for every agent loop in the process."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            workers = int(os.getenv("TOOL_EXECUTOR_MAX_WORKERS", DEFAULT_MAX_WORKERS))
+            _pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="tool")
+        return _pool
+
+
+class CachedTool:
+    """A pure tool whose results are reused for `ttl` seconds (None: until evicted).
+
+    Declare it in a tool registry as `"name": CachedTool(function, ttl=...)`.
+    Results are keyed by the canonical arguments: bound to the function's
+    signature with defaults filled in, then JSON-encoded with sorted keys,
+    so `{"item": "x"}` and `{"dimension": "all", "item": "x"}` share an
+    entry when "all" is the default. Only successful calls are stored. The
+    cache lives on the registry entry, so every turn and session using the
+    registry shares it. TOOL_CACHE_MAX_ENTRIES caps each tool's entries
+    (0 disables caching).
+    """
+
+    def __init__(self, function: Callable[..., Any], ttl: Optional[float] = None, max_entries: Optional[int] = None):
+        if max_entries is None:
+            max_entries = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", DEFAULT_TOOL_CACHE_ENTRIES))
+        self.function = function
+        self.ttl = ttl
+        self.cache = TTLCache(max_entries, ttl=ttl)
+        self._signature = inspect.signature(function)
+        functools.update_wrapper(self, function)
+
+    def key(self, arguments: Dict[str, Any]) -> Optional[str]:
+        """Canonical cache key, or None if the arguments don't fit the signature."""
+        try:
+            bound = self._signature.bind(**arguments)
+        except TypeError:
+            return None
+        bound.apply_defaults()
+        return json.dumps(bound.arguments, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+
+    def __call__(self, **arguments):
+        if asyncio.iscoroutinefunction(self.function):
+            # Coroutine tools are only cached when run through a ToolExecutor.
+            return self.function(**arguments)
+        key = self.key(arguments)
+        content = self.cache.get(key) if key is not None else None
+        if content is None:
+            content = self.function(**arguments)
+            if key is not None:
+                self.cache.put(key, content)
+        return content
+
+
+def tool_cache_stats(functions: Dict[str, Callable[..., Any]]) -> Dict[str, Dict[str, float]]:
+    """TTLCache stats of every CachedTool in a registry."""
+    return {name: f.cache.stats() for name, f in functions.items() if isinstance(f, CachedTool)}
+
+
+class ToolResult(NamedTuple):
+    tool_call_id: str
+    name: str
+    arguments: Dict[str, Any]
+    content: str
+    seconds: float
+    error: Optional[str] = None
+    cached: bool = False
+
+    def as_message(self) -> Dict[str, str]:
+        return {"tool_call_id": self.tool_call_id, "role": "tool", "name": self.name, "content": self.content}
+
+
+class ToolTurn(NamedTuple):
+    """Results of one model turn's tool calls, in the order the model issued them."""
+
+    results: List[ToolResult]
+    wall_seconds: float
+
+    def messages(self) -> List[Dict[str, str]]:
+        return [r.as_message() for r in self.results]
+
+    @property
+    def cache_hits(self) -> int:
+        return sum(r.cached for r in self.results)
+
+    def summary(self) -> str:
+        sequential = sum(r.seconds for r in self.results)
+        cached = f", {self.cache_hits} from cache" if self.cache_hits else ""
+        return (
+            f"{len(self.results)} tool call(s) in {self.wall_seconds:.2f}s "
+            f"(sequential: {sequential:.2f}s, saved {max(0.0, sequential - self.wall_seconds):.2f}s{cached})"
+        )
+
+
+def _error_content(message: str) -> str:
+    return json.dumps({"error": message})
+
+
+class ToolExecutor:
+    """Runs the tool calls of one model turn concurrently.
+
+    `functions` maps tool names to callables taking the JSON arguments as
+    keyword arguments. Each call gets `timeouts.get(name, timeout)` seconds,
+    counted from submission; a call that fails, times out or names an
+    unknown tool yields an {"error": ...} result for the model instead of
+    raising. Python threads cannot be killed, so a timed-out tool keeps its
+    worker until it returns. CachedTool hits are answered inline, without a
+    trip through the pool.
+
+    `run_async` is the asyncio flavour: coroutine tools are awaited on the
+    loop, plain functions run on the same shared pool.
+    """
+
+    def __init__(
+        self,
+        functions: Dict[str, Callable[..., str]],
+        timeout: float = DEFAULT_TOOL_TIMEOUT,
+        timeouts: Optional[Dict[str, float]] = None,
+    ):
+        self.functions = functions
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+
+    def _cached(self, call, name: str, arguments: Dict[str, Any]):
+        """(ToolResult on a cache hit or None, cache key to fill on a miss or None)."""
+        function = self.functions[name]
+        if not isinstance(function, CachedTool):
+            return None, None
+        started = time.perf_counter()
+        key = function.key(arguments)
+        content = function.cache.get(key) if key is not None else None
+        if content is None:
+            return None, key
+        return ToolResult(call.id, name, arguments, content, time.perf_counter() - started, cached=True), None
+
+    def _store(self, name: str, key: Optional[str], content, error: Optional[str]):
+        if key is not None and error is None:
+            self.functions[name].cache.put(key, content)
+
+    def _target(self, name: str) -> Callable[..., Any]:
+        function = self.functions[name]
+        return function.function if isinstance(function, CachedTool) else function
+
+    def _invoke(self, name: str, arguments: Dict[str, Any]):
+        started = time.perf_counter()
+        try:
+            with span(f"tool.{name}"):
+                content, error = self._target(name)(**arguments), None
+        except Exception as e:
+            content, error = _error_content(f"{type(e).__name__}: {e}"), str(e)
+        return content, error, time.perf_counter() - started
+
+    def _prepare(self, call):
+        """Parse one tool call into (call, name, arguments, error)."""
+        name = call.function.name
+        try:
+            arguments = json.loads(call.function.arguments or "{}")
+        except json.JSONDecodeError as e:
+            return call, name, {}, f"invalid JSON arguments: {e}"
+        if name not in self.functions:
+            return call, name, arguments, f"unknown tool {name!r}"
+        return call, name, arguments, None
+
+    def run(self, tool_calls) -> ToolTurn:
+        started = time.perf_counter()
+        pool = _shared_pool()
+        pending, inflight = [], {}
+        for call, name, arguments, error in map(self._prepare, tool_calls):
+            hit, key, future, shared = None, None, None, False
+            if not error:
+                hit, key = self._cached(call, name, arguments)
+                if hit is None:
+                    # Identical calls to a cacheable tool in one turn run once.
+                    shared = key is not None and (name, key) in inflight
+                    future = inflight[name, key] if shared else pool.submit(self._invoke, name, arguments)
+                    if key is not None:
+                        inflight[name, key] = future
+            pending.append((call, name, arguments, hit, key, future, error, shared))
+
+        results = []
+        for call, name, arguments, hit, key, future, error, shared in pending:
+            if hit is not None:
+                results.append(hit)
+                continue
+            if future is None:
+                results.append(ToolResult(call.id, name, arguments, _error_content(error), 0.0, error))
+                continue
+            timeout = self.timeouts.get(name, self.timeout)
+            try:
+                content, error, seconds = future.result(timeout=max(0.0, started + timeout - time.perf_counter()))
+            except FutureTimeout:
+                error = f"timed out after {timeout:.1f}s"
+                content, seconds = _error_content(error), timeout
+            else:
+                self._store(name, key, content, error)
+            results.append(ToolResult(call.id, name, arguments, content, seconds, error, cached=shared and not error))
+        return ToolTurn(results, time.perf_counter() - started)
+
+    async def _invoke_async(self, name: str, arguments: Dict[str, Any]):
+        function = self._target(name)
+        if not asyncio.iscoroutinefunction(function):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(_shared_pool(), functools.partial(self._invoke, name, arguments))
+        started = time.perf_counter()
+        try:
+            with span(f"tool.{name}"):
+                content, error = await function(**arguments), None
+        except Exception as e:
+            content, error = _error_content(f"{type(e).__name__}: {e}"), str(e)
+        return content, error, time.perf_counter() - started
+
+    async def _run_one_async(
+        self, inflight: Dict, call, name: str, arguments: Dict[str, Any], error: Optional[str]
+    ) -> ToolResult:
+        if error:
+            return ToolResult(call.id, name, arguments, _error_content(error), 0.0, error)
+        hit, key = self._cached(call, name, arguments)
+        if hit is not None:
+            return hit
+        shared = key is not None and (name, key) in inflight
+        if shared:
+            task = inflight[name, key]
+        else:
+            task = asyncio.ensure_future(self._invoke_async(name, arguments))
+            if key is not None:
+                inflight[name, key] = task
+        timeout = self.timeouts.get(name, self.timeout)
+        try:
+            # Shielded so one waiter timing out doesn't cancel the call for the others.
+            content, error, seconds = await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            error = f"timed out after {timeout:.1f}s"
+            content, seconds = _error_content(error), timeout
+        else:
+            self._store(name, key, content, error)
+        return ToolResult(call.id, name, arguments, content, seconds, error, cached=shared and not error)
+
+    async def run_async(self, tool_calls) -> ToolTurn:
+        started = time.perf_counter()
+        inflight: Dict = {}
+        results = await asyncio.gather(*(self._run_one_async(inflight, *self._prepare(call)) for call in tool_calls))
+        return ToolTurn(list(results), time.perf_counter() - started)
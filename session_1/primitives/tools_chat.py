@@ -1,8 +1,13 @@
+import asyncio
 import os
 import json
 from datetime import datetime
 import random
-from session_1.primitives.shared_utils import create_azure_openai_client
+from session_1.primitives.async_core import ToolChatSession
+from session_1.primitives.client_registry import close_async_clients
+from session_1.primitives.shared_utils import TextPrinter, format_timing, streaming_enabled
+from session_1.primitives.tool_executor import CachedTool, ToolExecutor
+from session_1.primitives.tracing import format_stage_summary, tracing_enabled
 
 # Define simple example functions to demonstrate tool calling
 def get_current_weather(location: str, unit: str = "celsius"):
@@ -47,9 +52,10 @@ tools = [
     }
 ]
 
-# Map function names to actual functions
+# Map function names to actual functions.
+# Weather changes slowly, so a location's report is reused for five minutes.
 available_functions = {
-    "get_current_weather": get_current_weather,
+    "get_current_weather": CachedTool(get_current_weather, ttl=300),
 }
 
 def demonstrate_tools_chat():
@@ -58,6 +64,19 @@ def demonstrate_tools_chat():
     Shows how the model can use tools to answer questions.
     Type 'quit' to exit.
     """
+    asyncio.run(_tools_chat())
+
+def _print_tool_turn(step, turn):
+    print(f"🔧 Assistant is using tools...")
+    for result in turn.results:
+        if result.error:
+            status = f"failed: {result.error}"
+        else:
+            status = "cached" if result.cached else f"{result.seconds:.2f}s"
+        print(f"   → Called {result.name} with args: {result.arguments} ({status})")
+    print(f"   ⏱️  {turn.summary()}")
+
+async def _tools_chat():
     print("\n" + "="*60)
     print("CHAT WITH TOOLS DEMONSTRATION")
     print("The assistant can use tools to get weather")
@@ -65,95 +84,51 @@ def demonstrate_tools_chat():
     print("Type 'quit' to exit")
     print("="*60 + "\n")
     
-    client = create_azure_openai_client()
     deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME", "gpt-4")
     
-    # Initialize conversation with system prompt
-    messages = [
-        {"role": "system", "content": "You are a helpful assistant with access to tools. Use them when needed to answer questions accurately."}
-    ]
+    # The session keeps the history; tool calls of a turn run concurrently
+    session = ToolChatSession(
+        "You are a helpful assistant with access to tools. Use them when needed to answer questions accurately.",
+        deployment_name,
+        tools,
+        ToolExecutor(available_functions),
+        stream=streaming_enabled(),
+    )
+    
+    try:
+        await _tools_chat_loop(session)
+    finally:
+        await close_async_clients()
     
+    print("\n✅ The assistant successfully used tools to answer your questions!")
+
+async def _tools_chat_loop(session):
     while True:
-        # Get user input
-        user_input = input("\nYou: ")
+        # Get user input (in a thread, so the event loop stays free)
+        user_input = await asyncio.to_thread(input, "\nYou: ")
         if user_input.lower() == 'quit':
             print("Goodbye!")
+            if tracing_enabled():
+                print("⏱️  Stages:\n" + format_stage_summary())
             break
         
-        # Add user message to conversation history
-        messages.append({"role": "user", "content": user_input})
-        
         try:
-            # Send request with tools enabled
-            response = client.chat.completions.create(
-                model=deployment_name,
-                messages=messages,
-                tools=tools,
-                tool_choice="auto",  # Let the model decide when to use tools
-                temperature=0.7
-            )
-            
-            response_message = response.choices[0].message
-            tool_calls = response_message.tool_calls
+            # The model decides whether to use tools; if it does, their results
+            # go back to it for the final answer
+            printer = TextPrinter("\nAssistant: ")
+            result = await session.send(user_input, on_turn=_print_tool_turn, on_text=printer)
+            usage = result.usage
             
-            # Check if the model wantgs to use a tool
-            if tool_calls:
-                # Add the assistant's response to messages
-                messages.append(response_message)
-                
-                print(f"🔧 Assistant is using tools...")
-                
-                # Process each tool call
-                for tool_call in tool_calls:
-                    function_name = tool_call.function.name
-                    function_args = json.loads(tool_call.function.arguments)
-                    
-                    print(f"   → Calling {function_name} with args: {function_args}")
-                    
-                    # Call the function
-                    function_to_call = available_functions[function_name]
-                    function_response = function_to_call(**function_args)
-                    
-                    # Add the function response to messages
-                    messages.append({
-                        "tool_call_id": tool_call.id,
-                        "role": "tool",
-                        "name": function_name,
-                        "content": function_response,
-                    })
-                
-                # Get a new response from the model with the function results
-                second_response = client.chat.completions.create(
-                    model=deployment_name,
-                    messages=messages,
-                    temperature=0.7
-                )
-                
-                final_message = second_response.choices[0].message.content
-                usage = second_response.usage
-                
-                print(f"\nAssistant: {final_message}")
-                print(f"📊 Tokens - Input: {usage.prompt_tokens}, Output: {usage.completion_tokens}, Total: {usage.total_tokens}")
-                
-                # Add final response to conversation history
-                messages.append({"role": "assistant", "content": final_message})
-                
-            else:
-                # No tool was called, just a regular response
-                assistant_message = response_message.content
-                usage = response.usage
-                
-                print(f"Assistant: {assistant_message}")
-                print(f"📊 Tokens - Input: {usage.prompt_tokens}, Output: {usage.completion_tokens}, Total: {usage.total_tokens}")
-                
-                # Add assistant's response to conversation history
-                messages.append({"role": "assistant", "content": assistant_message})
+            if not printer.finish():
+                print(f"\nAssistant: {result.content}")
+            print(f"📊 Tokens - Input: {usage['input_tokens']}, Output: {usage['output_tokens']}, Total: {usage['total_tokens']}")
+            if "ttft_seconds" in usage:
+                print(format_timing(usage))
+            if session.history.describe_fold():
+                print(session.history.describe_fold())
             
         except Exception as e:
             print(f"Error: {e}")
-            break
-    
-    print("\n✅ The assistant successfully used tools to answer your questions!")
 
 if __name__ == "__main__":
     demonstrate_tools_chat()
\ No newline at end of file
@@ -0,0 +1,301 @@
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+# Latency histogram bucket bounds in seconds, from a local search to a long completion.
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+EXPORT_FORMATS = ("prometheus", "otlp")
+SERVICE_NAME = "llm-rag-primitives"
+
+
+class _Stage:
+    """Latency histogram, error count and token counters of one stage."""
+
+    __slots__ = ("buckets", "count", "sum", "min", "max", "errors", "input_tokens", "output_tokens")
+
+    def __init__(self, bounds: int):
+        # buckets[i] counts durations <= bounds[i]; the last one holds the rest.
+        self.buckets = [0] * (bounds + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = float("inf")
+        self.max = 0.0
+        self.errors = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+
+class Metrics:
+    """Per-stage latency histograms and token counters, shared by all threads."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.bounds = tuple(buckets)
+        self.started_ns = time.time_ns()
+        self._stages: Dict[str, _Stage] = {}
+        self._lock = threading.Lock()
+
+    def _stage(self, name: str) -> _Stage:
+        stage = self._stages.get(name)
+        if stage is None:
+            stage = self._stages[name] = _Stage(len(self.bounds))
+        return stage
+
+    def observe(self, name: str, seconds: float, error: bool = False):
+        index = bisect.bisect_left(self.bounds, seconds)
+        with self._lock:
+            stage = self._stage(name)
+            stage.buckets[index] += 1
+            stage.count += 1
+            stage.sum += seconds
+            stage.min = min(stage.min, seconds)
+            stage.max = max(stage.max, seconds)
+            stage.errors += error
+
+    def add_tokens(self, name: str, input_tokens: int = 0, output_tokens: int = 0):
+        with self._lock:
+            stage = self._stage(name)
+            stage.input_tokens += input_tokens or 0
+            stage.output_tokens += output_tokens or 0
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+            self.started_ns = time.time_ns()
+
+    def _quantile(self, stage: _Stage, q: float) -> float:
+        """Estimate from the histogram: linear within the bucket the quantile falls in, clamped to the observed range."""
+        rank = q * stage.count
+        seen = 0
+        for i, n in enumerate(stage.buckets):
+            if n and seen + n >= rank:
+                low = self.bounds[i - 1] if i else 0.0
+                high = self.bounds[i] if i < len(self.bounds) else self.bounds[-1]
+                return min(stage.max, max(stage.min, low + (high - low) * (rank - seen) / n))
+            seen += n
+        return 0.0
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Per stage: calls, errors, mean / estimated p50 / p95 / max latency in ms and tokens."""
+        with self._lock:
+            return {
+                name: {
+                    "count": stage.count,
+                    "errors": stage.errors,
+                    "mean_ms": round(1000 * stage.sum / stage.count, 2) if stage.count else 0.0,
+                    "p50_ms": round(1000 * self._quantile(stage, 0.5), 2),
+                    "p95_ms": round(1000 * self._quantile(stage, 0.95), 2),
+                    "max_ms": round(1000 * stage.max, 2),
+                    "input_tokens": stage.input_tokens,
+                    "output_tokens": stage.output_tokens,
+                }
+                for name, stage in sorted(self._stages.items())
+            }
+
+    def prometheus(self) -> str:
+        """The Prometheus text exposition format."""
+        lines = [
+            "# HELP stage_latency_seconds Latency of each traced stage.",
+            "# TYPE stage_latency_seconds histogram",
+        ]
+        with self._lock:
+            stages = sorted(self._stages.items())
+            for name, stage in stages:
+                label = _prom_label(name)
+                cumulative = 0
+                for bound, n in zip(self.bounds + (float("inf"),), stage.buckets):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'stage_latency_seconds_bucket{{stage="{label}",le="{le}"}} {cumulative}')
+                lines.append(f'stage_latency_seconds_sum{{stage="{label}"}} {stage.sum!r}')
+                lines.append(f'stage_latency_seconds_count{{stage="{label}"}} {stage.count}')
+            lines += ["# HELP stage_errors_total Traced stages that raised.", "# TYPE stage_errors_total counter"]
+            lines += [f'stage_errors_total{{stage="{_prom_label(name)}"}} {stage.errors}' for name, stage in stages]
+            lines += ["# HELP stage_tokens_total Tokens used by each stage.", "# TYPE stage_tokens_total counter"]
+            for name, stage in stages:
+                if stage.input_tokens or stage.output_tokens:
+                    label = _prom_label(name)
+                    lines.append(f'stage_tokens_total{{stage="{label}",type="input"}} {stage.input_tokens}')
+                    lines.append(f'stage_tokens_total{{stage="{label}",type="output"}} {stage.output_tokens}')
+        return "\n".join(lines) + "\n"
+
+    def otlp(self) -> Dict[str, Any]:
+        """An OTLP/JSON ExportMetricsServiceRequest (cumulative temporality)."""
+        now = str(time.time_ns())
+        with self._lock:
+            start = str(self.started_ns)
+            stages = sorted(self._stages.items())
+            histogram_points = [
+                {
+                    "attributes": [_otlp_attribute("stage", name)],
+                    "startTimeUnixNano": start,
+                    "timeUnixNano": now,
+                    "count": str(stage.count),
+                    "sum": stage.sum,
+                    "bucketCounts": [str(n) for n in stage.buckets],
+                    "explicitBounds": list(self.bounds),
+                }
+                for name, stage in stages
+            ]
+
+            def counter_points(values: List[Tuple[List[Dict], int]]) -> List[Dict]:
+                return [
+                    {"attributes": attributes, "startTimeUnixNano": start, "timeUnixNano": now, "asInt": str(value)}
+                    for attributes, value in values
+                ]
+
+            errors = counter_points([([_otlp_attribute("stage", name)], stage.errors) for name, stage in stages])
+            tokens = counter_points(
+                [
+                    ([_otlp_attribute("stage", name), _otlp_attribute("type", kind)], value)
+                    for name, stage in stages
+                    if stage.input_tokens or stage.output_tokens
+                    for kind, value in (("input", stage.input_tokens), ("output", stage.output_tokens))
+                ]
+            )
+        cumulative = 2  # AGGREGATION_TEMPORALITY_CUMULATIVE
+        return {
+            "resourceMetrics": [
+                {
+                    "resource": {"attributes": [_otlp_attribute("service.name", SERVICE_NAME)]},
+                    "scopeMetrics": [
+                        {
+                            "scope": {"name": __name__},
+                            "metrics": [
+                                {
+                                    "name": "stage.duration",
+                                    "unit": "s",
+                                    "histogram": {"aggregationTemporality": cumulative, "dataPoints": histogram_points},
+                                },
+                                {
+                                    "name": "stage.errors",
+                                    "sum": {"aggregationTemporality": cumulative, "isMonotonic": True, "dataPoints": errors},
+                                },
+                                {
+                                    "name": "stage.tokens",
+                                    "unit": "{token}",
+                                    "sum": {"aggregationTemporality": cumulative, "isMonotonic": True, "dataPoints": tokens},
+                                },
+                            ],
+                        }
+                    ],
+                }
+            ]
+        }
+
+
+def _prom_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _otlp_attribute(key: str, value: str) -> Dict[str, Any]:
+    return {"key": key, "value": {"stringValue": value}}
+
+
+class Span:
+    """Times one stage from `with` to exit; token usage can be attached on the way."""
+
+    __slots__ = ("stage", "started")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self) -> "Span":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        metrics.observe(self.stage, time.perf_counter() - self.started, error=exc_type is not None)
+        return False
+
+    def add_usage(self, usage: Optional[Dict[str, Any]]):
+        """Count a usage_dict()'s input/output tokens towards this stage."""
+        if usage:
+            metrics.add_tokens(self.stage, usage.get("input_tokens", 0), usage.get("output_tokens", 0))
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def add_usage(self, usage):
+        pass
+
+
+_NOOP = _NoopSpan()
+metrics = Metrics()
+_settings = {"enabled": False}
+
+
+def tracing_enabled() -> bool:
+    return _settings["enabled"]
+
+
+def span(stage: str):
+    """`with span("retrieval.search"):` times the block into the stage's histogram.
+
+    While tracing is off this returns a shared no-op, so an instrumented
+    call costs a flag check.
+    """
+    if not _settings["enabled"]:
+        return _NOOP
+    return Span(stage)
+
+
+def export_metrics(path: Optional[str] = None, fmt: Optional[str] = None) -> Optional[str]:
+    """Write the metrics to `path` (default: TRACE_EXPORT_PATH) as Prometheus text or OTLP JSON.
+
+    The format comes from `fmt`, else TRACE_EXPORT_FORMAT, else the file
+    extension (.json: OTLP). The file is replaced atomically, so a scraper
+    or collector tailing it never reads half a write. Returns the path.
+    """
+    path = path or os.getenv("TRACE_EXPORT_PATH")
+    if not path:
+        return None
+    fmt = (fmt or os.getenv("TRACE_EXPORT_FORMAT") or ("otlp" if path.endswith(".json") else "prometheus")).lower()
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"TRACE_EXPORT_FORMAT must be one of {EXPORT_FORMATS}, not {fmt!r}")
+    body = metrics.prometheus() if fmt == "prometheus" else json.dumps(metrics.otlp(), indent=1)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(body)
+    os.replace(tmp_path, path)
+    return path
+
+
+def enable_tracing(enabled: bool = True):
+    """Switch tracing on or off at runtime (TRACING sets the initial state)."""
+    _settings["enabled"] = enabled
+
+
+def format_stage_summary() -> str:
+    return "\n".join(
+        f"   {name:<32} {s['count']:>6} calls  mean {s['mean_ms']:>9.1f} ms  p95 ~{s['p95_ms']:>9.1f} ms"
+        + (f"  tokens {s['input_tokens']} in / {s['output_tokens']} out" if s["input_tokens"] or s["output_tokens"] else "")
+        + (f"  errors {s['errors']}" if s["errors"] else "")
+        for name, s in metrics.summary().items()
+    )
+
+
+def _export_at_exit():
+    if _settings["enabled"] and metrics.summary():
+        export_metrics()
+
+
+if os.getenv("TRACING", "").strip().lower() in ("1", "true", "yes", "on"):
+    enable_tracing()
+atexit.register(_export_at_exit)
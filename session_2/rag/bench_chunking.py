@@ -0,0 +1,108 @@
+import argparse
+import contextlib
+import io
+import os
+import time
+from typing import List
+
+from session_1.primitives.tokens import CHARS_PER_TOKEN
+from session_2.rag.chunking import DEFAULT_CHUNK_TOKENS, DEFAULT_OVERLAP_TOKENS, chunk_text_tokens
+from session_2.rag.importer import iter_chunks, iter_chunks_parallel, iter_source_paths
+
+
+def chunk_text(text: str, chunk_size: int = 300, overlap: int = 50) -> List[str]:
+    """The importer's original character-based chunker: the baseline for `chunk_text_tokens`."""
+    text = (text or "").strip()
+    if not text:
+        return []
+    chunks = []
+    start = 0
+    n = len(text)
+    while start < n:
+        end = min(n, start + chunk_size)
+        chunk = text[start:end]
+        if end < n:
+            split_at = chunk.rfind(" ")
+            if split_at > int(chunk_size * 0.6):
+                end = start + split_at
+                chunk = text[start:end]
+        chunks.append(chunk.strip())
+        if end >= n:
+            break
+        start = max(0, end - max(0, overlap))
+    return [c for c in chunks if c]
+
+
+def _time(fn, repeat: int):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def bench_directory(dir: str, workers: int):
+    """Time the importer's chunking stage over a directory, in-process vs. process pool."""
+
+    def drain(chunks) -> int:
+        # The per-source progress lines would dominate the output.
+        with contextlib.redirect_stdout(io.StringIO()):
+            return sum(1 for _ in chunks)
+
+    paths = list(iter_source_paths(dir=dir))
+    size_mb = sum(os.path.getsize(p) for p in paths) / (1024 * 1024)
+    print(f"Directory: {dir} ({len(paths):,} files, {size_mb:.1f} MB)")
+
+    started = time.perf_counter()
+    count = drain(iter_chunks(paths))
+    serial = time.perf_counter() - started
+    print(f"{'in-process':<20} {serial:7.3f}s  {len(paths) / serial:9.1f} files/s  {count / serial:9.1f} chunks/s")
+
+    started = time.perf_counter()
+    count = drain(iter_chunks_parallel(paths, workers))
+    parallel = time.perf_counter() - started
+    print(
+        f"{f'--workers {workers}':<20} {parallel:7.3f}s  {len(paths) / parallel:9.1f} files/s  "
+        f"{count / parallel:9.1f} chunks/s  ({serial / parallel:.1f}x)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunking benchmarks: character vs token chunker, serial vs process pool")
+    parser.add_argument("--file", type=str, default="./session_2/rag/data/sample.txt", help="Seed text file")
+    parser.add_argument("--mb", type=float, default=20, help="Size of the generated text in MB (default: 20)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per chunker; best time is reported")
+    parser.add_argument("--dir", type=str, help="Instead, benchmark the importer's chunking stage on this directory")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Worker processes for --dir")
+    args = parser.parse_args()
+
+    if args.dir:
+        bench_directory(args.dir, args.workers)
+        return
+
+    with open(args.file, "r", encoding="utf-8") as f:
+        seed = f.read()
+    target = int(args.mb * 1024 * 1024)
+    text = (seed + "\n\n") * (target // (len(seed) + 2) + 1)
+    size_mb = len(text) / (1024 * 1024)
+    print(f"Text: {size_mb:.1f} MB ({len(text):,} characters)")
+
+    # Same nominal size for both: DEFAULT_CHUNK_TOKENS tokens of ~CHARS_PER_TOKEN characters.
+    chars = DEFAULT_CHUNK_TOKENS * CHARS_PER_TOKEN
+    overlap_chars = DEFAULT_OVERLAP_TOKENS * CHARS_PER_TOKEN
+    runs = [
+        (f"chunk_text({chars} chars, {overlap_chars} overlap)", lambda: chunk_text(text, chars, overlap_chars)),
+        (
+            f"chunk_text_tokens({DEFAULT_CHUNK_TOKENS} tokens, {DEFAULT_OVERLAP_TOKENS} overlap)",
+            lambda: chunk_text_tokens(text),
+        ),
+    ]
+    for name, fn in runs:
+        elapsed, chunks = _time(fn, args.repeat)
+        print(f"{name:<45} {elapsed:7.3f}s  {size_mb / elapsed:7.1f} MB/s  {len(chunks):,} chunks")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import argparse
+import os
+import statistics
+import time
+from typing import Callable, List
+
+from openai import AzureOpenAI
+from qdrant_client import QdrantClient
+
+from session_1.primitives.client_registry import get_openai_client, get_qdrant_client, warm_up
+from session_2.rag.collection_profiles import search_params
+from session_2.rag.vector_store import store_url
+
+
+def embed_and_search(openai_client: AzureOpenAI, qdrant: QdrantClient, query: str, top_k: int, collection: str):
+    """One retrieval's network work: embed the query, then a plain vector search.
+
+    Both variants run exactly this, so the comparison isolates client reuse
+    from everything else retrieve_passages does (hybrid fusion, packing).
+    """
+    vec = (
+        openai_client.embeddings.create(model=os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME"), input=[query])
+        .data[0]
+        .embedding
+    )
+    qdrant.search(
+        collection_name=collection,
+        query_vector=vec,
+        limit=top_k,
+        score_threshold=0.4,
+        search_params=search_params(),
+    )
+
+
+def retrieve_with_fresh_clients(url: str, query: str, top_k: int, collection: str):
+    """What retrieve_passages used to do: build both clients for every call."""
+    openai_client = AzureOpenAI(
+        api_key=os.getenv("AZURE_OPENAI_API_KEY"),
+        api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview"),
+        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
+    )
+    qdrant = QdrantClient(url=url, api_key=os.getenv("QDRANT_API_KEY"))
+    try:
+        embed_and_search(openai_client, qdrant, query, top_k, collection)
+    finally:
+        openai_client.close()
+        qdrant.close()
+
+
+def retrieve_with_shared_clients(url: str, query: str, top_k: int, collection: str):
+    embed_and_search(
+        get_openai_client(), get_qdrant_client(url, os.getenv("QDRANT_API_KEY")), query, top_k, collection
+    )
+
+
+def measure(fn: Callable[[int], None], n: int) -> List[float]:
+    latencies = []
+    for i in range(n):
+        started = time.perf_counter()
+        fn(i)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def report(label: str, latencies: List[float]):
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    print(
+        f"{label:<28} first {latencies[0]:8.1f} ms   p50 {statistics.median(latencies):8.1f} ms   "
+        f"p95 {p95:8.1f} ms   mean {statistics.fmean(latencies):8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval latency: per-call clients vs. shared pooled clients")
+    parser.add_argument("--query", type=str, default="What is retrieval augmented generation?")
+    parser.add_argument("--n", type=int, default=20, help="Calls per variant")
+    parser.add_argument("--top-k", type=int, default=4)
+    parser.add_argument("--collection", type=str, default="session2_rag")
+    args = parser.parse_args()
+    # The URL retrieve_passages uses; both variants and the warm-up hit it.
+    url = store_url()
+    if not url.startswith(("http://", "https://")):
+        parser.error(f"needs a Qdrant server URL (VECTOR_STORE_URL / QDRANT_URL), not {url!r}")
+
+    def run(retrieve: Callable, tag: str) -> List[float]:
+        # Each call gets a distinct query so no cache can answer it.
+        return measure(lambda i: retrieve(url, f"{args.query} ({tag}{i})", args.top_k, args.collection), args.n)
+
+    before = run(retrieve_with_fresh_clients, "a")
+    report("per-call clients (before)", before)
+
+    started = time.perf_counter()
+    status = warm_up(qdrant_url=url)
+    print(f"warm-up: {status} in {(time.perf_counter() - started) * 1000:.1f} ms")
+    after = run(retrieve_with_shared_clients, "b")
+    report("shared pooled clients (after)", after)
+    print(f"p50 speedup: {statistics.median(before) / statistics.median(after):.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import argparse
+import shutil
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+import numpy as np
+from qdrant_client.http.models import Distance, PointStruct, VectorParams
+
+from session_2.rag.bench_profiles import percentile
+from session_2.rag.filters import build_filter, doc_type, source_dirs
+from session_2.rag.importer import ensure_payload_indexes
+from session_2.rag.vector_store import create_vector_store
+
+
+DOC_TYPES = ("md", "txt", "rst")
+# Synthetic mtimes are spread over this many days before `now`.
+MTIME_SPAN_DAYS = 365
+
+
+def synthetic_points(n: int, dim: int, sources: int, dirs: int, rng: np.random.Generator, now: float):
+    """Random unit vectors with importer-style payloads: `sources` files spread over `dirs` directories."""
+    mtimes = now - rng.uniform(0, MTIME_SPAN_DAYS * 86400, size=sources)
+    names = [f"corpus/dir{s % dirs:03d}/doc{s:05d}.{DOC_TYPES[s % len(DOC_TYPES)]}" for s in range(sources)]
+    owner = rng.integers(0, sources, size=n)
+    for start in range(0, n, 1000):
+        vectors = rng.standard_normal((min(1000, n - start), dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        batch = []
+        for offset, vec in enumerate(vectors):
+            s = int(owner[start + offset])
+            batch.append(
+                PointStruct(
+                    id=start + offset,
+                    vector=vec.tolist(),
+                    payload={
+                        "text": f"chunk {start + offset}",
+                        "source": names[s],
+                        "chunk_index": offset,
+                        "source_dirs": source_dirs(names[s]),
+                        "doc_type": doc_type(names[s]),
+                        "mtime": float(mtimes[s]),
+                    },
+                )
+            )
+        yield batch
+
+
+def measure(search: Callable[[List[float]], List], queries: np.ndarray) -> Dict[str, float]:
+    latencies, returned = [], 0
+    for q in queries:
+        started = time.perf_counter()
+        hits = search(q.tolist())
+        latencies.append((time.perf_counter() - started) * 1000)
+        returned += len(hits)
+    return {"p50": percentile(latencies, 50), "p95": percentile(latencies, 95), "hits": returned / len(queries)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Filtered vs. unfiltered search latency, with and without payload indexes")
+    parser.add_argument("--points", type=int, default=100000, help="Synthetic points in the collection")
+    parser.add_argument("--dim", type=int, default=256, help="Vector dimensions")
+    parser.add_argument("--sources", type=int, default=5000, help="Distinct source files")
+    parser.add_argument("--dirs", type=int, default=50, help="Directories the sources are spread over")
+    parser.add_argument("--queries", type=int, default=50, help="Queries per measurement")
+    parser.add_argument("--k", type=int, default=4, help="Results per query (retrieve_passages default: 4)")
+    parser.add_argument(
+        "--store",
+        type=str,
+        default=None,
+        help='Vector store URL (default: a temporary "local:" store; a Qdrant URL benchmarks the server)',
+    )
+    args = parser.parse_args()
+
+    tmp = None
+    if args.store is None:
+        tmp = tempfile.mkdtemp(prefix="bench_filters_")
+        args.store = f"local:{tmp}"
+    client = create_vector_store(args.store)
+    collection = "bench_filters"
+    rng = np.random.default_rng(0)
+    now = time.time()
+    try:
+        client.recreate_collection(
+            collection_name=collection, vectors_config=VectorParams(size=args.dim, distance=Distance.COSINE)
+        )
+        started = time.perf_counter()
+        for batch in synthetic_points(args.points, args.dim, args.sources, args.dirs, rng, now):
+            client.upsert(collection_name=collection, points=batch, wait=True)
+        print(f"{args.points:,} points x {args.dim} dims, {args.sources:,} sources in {args.dirs} dirs "
+              f"(loaded in {time.perf_counter() - started:.1f}s)\n")
+
+        queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+        cases = {
+            "unfiltered": None,
+            "source (1 file)": build_filter(source="corpus/dir007/doc00007.txt"),
+            f"path_prefix (1/{args.dirs})": build_filter(path_prefix="corpus/dir007"),
+            f"doc_type (1/{len(DOC_TYPES)})": build_filter(doc_type="md"),
+            "modified last 30 days": build_filter(modified_after=now - 30 * 86400),
+        }
+
+        def run() -> Dict[str, Dict[str, float]]:
+            return {
+                name: measure(
+                    lambda q: client.search(
+                        collection_name=collection, query_vector=q, limit=args.k, query_filter=query_filter
+                    ),
+                    queries,
+                )
+                for name, query_filter in cases.items()
+            }
+
+        without = run()
+        started = time.perf_counter()
+        ensure_payload_indexes(client, collection)
+        indexing = time.perf_counter() - started
+        with_indexes = run()
+
+        print(f"{'filter':<26} {'no index p50/p95 ms':>21} {'indexed p50/p95 ms':>20} {'hits/query':>11}")
+        for name in cases:
+            a, b = without[name], with_indexes[name]
+            print(
+                f"{name:<26} {a['p50']:>10.2f}/{a['p95']:<10.2f} {b['p50']:>9.2f}/{b['p95']:<10.2f} {b['hits']:>10.1f}"
+            )
+        print(f"\nCreating the payload indexes took {indexing:.2f}s.")
+    finally:
+        client.delete_collection(collection)
+        if tmp:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
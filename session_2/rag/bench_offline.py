@@ -0,0 +1,380 @@
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from session_1.primitives.fake_azure import FakeAzureServer
+from session_1.primitives.tracing import enable_tracing, metrics
+
+
+BENCHMARKS = ("importer", "retrieval", "tools_chat", "artisan", "single_chat")
+COLLECTION = "bench_offline"
+CHAT_DEPLOYMENT = "bench-chat"
+EMBEDDING_DEPLOYMENT = "bench-embedding"
+# Each round of the artisan script: independent tools run concurrently.
+ARTISAN_SCRIPT = [
+    [
+        {"name": "use_measuring_tape", "arguments": {"item": "shelf_board"}},
+        {"name": "use_measuring_tape", "arguments": {"item": "shelf_support"}},
+    ],
+    [
+        {"name": "use_saw", "arguments": {"material": "shelf_board", "cut_type": "straight", "measurement": "60cm"}},
+        {"name": "use_drill", "arguments": {"material": "shelf_support", "hole_size": "5mm", "purpose": "screws"}},
+    ],
+    [
+        {"name": "use_hammer", "arguments": {"nail_type": "finishing nails", "pieces": ["board", "support"], "purpose": "join"}},
+        {"name": "use_sandpaper", "arguments": {"surface": "shelf", "grit": 120}},
+    ],
+    [{"name": "use_paint_brush", "arguments": {"color": "walnut", "surface": "shelf", "coats": 2}}],
+]
+WEATHER_SCRIPT = [
+    [
+        {"name": "get_current_weather", "arguments": {"location": "{user}"}},
+        {"name": "get_current_weather", "arguments": {"location": "Oslo", "unit": "celsius"}},
+    ]
+]
+RETRIEVAL_SCRIPT = [[{"name": "retrieve_passages", "arguments": {"query": "{user}", "top_k": 4}}]]
+CITIES = ["Paris", "Rome", "Lisbon", "Vienna", "Prague", "Dublin", "Madrid", "Berlin", "Warsaw", "Athens"]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def latency_summary(latencies_ms: List[float]) -> Dict[str, float]:
+    if not latencies_ms:
+        return {"n": 0}
+    return {
+        "n": len(latencies_ms),
+        "mean_ms": round(statistics.fmean(latencies_ms), 2),
+        "p50_ms": round(percentile(latencies_ms, 50), 2),
+        "p95_ms": round(percentile(latencies_ms, 95), 2),
+        "max_ms": round(max(latencies_ms), 2),
+    }
+
+
+def timed(fn: Callable[[], object]) -> float:
+    started = time.perf_counter()
+    fn()
+    return (time.perf_counter() - started) * 1000
+
+
+def synthetic_corpus(path: str, docs: int, words_per_doc: int, rng: random.Random) -> List[str]:
+    """Write `docs` text files of Zipf-ish pseudo-words in sentences and paragraphs; returns some sentences to query with."""
+    vocabulary = [f"{rng.choice('bcdfghklmnprstvz')}{rng.choice('aeiou')}{rng.choice('lmnrst')}{i}" for i in range(3000)]
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    sentences = []
+    for d in range(docs):
+        paragraphs, words = [], 0
+        while words < words_per_doc:
+            paragraph = []
+            for _ in range(rng.randint(3, 7)):
+                sentence = " ".join(rng.choices(vocabulary, weights, k=rng.randint(8, 20)))
+                paragraph.append(sentence.capitalize() + ".")
+                words += sentence.count(" ") + 1
+                if rng.random() < 0.01:
+                    sentences.append(sentence)
+            paragraphs.append(" ".join(paragraph))
+        sub = os.path.join(path, f"part{d % 10}")
+        os.makedirs(sub, exist_ok=True)
+        with open(os.path.join(sub, f"doc{d:04d}.txt"), "w", encoding="utf-8") as f:
+            f.write("\n\n".join(paragraphs))
+    return sentences
+
+
+def bench_importer(corpus: str) -> Dict:
+    """importer.main() end to end: chunk, embed (fake server), upsert into in-memory Qdrant, BM25 index."""
+    from session_2.rag import importer
+    from session_2.rag.vector_store import create_vector_store
+
+    argv = sys.argv
+    sys.argv = ["importer", "--dir", corpus, "--collection", COLLECTION, "--store", ":memory:", "--recreate"]
+    try:
+        output = io.StringIO()
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(output):
+            importer.main()
+        seconds = time.perf_counter() - started
+    finally:
+        sys.argv = argv
+    chunks = create_vector_store(":memory:").count(COLLECTION).count
+    sources = sum(len(files) for _, _, files in os.walk(corpus))
+    return {
+        "sources": sources,
+        "chunks": chunks,
+        "seconds": round(seconds, 3),
+        "chunks_per_second": round(chunks / seconds, 1),
+    }
+
+
+def bench_retrieval(queries: List[str]) -> Dict:
+    """retrieve_passages() latency: cold (new queries: embedding + search) and warm (cached)."""
+    from session_2.rag.rag_agent import retrieve_passages
+
+    retrieve_passages("warm up the clients", collection=COLLECTION)
+    cold = [timed(lambda: retrieve_passages(q, collection=COLLECTION)) for q in queries]
+    warm = [timed(lambda: retrieve_passages(q, collection=COLLECTION)) for q in queries]
+    hits = sum(bool(json.loads(retrieve_passages(q, collection=COLLECTION))["results"]) for q in queries)
+    return {"cold": latency_summary(cold), "warm": latency_summary(warm), "queries_with_results": hits}
+
+
+async def _timed_turns(send: Callable, prompts: List[str]) -> List[float]:
+    latencies = []
+    for prompt in prompts:
+        started = time.perf_counter()
+        await send(prompt)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+async def bench_tools_chat(server: FakeAzureServer, turns: int, stream: bool) -> Dict:
+    """The tools_chat turn loop: one weather round with two calls, then the answer."""
+    from session_1.primitives.async_core import ToolChatSession
+    from session_1.primitives.client_registry import close_async_clients
+    from session_1.primitives.tool_executor import ToolExecutor
+    from session_1.primitives.tools_chat import available_functions, tools
+
+    server.configure(tool_script=WEATHER_SCRIPT, reset_counts=True)
+    try:
+        session = ToolChatSession(
+            "You are a helpful assistant with access to tools.",
+            CHAT_DEPLOYMENT,
+            tools,
+            ToolExecutor(available_functions),
+            stream=stream,
+        )
+        await session.send("warm up")
+        prompts = [CITIES[i % len(CITIES)] + (f" {i}" if i >= len(CITIES) else "") for i in range(turns)]
+        latencies = await _timed_turns(session.send, prompts)
+    finally:
+        await close_async_clients()
+    return {"turns": latency_summary(latencies), "server": server.stats()}
+
+
+async def bench_artisan(server: FakeAzureServer, runs: int, stream: bool) -> Dict:
+    """The artisan decision loop: four tool rounds (tools simulate 0.5 s of work each), then the answer."""
+    from session_1.primitives.artisan_agent import artisan_tools, available_tools
+    from session_1.primitives.async_core import run_tool_loop
+    from session_1.primitives.client_registry import close_async_clients, get_async_openai_client
+    from session_1.primitives.tool_executor import ToolExecutor
+
+    server.configure(tool_script=ARTISAN_SCRIPT, reset_counts=True)
+    latencies, steps = [], 0
+    try:
+        for _ in range(runs):
+            messages = [
+                {"role": "system", "content": "You are an artisan AI who builds furniture step by step."},
+                {"role": "user", "content": "Please build a small bookshelf."},
+            ]
+            started = time.perf_counter()
+            result = await run_tool_loop(
+                get_async_openai_client(),
+                CHAT_DEPLOYMENT,
+                messages,
+                artisan_tools,
+                ToolExecutor(available_tools),
+                max_steps=len(ARTISAN_SCRIPT) + 2,
+                tools_in_follow_up=True,
+                stream=stream,
+            )
+            latencies.append((time.perf_counter() - started) * 1000)
+            steps = result.steps
+    finally:
+        await close_async_clients()
+    return {"builds": latency_summary(latencies), "steps": steps, "server": server.stats()}
+
+
+def bench_single_chat(levels: List[int], requests: int, stream: bool) -> Dict:
+    """single_chat_completion() from `level` threads at once on the shared client."""
+    from session_1.primitives.client_registry import get_openai_client
+    from session_1.primitives.shared_utils import single_chat_completion
+
+    client = get_openai_client()
+    single_chat_completion(client, CHAT_DEPLOYMENT, "You are terse.", "warm up", stream=stream)
+    results = {}
+    for level in levels:
+        latencies, errors = [], 0
+
+        def call(i: int):
+            nonlocal errors
+            started = time.perf_counter()
+            text, _ = single_chat_completion(client, CHAT_DEPLOYMENT, "You are terse.", f"Question {i}", stream=stream)
+            if text is None:
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=level) as pool:
+            list(pool.map(call, range(requests)))
+        wall = time.perf_counter() - started
+        results[str(level)] = {
+            **latency_summary(latencies),
+            "errors": errors,
+            "requests_per_second": round(requests / wall, 1),
+        }
+    return results
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _flatten(results: Dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name))
+        elif isinstance(value, (int, float)) and (name.endswith("_ms") or name.endswith("_per_second")):
+            flat[name] = value
+    return flat
+
+
+def compare(results: Dict, baseline: Dict):
+    """Print every latency and throughput figure next to the baseline's."""
+    now, before = _flatten(results["results"]), _flatten(baseline["results"])
+    print(f"\nAgainst {baseline.get('git') or 'baseline'} ({baseline.get('created', '?')}):")
+    for name, value in now.items():
+        if name not in before or not before[name]:
+            continue
+        change = (value - before[name]) / before[name]
+        # Lower latency is better; higher throughput is.
+        better = change < 0 if name.endswith("_ms") else change > 0
+        mark = "" if abs(change) < 0.05 else (" better" if better else " WORSE")
+        print(f"  {name:<40} {before[name]:>10} -> {value:>10}  ({change:+.1%}){mark}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Offline benchmarks of the hot paths against a fake Azure OpenAI server and in-memory Qdrant"
+    )
+    parser.add_argument("--only", type=str, default=",".join(BENCHMARKS), help="Comma-separated subset of: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--docs", type=int, default=200, help="Synthetic corpus: number of documents")
+    parser.add_argument("--doc-words", type=int, default=1500, help="Synthetic corpus: words per document")
+    parser.add_argument("--queries", type=int, default=50, help="retrieve_passages queries")
+    parser.add_argument("--turns", type=int, default=20, help="tools_chat turns")
+    parser.add_argument("--artisan-runs", type=int, default=3, help="Artisan builds")
+    parser.add_argument("--levels", type=str, default="1,8,32", help="single_chat_completion concurrency levels")
+    parser.add_argument("--requests", type=int, default=64, help="single_chat_completion calls per level")
+    parser.add_argument("--chat-latency", type=float, default=0.05, help="Fake completion latency in seconds")
+    parser.add_argument("--embedding-latency", type=float, default=0.01, help="Fake embedding latency in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Fake streaming pace (0: all at once)")
+    parser.add_argument("--completion-tokens", type=int, default=32, help="Tokens per fake answer")
+    parser.add_argument("--stream", action="store_true", help="Stream completions in the chat benchmarks")
+    parser.add_argument("--trace", action="store_true", help="Add a per-stage latency/token breakdown to each result")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", type=str, default="bench_offline.json", help="Where to write the JSON results")
+    parser.add_argument("--baseline", type=str, default=None, help="Earlier results file to compare against")
+    args = parser.parse_args()
+    selected = [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+    if "retrieval" in selected and "importer" not in selected:
+        parser.error("retrieval searches the collection the importer benchmark builds; include importer")
+
+    out = os.path.abspath(args.out)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    rng = random.Random(args.seed)
+    settings = {k: v for k, v in vars(args).items() if k not in ("out", "baseline", "only")}
+    results: Dict[str, Dict] = {}
+    workdir = tempfile.mkdtemp(prefix="bench_offline_")
+    cwd = os.getcwd()
+    server = FakeAzureServer(
+        chat_latency=args.chat_latency,
+        embedding_latency=args.embedding_latency,
+        tokens_per_second=args.tokens_per_second,
+        completion_tokens=args.completion_tokens,
+    )
+    with server:
+        os.environ.update(
+            server.env(),
+            AZURE_OPENAI_DEPLOYMENT_NAME=CHAT_DEPLOYMENT,
+            AZURE_DEPLOYMENT_NAME=CHAT_DEPLOYMENT,
+            AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME=EMBEDDING_DEPLOYMENT,
+            VECTOR_STORE_URL=":memory:",
+            QDRANT_URL=":memory:",
+            # Measure the real calls, not the caches in front of them.
+            EMBEDDING_CACHE_PATH="",
+            RESPONSE_CACHE="",
+            CLIENT_WARMUP="false",
+        )
+        # The importer's .rag_state files go to the scratch directory.
+        os.chdir(workdir)
+        warnings.filterwarnings("ignore", message="Payload indexes have no effect")
+        enable_tracing(args.trace)
+
+        def run(name: str, bench: Callable[[], Dict]):
+            metrics.reset()
+            results[name] = bench()
+            if args.trace:
+                results[name]["stages"] = metrics.summary()
+
+        try:
+            if "importer" in selected:
+                corpus = os.path.join(workdir, "corpus")
+                sentences = synthetic_corpus(corpus, args.docs, args.doc_words, rng)
+                print(f"importer: {args.docs} documents x {args.doc_words} words...")
+                run("importer", lambda: bench_importer(corpus))
+            if "retrieval" in selected:
+                queries = [" ".join(s.split()[:6]) for s in rng.sample(sentences, min(args.queries, len(sentences)))]
+                print(f"retrieval: {len(queries)} queries...")
+                run("retrieval", lambda: bench_retrieval(queries))
+            if "tools_chat" in selected:
+                print(f"tools_chat: {args.turns} turns...")
+                run("tools_chat", lambda: asyncio.run(bench_tools_chat(server, args.turns, args.stream)))
+            if "artisan" in selected:
+                print(f"artisan: {args.artisan_runs} builds...")
+                run("artisan", lambda: asyncio.run(bench_artisan(server, args.artisan_runs, args.stream)))
+            if "single_chat" in selected:
+                levels = [int(x) for x in args.levels.split(",") if x.strip()]
+                print(f"single_chat: {args.requests} calls at concurrency {levels}...")
+                run("single_chat", lambda: bench_single_chat(levels, args.requests, args.stream))
+        finally:
+            # Only this run's stages belong in the results; keep TRACE_EXPORT_PATH out of it.
+            enable_tracing(False)
+            os.chdir(cwd)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "suite": "bench_offline",
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": settings,
+        "results": results,
+    }
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"\nResults written to {out}")
+    if baseline:
+        compare(report, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+import argparse
+import time
+from typing import List, Tuple
+
+import numpy as np
+from qdrant_client.http.models import PointStruct
+
+from session_2.rag.collection_profiles import PROFILES, collection_config, estimate_ram_bytes, search_params
+from session_2.rag.local_store import LocalVectorStore
+from session_2.rag.vector_store import create_vector_store
+
+
+def load_points(client, collection: str, limit: int) -> Tuple[List, np.ndarray]:
+    """Read ids and vectors of (up to `limit`) points from the imported collection."""
+    ids, vectors = [], []
+    offset = None
+    while len(ids) < limit:
+        records, offset = client.scroll(
+            collection_name=collection,
+            limit=min(1000, limit - len(ids)),
+            offset=offset,
+            with_payload=False,
+            with_vectors=True,
+        )
+        ids.extend(r.id for r in records)
+        vectors.extend(r.vector for r in records)
+        if offset is None:
+            break
+    return ids, np.asarray(vectors, dtype=np.float32)
+
+
+def exact_neighbours(vectors: np.ndarray, queries: np.ndarray, k: int) -> List[List[int]]:
+    """Brute-force cosine top-k (excluding the query point itself) as ground truth."""
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    out = []
+    for qi in queries:
+        scores = normed @ normed[qi]
+        scores[qi] = -np.inf
+        top = np.argpartition(-scores, k)[:k]
+        out.append(top[np.argsort(-scores[top])].tolist())
+    return out
+
+
+def wait_until_indexed(client, collection: str, timeout: float = 600):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if str(client.get_collection(collection).status).endswith("green"):
+            return
+        time.sleep(0.5)
+    print(f"  (still optimizing after {timeout:.0f}s; measuring anyway)")
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare collection profiles: memory, recall@k and latency")
+    parser.add_argument("--collection", type=str, default="session2_rag", help="Imported collection to sample")
+    parser.add_argument("--profiles", type=str, default=",".join(PROFILES), help="Comma-separated profile names")
+    parser.add_argument("--queries", type=int, default=100, help="Number of sampled query points")
+    parser.add_argument("--k", type=int, default=4, help="Neighbours per query (retrieve_passages default: 4)")
+    parser.add_argument("--max-points", type=int, default=200000, help="Cap on points copied per profile")
+    parser.add_argument("--store", type=str, default=None, help="Qdrant URL (default: $VECTOR_STORE_URL, then $QDRANT_URL)")
+    parser.add_argument("--keep", action="store_true", help="Keep the per-profile collections afterwards")
+    args = parser.parse_args()
+
+    client = create_vector_store(args.store)
+    if isinstance(client, LocalVectorStore):
+        parser.error("profiles are Qdrant collection settings; point --store at a Qdrant instance")
+
+    ids, vectors = load_points(client, args.collection, args.max_points)
+    if len(ids) <= args.k:
+        parser.error(f"collection '{args.collection}' has too few points ({len(ids)}); import some data first")
+    dim = vectors.shape[1]
+    rng = np.random.default_rng(0)
+    queries = rng.choice(len(ids), size=min(args.queries, len(ids)), replace=False)
+    truth = exact_neighbours(vectors, queries, args.k)
+    print(f"{len(ids):,} points x {dim} dims from '{args.collection}', {len(queries)} queries, k={args.k}\n")
+
+    header = f"{'profile':<22} {'vectors RAM*':>12} {'graph RAM*':>10} {'disk*':>9} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8}"
+    rows = []
+    for name in args.profiles.split(","):
+        profile = PROFILES[name]
+        bench = f"{args.collection}__profile_{name}"
+        print(f"Building '{bench}' ({profile.description})...")
+        client.recreate_collection(collection_name=bench, **collection_config(profile, dim))
+        for start in range(0, len(ids), 256):
+            client.upsert(
+                collection_name=bench,
+                points=[
+                    PointStruct(id=ids[i], vector=vectors[i].tolist()) for i in range(start, min(start + 256, len(ids)))
+                ],
+                wait=True,
+            )
+        wait_until_indexed(client, bench)
+
+        variants = [(name, True)]
+        if profile.quantization:
+            variants.append((f"{name} (no rescore)", False))
+        ram = estimate_ram_bytes(profile, len(ids), dim)
+        for label, rescore in variants:
+            params = search_params(profile, oversampling=profile.oversampling, rescore=rescore)
+            latencies, found = [], 0
+            for qi, expected in zip(queries, truth):
+                started = time.perf_counter()
+                hits = client.search(
+                    collection_name=bench,
+                    query_vector=vectors[qi].tolist(),
+                    limit=args.k + 1,
+                    search_params=params,
+                )
+                latencies.append((time.perf_counter() - started) * 1000)
+                got = [h.id for h in hits if h.id != ids[qi]][: args.k]
+                found += len(set(got) & {ids[i] for i in expected})
+            rows.append(
+                f"{label:<22} {ram['vectors_ram'] / 2**20:>10.1f}MB {ram['graph_ram'] / 2**20:>8.1f}MB "
+                f"{ram['disk'] / 2**20:>7.1f}MB {found / (len(queries) * args.k):>9.3f} "
+                f"{percentile(latencies, 50):>8.2f} {percentile(latencies, 95):>8.2f}"
+            )
+        if not args.keep:
+            client.delete_collection(bench)
+
+    print("\n" + header)
+    print("\n".join(rows))
+    print(
+        "\n* Estimated from Qdrant's sizing rules (estimate_ram_bytes), not measured; "
+        "recall is against brute-force cosine."
+    )
+
+
+if __name__ == "__main__":
+    main()
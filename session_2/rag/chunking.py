@@ -0,0 +1,172 @@
+import re
+from typing import Iterable, Iterator, List, NamedTuple
+
+from session_1.primitives.tokens import CHARS_PER_TOKEN
+
+
+DEFAULT_CHUNK_TOKENS = 128
+DEFAULT_OVERLAP_TOKENS = 32
+
+# What ends a unit: a line break (group 1 is the whitespace after it), or
+# whitespace after sentence-final punctuation optionally closed by a quote or
+# bracket (group 2). The single leading character class keeps the scan fast.
+_SEPARATOR = re.compile(r"[.!?…\n](?:(?<=\n)(\s*)|[\"'”’)\]]?(\s+))")
+_NON_SPACE = re.compile(r"\S")
+# A separator can start this many characters before a unit split inside "word.”".
+_LOOKBACK = 2
+
+
+class TextSpan(NamedTuple):
+    """A chunk of text with its [start, end) character offsets in the source."""
+
+    start: int
+    end: int
+    text: str
+
+
+class _Unit(NamedTuple):
+    start: int
+    end: int
+    tokens: int
+    breaks_line: bool
+
+
+def _tokens(n_chars: int) -> int:
+    return max(1, (n_chars + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN)
+
+
+class _TokenChunker:
+    """Incremental state for `iter_token_chunks`.
+
+    Text is cut into units (sentences / lines) in one forward scan. Units are
+    packed greedily up to the token budget; overlap is produced by carrying
+    whole trailing units into the next chunk, so nothing is re-scanned and
+    each chunk's text is a single slice of the buffer.
+    """
+
+    def __init__(self, max_tokens: int, overlap_tokens: int):
+        self.max_tokens = max(1, max_tokens)
+        self.overlap_tokens = max(0, min(overlap_tokens, self.max_tokens // 2))
+        self.max_chars = self.max_tokens * CHARS_PER_TOKEN
+        self.buf = ""
+        self.offset = 0  # absolute source offset of buf[0]
+        self.unit_start = 0  # absolute offset where the next unit scan resumes
+        self.units: List[_Unit] = []  # units of the chunk being assembled
+        self.tokens = 0
+
+    def feed(self, window: str, final: bool = False) -> List[TextSpan]:
+        # Drop everything before the oldest position we may still need.
+        keep_from = max(self.offset, (self.units[0].start if self.units else self.unit_start) - _LOOKBACK)
+        self.buf = self.buf[keep_from - self.offset :] + window
+        self.offset = keep_from
+
+        out: List[TextSpan] = []
+        for unit in self._scan(final):
+            self._add(unit, out)
+        if final and self.units:
+            out.append(self._span(self.units))
+            self.units, self.tokens = [], 0
+        return out
+
+    def _scan(self, final: bool) -> Iterator[_Unit]:
+        buf, offset, n = self.buf, self.offset, len(self.buf)
+        m = _NON_SPACE.search(buf, self.unit_start - offset)
+        if not m:
+            self.unit_start = offset + n
+            return
+        pos = m.start()
+        max_chars = self.max_chars
+        for sep in _SEPARATOR.finditer(buf, max(0, pos - _LOOKBACK)):
+            sep_end = sep.end()
+            if sep_end <= pos:
+                continue
+            if sep_end == n and not final:
+                # A separator touching the end of the buffer may continue in the next window.
+                break
+            if sep.lastindex == 1:
+                end, breaks_line = sep.start(), True
+                while end > pos and buf[end - 1] in " \t":
+                    end -= 1
+            else:
+                end = sep.start(2)
+                breaks_line = "\n" in sep.group(2)
+            if end - pos > max_chars:
+                pos = yield from self._split_long(pos, end)
+            yield _Unit(offset + pos, offset + end, (end - pos + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN, breaks_line)
+            pos = sep_end
+
+        end = pos + len(buf[pos:].rstrip())
+        if end - pos > self.max_chars:
+            pos = yield from self._split_long(pos, end)
+        if final:
+            if end > pos:
+                yield _Unit(offset + pos, offset + end, _tokens(end - pos), True)
+            self.unit_start = offset + n
+        else:
+            # Incomplete unit: resume from here once more text arrives.
+            self.unit_start = offset + pos
+
+    def _split_long(self, pos: int, end: int):
+        """Yield leading pieces of an over-long unit, each cut at the last space
+        that fits; returns the start of the remainder (at most `max_chars` long)."""
+        buf, offset = self.buf, self.offset
+        while end - pos > self.max_chars:
+            cut = buf.rfind(" ", pos + 1, pos + self.max_chars)
+            if cut < 0:
+                cut = pos + self.max_chars
+            piece_end = cut
+            while piece_end > pos and buf[piece_end - 1].isspace():
+                piece_end -= 1
+            yield _Unit(offset + pos, offset + piece_end, _tokens(piece_end - pos), False)
+            m = _NON_SPACE.search(buf, cut, end)
+            if not m:
+                return end
+            pos = m.start()
+        return pos
+
+    def _add(self, unit: _Unit, out: List[TextSpan]):
+        if self.units and (
+            self.tokens + unit.tokens > self.max_tokens
+            # Prefer ending at a line/paragraph break once the chunk is half full.
+            or (self.units[-1].breaks_line and self.tokens >= self.max_tokens // 2)
+        ):
+            out.append(self._span(self.units))
+            # Carry whole trailing units (never the entire chunk) as overlap.
+            budget = min(self.overlap_tokens, self.max_tokens - unit.tokens)
+            keep = len(self.units)
+            carried_tokens = 0
+            while keep > 1 and carried_tokens + self.units[keep - 1].tokens <= budget:
+                keep -= 1
+                carried_tokens += self.units[keep].tokens
+            self.units, self.tokens = self.units[keep:], carried_tokens
+        self.units.append(unit)
+        self.tokens += unit.tokens
+
+    def _span(self, units: List[_Unit]) -> TextSpan:
+        start, end = units[0].start, units[-1].end
+        return TextSpan(start, end, self.buf[start - self.offset : end - self.offset])
+
+
+def iter_token_chunks(
+    windows: Iterable[str],
+    max_tokens: int = DEFAULT_CHUNK_TOKENS,
+    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+) -> Iterator[TextSpan]:
+    """Chunk streamed text into spans of about `max_tokens` estimated tokens.
+
+    Chunks end on sentence or line boundaries where possible, consecutive
+    chunks share up to `overlap_tokens` of whole sentences, and every span
+    carries its character offsets in the source so neighbours can be merged.
+    """
+    chunker = _TokenChunker(max_tokens, overlap_tokens)
+    for window in windows:
+        yield from chunker.feed(window)
+    yield from chunker.feed("", final=True)
+
+
+def chunk_text_tokens(
+    text: str,
+    max_tokens: int = DEFAULT_CHUNK_TOKENS,
+    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+) -> List[TextSpan]:
+    return list(iter_token_chunks([text or ""], max_tokens=max_tokens, overlap_tokens=overlap_tokens))
@@ -0,0 +1,151 @@
+import os
+from typing import Dict, NamedTuple, Optional
+
+from qdrant_client.http.models import (
+    BinaryQuantization,
+    BinaryQuantizationConfig,
+    Distance,
+    HnswConfigDiff,
+    QuantizationSearchParams,
+    ScalarQuantization,
+    ScalarQuantizationConfig,
+    ScalarType,
+    SearchParams,
+    VectorParams,
+)
+
+from session_2.rag.manifest import STATE_DIR
+
+
+DEFAULT_PROFILE = "full"
+
+
+class CollectionProfile(NamedTuple):
+    """How a collection stores and indexes its vectors.
+
+    With quantization, the compressed vectors stay in RAM for the HNSW
+    search and the float32 originals go to disk, where they are only read to
+    rescore the oversampled candidates.
+    """
+
+    description: str
+    quantization: Optional[str] = None  # None, "int8" or "binary"
+    hnsw_m: int = 16
+    hnsw_ef_construct: int = 100
+    # Candidates fetched per requested hit before rescoring (quantized profiles).
+    oversampling: float = 1.0
+
+    @property
+    def on_disk(self) -> bool:
+        return self.quantization is not None
+
+
+PROFILES: Dict[str, CollectionProfile] = {
+    "full": CollectionProfile("float32 vectors in RAM (Qdrant defaults)"),
+    "int8": CollectionProfile(
+        "int8 scalar quantization in RAM, originals on disk (~4x less vector RAM)",
+        quantization="int8",
+        oversampling=2.0,
+    ),
+    "binary": CollectionProfile(
+        "1-bit binary quantization in RAM, originals on disk (~32x less vector RAM)",
+        quantization="binary",
+        oversampling=3.0,
+    ),
+    "compact": CollectionProfile(
+        "int8 quantization with a sparser HNSW graph (m=8), for the smallest footprint",
+        quantization="int8",
+        hnsw_m=8,
+        hnsw_ef_construct=64,
+        oversampling=2.0,
+    ),
+}
+
+
+def get_profile(name: str) -> CollectionProfile:
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown collection profile {name!r}; choose from {', '.join(PROFILES)}") from None
+
+
+def default_profile_path(collection: str) -> str:
+    return os.path.join(STATE_DIR, f"{collection}.profile")
+
+
+def record_collection_profile(collection: str, name: str):
+    """Remember which profile `collection` was created with, for query-time settings."""
+    get_profile(name)
+    os.makedirs(STATE_DIR, exist_ok=True)
+    with open(default_profile_path(collection), "w", encoding="utf-8") as f:
+        f.write(name)
+
+
+def collection_profile(collection: str) -> Optional[CollectionProfile]:
+    """The profile the importer created `collection` with; None if unknown."""
+    try:
+        with open(default_profile_path(collection), "r", encoding="utf-8") as f:
+            return PROFILES.get(f.read().strip())
+    except FileNotFoundError:
+        return None
+
+
+def collection_config(profile: CollectionProfile, dim: int) -> Dict:
+    """Keyword arguments for `create_collection` / `recreate_collection`."""
+    config = {
+        "vectors_config": VectorParams(size=dim, distance=Distance.COSINE, on_disk=profile.on_disk),
+        "hnsw_config": HnswConfigDiff(m=profile.hnsw_m, ef_construct=profile.hnsw_ef_construct),
+    }
+    if profile.quantization == "int8":
+        config["quantization_config"] = ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    elif profile.quantization == "binary":
+        config["quantization_config"] = BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    return config
+
+
+def search_params(
+    profile: Optional[CollectionProfile] = None,
+    oversampling: Optional[float] = None,
+    rescore: Optional[bool] = None,
+    hnsw_ef: Optional[int] = None,
+    exact: bool = False,
+) -> SearchParams:
+    """Query-time settings; unset values come from the environment, then `profile`.
+
+    QDRANT_SEARCH_OVERSAMPLING (default: the profile's oversampling, else
+    2.0) and QDRANT_SEARCH_RESCORE (default true) only affect quantized
+    collections; QDRANT_SEARCH_HNSW_EF defaults to Qdrant's own choice.
+    """
+    if oversampling is None:
+        default = profile.oversampling if profile is not None and profile.quantization else 2.0
+        oversampling = float(os.getenv("QDRANT_SEARCH_OVERSAMPLING", default))
+    if rescore is None:
+        rescore = os.getenv("QDRANT_SEARCH_RESCORE", "true").lower() in ("1", "true", "yes")
+    if hnsw_ef is None and os.getenv("QDRANT_SEARCH_HNSW_EF"):
+        hnsw_ef = int(os.getenv("QDRANT_SEARCH_HNSW_EF"))
+    return SearchParams(
+        hnsw_ef=hnsw_ef,
+        exact=exact,
+        quantization=QuantizationSearchParams(rescore=rescore, oversampling=oversampling),
+    )
+
+
+def estimate_ram_bytes(profile: CollectionProfile, points: int, dim: int) -> Dict[str, int]:
+    """Rough RAM / disk footprint of `points` vectors under `profile`.
+
+    Follows Qdrant's sizing guidance: float32 vectors cost 4 bytes per
+    dimension, int8 one, binary one bit; HNSW links cost ~2 * m * 4 bytes
+    per point on layer 0, plus ~50% for upper layers and bookkeeping.
+    """
+    original = points * dim * 4
+    if profile.quantization == "int8":
+        quantized = points * dim
+    elif profile.quantization == "binary":
+        quantized = points * ((dim + 7) // 8)
+    else:
+        quantized = 0
+    graph = int(points * profile.hnsw_m * 2 * 4 * 1.5)
+    vectors_ram = quantized if profile.on_disk else original
+    return {"vectors_ram": vectors_ram, "graph_ram": graph, "disk": original if profile.on_disk else 0}
@@ -0,0 +1,154 @@
+from collections import defaultdict
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from session_1.primitives.tokens import estimate_tokens
+from session_2.rag.sparse_index import tokenize
+
+
+DEFAULT_CONTEXT_TOKENS = 1200
+# MMR trade-off: 1.0 ranks by relevance only, 0.0 by novelty only.
+DEFAULT_MMR_LAMBDA = 0.7
+
+
+class Candidate(NamedTuple):
+    """One retrieved chunk: point id, relevance (higher is better), payload and stored vector if fetched."""
+
+    id: str
+    score: float
+    payload: Dict
+    vector: Optional[Sequence[float]] = None
+
+
+class Passage(NamedTuple):
+    source: Optional[str]
+    chunks: List[int]
+    text: str
+    score: float
+
+    def as_item(self) -> Dict:
+        item = {"text": self.text, "source": self.source, "score": round(self.score, 4)}
+        if len(self.chunks) > 1:
+            item["chunks"] = f"{self.chunks[0]}-{self.chunks[-1]}"
+        return item
+
+
+class _Similarity:
+    """Pairwise candidate similarity: cosine of the stored vectors, else word-set Jaccard.
+
+    Keyword-only hits come without vectors, so they are compared by text.
+    """
+
+    def __init__(self, candidates: List[Candidate]):
+        self.candidates = candidates
+        self._words: Dict[int, set] = {}
+        self._unit: Dict[int, np.ndarray] = {}
+        for i, c in enumerate(candidates):
+            if c.vector is not None:
+                v = np.asarray(c.vector, dtype=np.float32)
+                norm = np.linalg.norm(v)
+                self._unit[i] = v / norm if norm else v
+
+    def _word_set(self, i: int) -> set:
+        if i not in self._words:
+            self._words[i] = set(tokenize(self.candidates[i].payload.get("text") or ""))
+        return self._words[i]
+
+    def __call__(self, i: int, j: int) -> float:
+        if i in self._unit and j in self._unit:
+            return float(self._unit[i] @ self._unit[j])
+        words_a, words_b = self._word_set(i), self._word_set(j)
+        union = words_a | words_b
+        return len(words_a & words_b) / len(union) if union else 0.0
+
+
+def mmr_select(candidates: List[Candidate], k: int, lambda_: float = DEFAULT_MMR_LAMBDA) -> List[Candidate]:
+    """Maximal marginal relevance: pick `k` candidates that are relevant but unlike each other.
+
+    Scores are rescaled to [0, 1] first, so cosine similarities and fused
+    rank scores trade off against similarity on the same scale.
+    """
+    if len(candidates) <= 1 or k <= 0:
+        return candidates[:k]
+    high = max(c.score for c in candidates)
+    low = min(c.score for c in candidates)
+    relevance = [(c.score - low) / (high - low) if high > low else 1.0 for c in candidates]
+    similarity = _Similarity(candidates)
+    chosen: List[int] = []
+    # Highest similarity of each candidate to anything chosen so far.
+    redundancy = [0.0] * len(candidates)
+    remaining = set(range(len(candidates)))
+    while remaining and len(chosen) < k:
+        best = max(remaining, key=lambda i: lambda_ * relevance[i] - (1 - lambda_) * redundancy[i])
+        chosen.append(best)
+        remaining.discard(best)
+        for i in remaining:
+            redundancy[i] = max(redundancy[i], similarity(i, best))
+    return [candidates[i] for i in chosen]
+
+
+def _join(text: str, end: Optional[int], payload: Dict) -> Optional[str]:
+    """Append the next chunk's text without the part that overlaps `end`; None without offsets."""
+    start, next_text = payload.get("char_start"), payload.get("text") or ""
+    if end is None or start is None:
+        return None
+    if start >= end:
+        # Consecutive chunks without overlap are only apart by the whitespace
+        # the chunker trimmed at a paragraph or sentence break.
+        return text + ("\n" if start > end else "") + next_text
+    return text + next_text[end - start :]
+
+
+def merge_adjacent(candidates: List[Candidate]) -> List[Passage]:
+    """Group chunks by source and merge runs of consecutive chunk_index into one passage.
+
+    Chunks overlap by a few sentences; the stored char_start/char_end
+    offsets tell how much of the next chunk repeats the previous one, so
+    a merged passage carries every sentence once. Each passage scores as
+    its best chunk.
+    """
+    by_source: Dict[Optional[str], List[Candidate]] = defaultdict(list)
+    for c in candidates:
+        by_source[c.payload.get("source")].append(c)
+    passages = []
+    for source, group in by_source.items():
+        group.sort(key=lambda c: (c.payload.get("chunk_index") is None, c.payload.get("chunk_index") or 0))
+        run = None
+        for c in group:
+            index = c.payload.get("chunk_index")
+            if run is not None and index is not None and run["chunks"][-1] == index - 1:
+                merged = _join(run["text"], run["end"], c.payload)
+                if merged is not None:
+                    run.update(text=merged, end=c.payload.get("char_end"), score=max(run["score"], c.score))
+                    run["chunks"].append(index)
+                    continue
+            if run is not None:
+                passages.append(Passage(source, run["chunks"], run["text"], run["score"]))
+            run = {"chunks": [index], "text": c.payload.get("text") or "", "end": c.payload.get("char_end"), "score": c.score}
+        if run is not None:
+            passages.append(Passage(source, run["chunks"], run["text"], run["score"]))
+    return passages
+
+
+def fit_to_budget(passages: List[Passage], budget_tokens: int) -> List[Passage]:
+    """The best passages, by score, whose texts fit in `budget_tokens`; the first one always goes in."""
+    packed, used = [], 0
+    for passage in sorted(passages, key=lambda p: p.score, reverse=True):
+        tokens = estimate_tokens(passage.text)
+        if packed and used + tokens > budget_tokens:
+            continue
+        packed.append(passage)
+        used += tokens
+    return packed
+
+
+def pack_context(
+    candidates: List[Candidate],
+    top_k: int,
+    budget_tokens: int = DEFAULT_CONTEXT_TOKENS,
+    lambda_: float = DEFAULT_MMR_LAMBDA,
+) -> List[Dict]:
+    """Turn raw hits into the tool result: MMR-pick `top_k` chunks, merge neighbours, fit the budget."""
+    selected = mmr_select(candidates, top_k, lambda_)
+    return [p.as_item() for p in fit_to_budget(merge_adjacent(selected), budget_tokens)]
@@ -0,0 +1,73 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from session_1.primitives.shared_utils import embed_texts
+from session_1.primitives.tokens import estimate_tokens
+
+
+# Azure embedding deployments cap both the number of inputs and the total tokens
+# per request; stay well below both so a batch never gets rejected.
+DEFAULT_BATCH_TOKENS = 16000
+DEFAULT_BATCH_SIZE = 256
+DEFAULT_MAX_IN_FLIGHT = 4
+
+
+class Chunk(NamedTuple):
+    source: str
+    index: int
+    text: str
+    # [start, end) character offsets of `text` within the source, when known.
+    start: Optional[int] = None
+    end: Optional[int] = None
+
+
+def batch_chunks(
+    chunks: Iterable[Chunk],
+    max_tokens: int = DEFAULT_BATCH_TOKENS,
+    max_items: int = DEFAULT_BATCH_SIZE,
+) -> Iterator[List[Chunk]]:
+    """Pack chunks (from any number of sources) into batches bounded by token count.
+
+    A single chunk larger than `max_tokens` still gets its own batch.
+    """
+    batch: List[Chunk] = []
+    batch_tokens = 0
+    for chunk in chunks:
+        tokens = estimate_tokens(chunk.text)
+        if batch and (batch_tokens + tokens > max_tokens or len(batch) >= max_items):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(chunk)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+
+def embed_batches(
+    batches: Iterable[List[Chunk]],
+    max_in_flight: int = DEFAULT_MAX_IN_FLIGHT,
+    embed_fn: Callable[[List[str]], List[List[float]]] = embed_texts,
+) -> Iterator[Tuple[List[Chunk], List[List[float]]]]:
+    """Embed batches with up to `max_in_flight` requests running at once.
+
+    Batches are pulled lazily from `batches`, and `(batch, vectors)` pairs are
+    yielded as soon as each request completes (not necessarily in input order).
+    """
+    max_in_flight = max(1, max_in_flight)
+    batches = iter(batches)
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        pending = {}
+        exhausted = False
+        while True:
+            while not exhausted and len(pending) < max_in_flight:
+                batch = next(batches, None)
+                if batch is None:
+                    exhausted = True
+                    break
+                pending[pool.submit(embed_fn, [c.text for c in batch])] = batch
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = pending.pop(future)
+                yield batch, future.result()
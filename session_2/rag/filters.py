@@ -0,0 +1,138 @@
+import os
+from datetime import datetime, timezone
+from typing import Collection, Dict, List, Optional, Tuple, Union
+
+from qdrant_client.http.models import FieldCondition, Filter, MatchAny, MatchValue, PayloadSchemaType, Range
+
+
+# Ingest-time payload fields retrieve_passages can filter on, and the Qdrant
+# payload index each one gets so filtered searches use the index.
+PAYLOAD_INDEXES: Dict[str, PayloadSchemaType] = {
+    "source": PayloadSchemaType.KEYWORD,
+    "source_dirs": PayloadSchemaType.KEYWORD,
+    "doc_type": PayloadSchemaType.KEYWORD,
+    "mtime": PayloadSchemaType.FLOAT,
+}
+# Fields holding lists: a match succeeds if any element matches, as in Qdrant.
+ARRAY_FIELDS = frozenset({"source_dirs"})
+
+
+def source_dirs(source: str) -> List[str]:
+    """Every ancestor directory of a source path, normalized with "/": a/b/c.txt -> [a, a/b].
+
+    Qdrant has no prefix match on keywords, so a path-prefix filter is an
+    exact match against this list.
+    """
+    parts = os.path.normpath(source).replace(os.sep, "/").split("/")[:-1]
+    return ["/".join(parts[: i + 1]) for i in range(len(parts)) if parts[i] not in ("", ".")]
+
+
+def doc_type(source: str) -> str:
+    return os.path.splitext(source)[1].lstrip(".").lower()
+
+
+def source_metadata(source: str) -> Dict:
+    """Payload fields describing a source file at ingest time."""
+    try:
+        mtime = os.path.getmtime(source)
+    except OSError:
+        mtime = None
+    return {"source_dirs": source_dirs(source), "doc_type": doc_type(source), "mtime": mtime}
+
+
+def _timestamp(value: Union[str, float, int, None]) -> Optional[float]:
+    """Epoch seconds from a number or an ISO-8601 date/datetime (UTC unless it says otherwise)."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def build_filter(
+    source: Union[str, List[str], None] = None,
+    path_prefix: Optional[str] = None,
+    doc_type: Union[str, List[str], None] = None,
+    modified_after: Union[str, float, None] = None,
+    modified_before: Union[str, float, None] = None,
+) -> Optional[Filter]:
+    """A Qdrant filter from retrieve_passages' filter arguments; None if none is set.
+
+    `source` and `doc_type` take one value or a list; `path_prefix` a
+    directory; the modified_* bounds epoch seconds or ISO-8601 dates.
+    """
+    must = []
+    if source:
+        sources = [source] if isinstance(source, str) else list(source)
+        must.append(FieldCondition(key="source", match=MatchAny(any=sources)))
+    if path_prefix:
+        prefix = os.path.normpath(path_prefix).replace(os.sep, "/").rstrip("/")
+        must.append(FieldCondition(key="source_dirs", match=MatchValue(value=prefix)))
+    if doc_type:
+        types = [doc_type] if isinstance(doc_type, str) else list(doc_type)
+        must.append(FieldCondition(key="doc_type", match=MatchAny(any=[t.lstrip(".").lower() for t in types])))
+    after, before = _timestamp(modified_after), _timestamp(modified_before)
+    if after is not None or before is not None:
+        must.append(FieldCondition(key="mtime", range=Range(gte=after, lt=before)))
+    return Filter(must=must) if must else None
+
+
+def _field(column: str, key: str) -> str:
+    # Must match the expression of the local store's payload indexes exactly.
+    return f"json_extract({column}, '$.\"{key}\"')"
+
+
+def _condition_sql(condition: FieldCondition, column: str, indexed_arrays: Collection[str]) -> Tuple[str, List]:
+    if not isinstance(condition, FieldCondition):
+        raise TypeError(f"Unsupported filter condition {type(condition).__name__}")
+    key = condition.key
+    if condition.match is not None:
+        match = condition.match
+        if not isinstance(match, (MatchValue, MatchAny)):
+            raise TypeError(f"Unsupported match {type(match).__name__}")
+        values = [match.value] if isinstance(match, MatchValue) else list(match.any)
+        marks = ",".join("?" * len(values))
+        if key in indexed_arrays:
+            return f"row IN (SELECT row FROM payload_values WHERE field = ? AND value IN ({marks}))", [key, *values]
+        if key in ARRAY_FIELDS:
+            return f"EXISTS (SELECT 1 FROM json_each({column}, '$.\"{key}\"') WHERE value IN ({marks}))", values
+        return f"{_field(column, key)} IN ({marks})", values
+    if condition.range is not None:
+        bounds = condition.range
+        parts, params = [], []
+        for op, bound in (("<", bounds.lt), ("<=", bounds.lte), (">", bounds.gt), (">=", bounds.gte)):
+            if bound is not None:
+                parts.append(f"{_field(column, key)} {op} ?")
+                params.append(bound)
+        return " AND ".join(parts) or "1", params
+    raise ValueError(f"Unsupported condition on {key!r}")
+
+
+def filter_sql(
+    query_filter: Optional[Filter], column: str = "payload", indexed_arrays: Collection[str] = ()
+) -> Tuple[str, List]:
+    """SQLite WHERE clause (and parameters) over a JSON payload column for a Qdrant filter.
+
+    Covers what build_filter produces: `must` conditions with MatchValue,
+    MatchAny or Range. Used by the local vector store and the BM25 index.
+    Elements of the `indexed_arrays` fields are looked up in the local
+    store's payload_values (field, value, row) table instead of the JSON.
+    """
+    if query_filter is None:
+        return "1", []
+    if query_filter.should or query_filter.must_not or getattr(query_filter, "min_should", None):
+        raise ValueError("Only `must` filters are supported here")
+    must = query_filter.must or []
+    clauses, params = [], []
+    for condition in must if isinstance(must, list) else [must]:
+        sql, values = _condition_sql(condition, column, indexed_arrays)
+        clauses.append(sql)
+        params.extend(values)
+    return " AND ".join(clauses) or "1", params
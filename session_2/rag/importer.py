@@ -1,102 +1,326 @@
 import argparse
+import json
 import os
-import uuid
-from typing import List, Tuple
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 from dotenv import load_dotenv
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import Distance, VectorParams, PointStruct
+from qdrant_client.http.models import (
+    PointIdsList,
+    PointStruct,
+    SetPayload,
+    SetPayloadOperation,
+)
 
+from session_1.primitives.embedding_cache import get_embedding_cache
 from session_1.primitives.shared_utils import embed_texts
+from session_1.primitives.tokens import CHARS_PER_TOKEN
+from session_1.primitives.tracing import format_stage_summary, span, tracing_enabled
+from session_2.rag.chunking import DEFAULT_CHUNK_TOKENS, DEFAULT_OVERLAP_TOKENS, TextSpan, iter_token_chunks
+from session_2.rag.collection_profiles import (
+    DEFAULT_PROFILE,
+    PROFILES,
+    collection_config,
+    get_profile,
+    record_collection_profile,
+)
+from session_2.rag.embedding_pipeline import (
+    DEFAULT_BATCH_SIZE,
+    DEFAULT_BATCH_TOKENS,
+    DEFAULT_MAX_IN_FLIGHT,
+    Chunk,
+    batch_chunks,
+    embed_batches,
+)
+from session_2.rag.filters import PAYLOAD_INDEXES, source_metadata
+from session_2.rag.journal import Journal, default_journal_path, load_journal
+from session_2.rag.local_store import LocalVectorStore
+from session_2.rag.manifest import (
+    Manifest,
+    bump_collection_version,
+    default_manifest_path,
+    in_scope,
+    load_manifest,
+    point_id_for,
+    save_manifest,
+    source_key,
+    stale_point_ids,
+)
 
+from session_2.rag.sparse_index import SparseIndex, default_sparse_index_path, open_sparse_index, remove_sparse_index
+from session_2.rag.uploader import DEFAULT_UPLOAD_BATCH_SIZE, DEFAULT_UPLOAD_WORKERS, PointUploader
+from session_2.rag.vector_store import VectorStore, create_vector_store
 
 load_dotenv()
 
 
 EMBEDDING_DIM = 1536
-
-
-def chunk_text(text: str, chunk_size: int = 300, overlap: int = 50) -> List[str]:
-    text = (text or "").strip()
-    if not text:
-        return []
-    chunks = []
-    start = 0
-    n = len(text)
-    while start < n:
-        end = min(n, start + chunk_size)
-        chunk = text[start:end]
-        if end < n:
-            split_at = chunk.rfind(" ")
-            if split_at > int(chunk_size * 0.6):
-                end = start + split_at
-                chunk = text[start:end]
-        chunks.append(chunk.strip())
-        if end >= n:
-            break
-        start = max(0, end - max(0, overlap))
-    return [c for c in chunks if c]
+DELETE_BATCH_SIZE = 1000
+READ_WINDOW_CHARS = 1 << 20
+# Arguments that decide which chunks (and point ids) a run produces; --resume
+# restores them from the interrupted run's journal.
+RESUME_ARGS = ("file", "dir", "chunk_tokens", "overlap_tokens", "incremental")
 
 
 def _embed_texts(texts: List[str]) -> List[List[float]]:
     return embed_texts(texts)
 
 
-def ensure_collection(client: QdrantClient, name: str, recreate: bool = False):
+def ensure_collection(
+    client: VectorStore, name: str, recreate: bool = False, profile: str = DEFAULT_PROFILE
+) -> bool:
+    """Make sure the collection exists. Returns True if it was (re)created empty.
+
+    `profile` (see collection_profiles.PROFILES) only applies when the
+    collection is created; an existing collection keeps its settings.
+    """
+    config = collection_config(get_profile(profile), EMBEDDING_DIM)
     if recreate:
-        client.recreate_collection(
-            collection_name=name,
-            vectors_config=VectorParams(size=EMBEDDING_DIM, distance=Distance.COSINE),
-        )
-        return
+        client.recreate_collection(collection_name=name, **config)
+        return True
     try:
         client.get_collection(name)
+        return False
     except Exception:
-        client.create_collection(
-            collection_name=name,
-            vectors_config=VectorParams(size=EMBEDDING_DIM, distance=Distance.COSINE),
-        )
+        client.create_collection(collection_name=name, **config)
+        return True
 
 
-def read_text_sources(file: str = None, dir: str = None) -> List[Tuple[str, str]]:
-    sources = []
+def ensure_payload_indexes(client: VectorStore, name: str):
+    """Index the payload fields retrieve_passages filters on, so filtered
+    searches narrow candidates through the index instead of post-filtering."""
+    for field, schema in PAYLOAD_INDEXES.items():
+        client.create_payload_index(collection_name=name, field_name=field, field_schema=schema)
+
+
+def iter_source_paths(file: str = None, dir: str = None) -> Iterator[str]:
     if file:
-        with open(file, "r", encoding="utf-8") as f:
-            sources.append((file, f.read()))
+        yield file
     if dir:
         for root, _, files in os.walk(dir):
             for fn in files:
                 if fn.lower().endswith((".txt", ".md")):
-                    path = os.path.join(root, fn)
-                    try:
-                        with open(path, "r", encoding="utf-8") as f:
-                            sources.append((path, f.read()))
-                    except Exception:
-                        pass
-    return sources
+                    yield os.path.join(root, fn)
+
+
+def iter_text_windows(path: str, window_chars: int = READ_WINDOW_CHARS) -> Iterator[str]:
+    """Read a text file in fixed-size buffered windows instead of all at once."""
+    with open(path, "r", encoding="utf-8") as f:
+        while True:
+            window = f.read(window_chars)
+            if not window:
+                return
+            yield window
+
+
+def _chunk_file(path: str, chunk_tokens: int, overlap_tokens: int) -> Tuple[Optional[str], int, Optional[str]]:
+    """Chunk one whole source into a spool file. Returns (spool path, chunk count, error message).
+
+    Spans are written to a temporary file as they are produced, so memory
+    stays bounded by the read window whatever the file size. A source that
+    fails to read or decode partway leaves no spool, so half a document
+    never reaches the collection (and an incremental run keeps the
+    source's existing points).
+    """
+    spool = tempfile.NamedTemporaryFile("w", encoding="utf-8", suffix=".chunks", delete=False)
+    count = 0
+    try:
+        with spool:
+            windows = iter_text_windows(path)
+            for span in iter_token_chunks(windows, max_tokens=chunk_tokens, overlap_tokens=overlap_tokens):
+                spool.write(json.dumps(span) + "\n")
+                count += 1
+    except (OSError, UnicodeDecodeError) as e:
+        os.remove(spool.name)
+        return None, 0, str(e)
+    return spool.name, count, None
+
+
+def _spooled_chunks(src_path: str, spool: str) -> Iterator[Chunk]:
+    """Stream a source's chunks back from its spool file, then delete it."""
+    try:
+        with open(spool, "r", encoding="utf-8") as f:
+            for idx, line in enumerate(f):
+                span = TextSpan(*json.loads(line))
+                yield Chunk(source=src_path, index=idx, text=span.text, start=span.start, end=span.end)
+    finally:
+        os.remove(spool)
+
+
+def _discard_spool(spool: Optional[str]):
+    if spool and os.path.exists(spool):
+        os.remove(spool)
+
+
+def iter_chunks(
+    paths: Iterable[str],
+    chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+    scanned: List[str] = None,
+    failed: List[str] = None,
+) -> Iterator[Chunk]:
+    """Stream chunks source by source.
+
+    Each source is chunked into a spool file first and its chunks are only
+    released once the whole file decoded, so memory is bounded by the read
+    window and the consumer's batches, not by the size of any source.
+    Successfully read paths are appended to `scanned`, the others to `failed`.
+    """
+    for src_path in paths:
+        spool, count, error = _chunk_file(src_path, chunk_tokens, overlap_tokens)
+        if error:
+            print(f"Skipping {src_path}: {error}")
+            if failed is not None:
+                failed.append(src_path)
+            continue
+        yield from _spooled_chunks(src_path, spool)
+        print(f"Processing {src_path}: {count} chunks")
+        if scanned is not None:
+            scanned.append(src_path)
 
 
-def upsert_chunks(
-    qdrant: QdrantClient,
+def iter_chunks_parallel(
+    paths: Iterable[str],
+    workers: int,
+    chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+    scanned: List[str] = None,
+    failed: List[str] = None,
+) -> Iterator[Chunk]:
+    """Like `iter_chunks`, but sources are read and chunked in a process pool.
+
+    Results are consumed in submission order, so chunks stream back in order
+    per source, and at most `workers * 4` sources are in flight at once.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        paths = iter(paths)
+        try:
+            while True:
+                for src_path in paths:
+                    pending.append((src_path, pool.submit(_chunk_file, src_path, chunk_tokens, overlap_tokens)))
+                    if len(pending) >= workers * 4:
+                        break
+                if not pending:
+                    return
+                src_path, future = pending.popleft()
+                spool, count, error = future.result()
+                if error:
+                    print(f"Skipping {src_path}: {error}")
+                    if failed is not None:
+                        failed.append(src_path)
+                    continue
+                yield from _spooled_chunks(src_path, spool)
+                print(f"Processing {src_path}: {count} chunks")
+                if scanned is not None:
+                    scanned.append(src_path)
+        finally:
+            # A consumer that stops early leaves spools of sources it never read.
+            for _, future in pending:
+                if not future.cancel() and future.exception() is None:
+                    _discard_spool(future.result()[0])
+
+
+def select_changed_chunks(
+    chunks: Iterator[Chunk],
+    previous: Manifest,
+    current: Manifest,
+    reindexed: Dict[str, int],
+) -> Iterator[Chunk]:
+    """Yield only chunks whose (source, content) was not ingested before.
+
+    Every chunk seen is recorded in `current`. Unchanged chunks whose position
+    in the source moved are collected in `reindexed` so their `chunk_index`
+    payload can be fixed without re-embedding.
+    """
+    for chunk in chunks:
+        key = source_key(chunk.source)
+        pid = point_id_for(chunk.source, chunk.text)
+        seen = current.setdefault(key, {})
+        if pid in seen:
+            # Identical text repeated within one source maps to one point.
+            continue
+        seen[pid] = chunk.index
+        old_index = previous.get(key, {}).get(pid)
+        if old_index is None:
+            yield chunk
+        elif old_index != chunk.index:
+            reindexed[pid] = chunk.index
+
+
+def update_chunk_indexes(
+    qdrant: VectorStore, collection: str, reindexed: Dict[str, int], sparse: Optional[SparseIndex] = None
+):
+    if not reindexed:
+        return
+    operations = [
+        SetPayloadOperation(set_payload=SetPayload(payload={"chunk_index": idx}, points=[pid]))
+        for pid, idx in reindexed.items()
+    ]
+    qdrant.batch_update_points(collection_name=collection, update_operations=operations)
+    if sparse is not None:
+        for pid, idx in reindexed.items():
+            sparse.set_payload({"chunk_index": idx}, [pid])
+
+
+def delete_points(qdrant: VectorStore, collection: str, point_ids: List[str], sparse: Optional[SparseIndex] = None):
+    for i in range(0, len(point_ids), DELETE_BATCH_SIZE):
+        qdrant.delete(
+            collection_name=collection,
+            points_selector=PointIdsList(points=point_ids[i : i + DELETE_BATCH_SIZE]),
+        )
+    if sparse is not None:
+        sparse.delete(point_ids)
+
+
+def refresh_source_metadata(
+    qdrant: VectorStore,
     collection: str,
-    chunks: List[str],
-    vectors: List[List[float]],
-    source: str,
+    sources: Iterable[str],
+    unchanged: Dict[str, List[str]],
+    sparse: Optional[SparseIndex] = None,
 ):
+    """Bring the skipped (unchanged) chunks of re-ingested sources up to date with
+    their source's current metadata, mtime in particular."""
+    operations, updates = [], []
+    for src in sources:
+        pids = unchanged.get(source_key(src))
+        if pids:
+            metadata = source_metadata(src)
+            operations.append(SetPayloadOperation(set_payload=SetPayload(payload=metadata, points=pids)))
+            updates.append((metadata, pids))
+    if not operations:
+        return
+    qdrant.batch_update_points(collection_name=collection, update_operations=operations)
+    if sparse is not None:
+        for metadata, pids in updates:
+            sparse.set_payload(metadata, pids)
+
+
+def build_points(chunks: List[Chunk], vectors: List[List[float]]) -> List[PointStruct]:
     points = []
-    for idx, (text, vec) in enumerate(zip(chunks, vectors)):
+    metadata: Dict[str, Dict] = {}
+    for chunk, vec in zip(chunks, vectors):
+        if chunk.source not in metadata:
+            metadata[chunk.source] = source_metadata(chunk.source)
         points.append(
             PointStruct(
-                id=str(uuid.uuid4()),
+                id=point_id_for(chunk.source, chunk.text),
                 vector=vec,
                 payload={
-                    "text": text,
-                    "source": source,
-                    "chunk_index": idx,
+                    "text": chunk.text,
+                    "source": chunk.source,
+                    "chunk_index": chunk.index,
+                    "char_start": chunk.start,
+                    "char_end": chunk.end,
+                    **metadata[chunk.source],
                 },
             )
         )
-    qdrant.upsert(collection_name=collection, points=points)
+    return points
 
 
 def main():
@@ -109,40 +333,287 @@ def main():
         help="Path to a directory of .txt/.md files (default: ./session_2/rag/data)",
     )
     parser.add_argument("--collection", type=str, default="session2_rag", help="Qdrant collection name")
-    parser.add_argument("--chunk-size", type=int, default=500, help="Chunk size in characters")
-    parser.add_argument("--overlap", type=int, default=50, help="Character overlap between chunks")
+    parser.add_argument(
+        "--chunk-tokens",
+        type=int,
+        default=DEFAULT_CHUNK_TOKENS,
+        help=f"Approximate chunk size in tokens (default: {DEFAULT_CHUNK_TOKENS})",
+    )
+    parser.add_argument(
+        "--overlap-tokens",
+        type=int,
+        default=DEFAULT_OVERLAP_TOKENS,
+        help=f"Approximate overlap between chunks in tokens, in whole sentences (default: {DEFAULT_OVERLAP_TOKENS})",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=None,
+        help=f"Deprecated: chunk size in characters, converted to --chunk-tokens (~{CHARS_PER_TOKEN} characters per token)",
+    )
+    parser.add_argument(
+        "--overlap",
+        type=int,
+        default=None,
+        help="Deprecated: overlap in characters, converted to --overlap-tokens",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Read and chunk sources in N worker processes (default: 0, in-process)",
+    )
+    parser.add_argument(
+        "--batch-tokens",
+        type=int,
+        default=DEFAULT_BATCH_TOKENS,
+        help=f"Approximate token budget per embedding request (default: {DEFAULT_BATCH_TOKENS})",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Maximum chunks per embedding request (default: {DEFAULT_BATCH_SIZE})",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=DEFAULT_MAX_IN_FLIGHT,
+        help=f"Embedding requests to keep in flight at once (default: {DEFAULT_MAX_IN_FLIGHT})",
+    )
+    parser.add_argument(
+        "--upload-batch-size",
+        type=int,
+        default=DEFAULT_UPLOAD_BATCH_SIZE,
+        help=f"Points per Qdrant upsert request (default: {DEFAULT_UPLOAD_BATCH_SIZE})",
+    )
+    parser.add_argument(
+        "--upload-workers",
+        type=int,
+        default=DEFAULT_UPLOAD_WORKERS,
+        help=f"Parallel Qdrant upload workers (default: {DEFAULT_UPLOAD_WORKERS})",
+    )
+    parser.add_argument(
+        "--wait",
+        action=argparse.BooleanOptionalAction,
+        default=False,
+        help="Wait for every upsert to be applied instead of only at the final flush",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=list(PROFILES),
+        default=os.getenv("QDRANT_COLLECTION_PROFILE", DEFAULT_PROFILE),
+        help="Storage/index profile used when the collection is created: "
+        + "; ".join(f"{name}: {p.description}" for name, p in PROFILES.items()),
+    )
+    parser.add_argument(
+        "--store",
+        type=str,
+        default=None,
+        help='Vector store URL: a Qdrant URL, ":memory:", or "local:<dir>" for the embedded store '
+        "(default: $VECTOR_STORE_URL, then $QDRANT_URL)",
+    )
+    parser.add_argument(
+        "--sparse",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Also maintain the BM25 index (.rag_state/<collection>.sparse.sqlite) used for hybrid search; "
+        "with --no-sparse an existing index is removed once the run changes the collection",
+    )
+    parser.add_argument(
+        "--grpc",
+        action=argparse.BooleanOptionalAction,
+        default=os.getenv("QDRANT_PREFER_GRPC", "").lower() in ("1", "true", "yes"),
+        help="Talk to Qdrant over gRPC (port 6334) instead of HTTP (default: $QDRANT_PREFER_GRPC)",
+    )
     
-    #NOTE: set to false to not recreate collection
-    parser.add_argument("--recreate", action="store_true", default=True, help="Drop and recreate collection") 
+    #NOTE: pass --no-recreate (or --incremental) to keep the existing collection
+    parser.add_argument(
+        "--recreate",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Drop and recreate collection",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only embed new/changed chunks and delete vanished ones (implies --no-recreate)",
+    )
+    parser.add_argument(
+        "--manifest",
+        type=str,
+        default=None,
+        help="Path of the local ingest manifest (default: .rag_state/<collection>.manifest.json)",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted import from its journal, skipping batches it already upserted (implies --no-recreate)",
+    )
     args = parser.parse_args()
+    if args.chunk_size is not None:
+        args.chunk_tokens = max(1, -(-args.chunk_size // CHARS_PER_TOKEN))
+        print(f"Note: --chunk-size is deprecated; using --chunk-tokens {args.chunk_tokens}")
+    if args.overlap is not None:
+        args.overlap_tokens = max(0, -(-args.overlap // CHARS_PER_TOKEN))
+        print(f"Note: --overlap is deprecated; using --overlap-tokens {args.overlap_tokens}")
+    journal_path = default_journal_path(args.collection)
+    resume_state = load_journal(journal_path) if args.resume else None
+    if args.resume:
+        if resume_state is None:
+            print("No interrupted import to resume; running normally without --recreate.")
+        else:
+            # Re-chunk exactly as the interrupted run did, so point ids match.
+            for key in RESUME_ARGS:
+                setattr(args, key, resume_state.args[key])
+            done = sum(len(points) for points in resume_state.points.values())
+            print(f"Resuming interrupted import: {done} chunks already upserted will be skipped")
+    if args.incremental or args.resume:
+        args.recreate = False
+    manifest_path = args.manifest or default_manifest_path(args.collection)
 
-    qdrant_url = os.getenv("QDRANT_URL", "http://localhost:6333")
     # Embedding deployment is handled by create_azure_embedding_client()
 
-    qdrant = QdrantClient(url=qdrant_url)
-    ensure_collection(qdrant, args.collection, recreate=args.recreate)
+    qdrant = create_vector_store(args.store, prefer_grpc=args.grpc)
+    created = ensure_collection(qdrant, args.collection, recreate=args.recreate, profile=args.profile)
+    if created:
+        # Cached search results (rag_agent) for this collection are now stale.
+        bump_collection_version(args.collection)
+        # rag_agent takes the profile's query-time oversampling from this.
+        record_collection_profile(args.collection, args.profile)
+    ensure_payload_indexes(qdrant, args.collection)
+    sparse = None
+    if args.sparse:
+        had_sparse = os.path.exists(default_sparse_index_path(args.collection))
+        sparse = open_sparse_index(args.collection, create=True)
+        if created:
+            sparse.clear()
+        elif not had_sparse:
+            print(
+                "Note: the collection predates its BM25 index; chunks skipped by this run stay out of "
+                "hybrid search until a run with --recreate."
+            )
+    elif created and remove_sparse_index(args.collection):
+        print("Removed the BM25 index: it described the collection before --recreate.")
+
+    # The manifest only describes what is in the collection if we kept it.
+    if resume_state and resume_state.recreated:
+        # The interrupted run started from an empty collection.
+        previous = {}
+    else:
+        previous = {} if created else load_manifest(manifest_path)
+    journal = Journal(journal_path)
+    if resume_state:
+        # Whatever the journal recorded is already in Qdrant: treat it as ingested.
+        for src, points in resume_state.points.items():
+            previous.setdefault(src, {}).update(points)
+        journal.reopen()
+    else:
+        journal.start({key: getattr(args, key) for key in RESUME_ARGS}, recreated=created)
+    if args.incremental:
+        # In-scope sources are rebuilt from this run's chunks.
+        current: Manifest = {
+            src: points for src, points in previous.items() if not in_scope(src, args.file, args.dir)
+        }
+    else:
+        current = {src: dict(points) for src, points in previous.items()}
 
+    # Sources are read and chunked lazily; chunks from all sources are packed
+    # into token-bounded batches, several batches are embedded concurrently,
+    # and each one is upserted as it lands. Memory is bounded by the batches in
+    # flight, not by corpus size.
     # Default to ./data if no --file provided; still honor explicit --dir
-    sources = read_text_sources(args.file, args.dir)
-    if not sources:
+    scanned: List[str] = []
+    failed: List[str] = []
+    paths = iter_source_paths(args.file, args.dir)
+    chunking = dict(chunk_tokens=args.chunk_tokens, overlap_tokens=args.overlap_tokens, scanned=scanned, failed=failed)
+    if args.workers > 1:
+        chunks = iter_chunks_parallel(paths, args.workers, **chunking)
+    else:
+        chunks = iter_chunks(paths, **chunking)
+    reindexed: Dict[str, int] = {}
+    if args.incremental or resume_state:
+        chunks = select_changed_chunks(chunks, previous, current, reindexed)
+    batches = batch_chunks(chunks, max_tokens=args.batch_tokens, max_items=args.batch_size)
+
+    total_chunks = 0
+    changed_sources = set()
+    started = time.perf_counter()
+    with PointUploader(
+        qdrant,
+        args.collection,
+        batch_size=args.upload_batch_size,
+        workers=args.upload_workers,
+        wait=args.wait,
+        on_uploaded=journal.record_batch,
+    ) as uploader:
+        for batch, vectors in embed_batches(batches, max_in_flight=args.max_in_flight, embed_fn=_embed_texts):
+            points = build_points(batch, vectors)
+            uploader.add(points)
+            if sparse is not None:
+                with span("import.keyword_index"):
+                    sparse.add(points)
+            for chunk in batch:
+                current.setdefault(source_key(chunk.source), {})[point_id_for(chunk.source, chunk.text)] = chunk.index
+            changed_sources.update(chunk.source for chunk in batch)
+            total_chunks += len(batch)
+            print(f"Embedded batch of {len(batch)} chunks ({total_chunks} so far)")
+    # Leaving the block flushed the uploader: every point is now applied.
+    for src in failed:
+        # An unreadable source keeps the points it already had.
+        key = source_key(src)
+        if key in previous:
+            current.setdefault(key, dict(previous[key]))
+
+    if not scanned:
         if args.dir:
             print(f"No sources found under '{args.dir}'. Ensure it contains .txt/.md files.")
         else:
             print("No sources found. Provide --file or --dir with .txt/.md files.")
-        return
 
-    total_chunks = 0
-    for src_path, content in sources:
-        chunks = chunk_text(content, chunk_size=args.chunk_size, overlap=args.overlap)
-        print(f"Processing {src_path}: {len(chunks)} chunks")
-        if not chunks:
-            continue
-        vectors = _embed_texts(chunks)
-        upsert_chunks(qdrant, args.collection, chunks, vectors, src_path)
-        print(f"Ingested {len(chunks)} chunks from {src_path}")
-        total_chunks += len(chunks)
+    stale: List[str] = []
+    if args.incremental:
+        scope = [src for src in previous if in_scope(src, args.file, args.dir)]
+        stale = stale_point_ids(previous, current, scope)
+    if sparse is None and (total_chunks or reindexed or stale) and remove_sparse_index(args.collection):
+        # Its postings and payloads no longer match the collection; rag_agent must not fuse them.
+        print("Removed the BM25 index: --no-sparse runs do not keep it in step with the collection.")
+    update_chunk_indexes(qdrant, args.collection, reindexed, sparse)
+    if args.incremental:
+        delete_points(qdrant, args.collection, stale, sparse)
+        unchanged = {
+            src: [pid for pid in current.get(src, {}) if pid in previous.get(src, {})]
+            for src in {source_key(path) for path in scanned}
+        }
+        # An edited source has a new mtime; its untouched chunks must carry it too.
+        refresh_source_metadata(qdrant, args.collection, changed_sources, unchanged, sparse)
+        print(
+            f"Incremental: {sum(map(len, unchanged.values()))} unchanged chunks skipped, "
+            f"{len(stale)} stale points deleted"
+        )
+    if isinstance(qdrant, LocalVectorStore) and qdrant.optimize(args.collection):
+        print(f"Built approximate search graph for '{args.collection}'")
+    if total_chunks or stale or reindexed:
+        bump_collection_version(args.collection)
+    save_manifest(manifest_path, current)
+    # Only now is the run complete; until here a crash leaves the journal for --resume.
+    journal.finish()
 
-    print(f"Done. Total chunks ingested: {total_chunks} into '{args.collection}'.")
+    elapsed = time.perf_counter() - started
+    rate = total_chunks / elapsed if elapsed > 0 else 0.0
+    print(
+        f"Done. Total chunks ingested: {total_chunks} into '{args.collection}' "
+        f"in {elapsed:.1f}s ({rate:.1f} chunks/s)."
+    )
+    cache = get_embedding_cache()
+    if cache:
+        stats = cache.stats()
+        print(
+            f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hit_rate']:.0%} hit rate, {stats['entries']} entries)"
+        )
+    if tracing_enabled():
+        print("Stages:\n" + format_stage_summary())
 
 
 if __name__ == "__main__":
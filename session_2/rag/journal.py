@@ -0,0 +1,97 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+from qdrant_client.http.models import PointStruct
+
+from session_2.rag.manifest import STATE_DIR, Manifest, source_key
+
+
+def default_journal_path(collection: str) -> str:
+    return os.path.join(STATE_DIR, f"{collection}.journal.jsonl")
+
+
+class JournalState(NamedTuple):
+    """What an interrupted import had durably finished."""
+
+    args: Dict
+    recreated: bool
+    points: Manifest
+
+
+def load_journal(path: str) -> Optional[JournalState]:
+    """Read an unfinished journal. Returns None if there is nothing to resume.
+
+    A torn final line (crash mid-write) is ignored.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return None
+    state = None
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            break
+        event = record.get("event")
+        if event == "start":
+            state = JournalState(args=record["args"], recreated=record["recreated"], points={})
+        elif event == "batch" and state:
+            for src, pid, idx in record["points"]:
+                state.points.setdefault(src, {})[pid] = idx
+        elif event == "done":
+            state = None
+    return state
+
+
+class Journal:
+    """Append-only, fsync'ed log of the batches an import has upserted.
+
+    Each "batch" line is written only after Qdrant acknowledged the upsert, so
+    everything in the journal is safe to skip when resuming.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._file = None
+
+    def start(self, args: Dict, recreated: bool):
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._append({"event": "start", "time": time.time(), "args": args, "recreated": recreated})
+
+    def reopen(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._append({"event": "resume", "time": time.time()})
+
+    def record_batch(self, points: List[PointStruct]):
+        self._append(
+            {
+                "event": "batch",
+                "points": [
+                    [source_key(p.payload["source"]), str(p.id), p.payload["chunk_index"]] for p in points
+                ],
+            }
+        )
+
+    def finish(self):
+        """Mark the import complete; the journal is removed once that is durable."""
+        self._append({"event": "done", "time": time.time()})
+        self._file.close()
+        os.remove(self.path)
+
+    def close(self):
+        if self._file and not self._file.closed:
+            self._file.close()
+
+    def _append(self, record: Dict):
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
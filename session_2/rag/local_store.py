@@ -0,0 +1,525 @@
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+from qdrant_client.http.models import (
+    CountResult,
+    Distance,
+    HnswConfigDiff,
+    PointIdsList,
+    PointStruct,
+    ScoredPoint,
+    SearchParams,
+    SetPayloadOperation,
+    UpdateResult,
+    UpdateStatus,
+    VectorParams,
+)
+
+from session_2.rag.filters import ARRAY_FIELDS, filter_sql
+
+try:
+    import hnswlib
+except ImportError:  # optional: without it every search is an exact scan
+    hnswlib = None
+
+
+DEFAULT_DTYPE = "float32"
+# Below this many points an exact scan is fast enough; from there on (with
+# hnswlib installed) optimize() builds an HNSW graph that searches go through.
+DEFAULT_GRAPH_MIN_POINTS = 20000
+# optimize() rebuilds the graph once this fraction of rows was added after it was built.
+GRAPH_STALE_FRACTION = 0.1
+# Defaults for collections created without an hnsw_config.
+GRAPH_M = 16
+GRAPH_EF_CONSTRUCTION = 100
+GRAPH_EF_SEARCH = 128
+_SCAN_ROWS = 65536
+_SQL_BATCH = 500
+_DTYPES = ("float32", "float16")
+
+
+class _Collection:
+    """One collection on disk.
+
+    vectors.<dtype>  row-major matrix, one row per point (normalized for cosine)
+    alive.u8         one byte per row; 0 once the point is deleted
+    points.sqlite    id -> row and JSON payload, plus the committed row count
+                     and the payload indexes
+    graph.hnsw       optional HNSW index over the first `graph_rows` rows
+
+    Vector rows are written before the SQLite commit that makes them visible,
+    so a crash never exposes a half-written row.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        self.dim: int = meta["dim"]
+        self.dtype = np.dtype(meta["dtype"])
+        self.distance: str = meta["distance"]
+        self.hnsw_m: int = meta.get("hnsw_m", GRAPH_M)
+        self.hnsw_ef_construct: int = meta.get("hnsw_ef_construct", GRAPH_EF_CONSTRUCTION)
+        self.row_bytes = self.dim * self.dtype.itemsize
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(os.path.join(path, "points.sqlite"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS points (id TEXT PRIMARY KEY, row INTEGER NOT NULL, payload TEXT NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS points_row ON points(row)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self.conn.commit()
+        self._vectors_path = os.path.join(path, f"vectors.{self.dtype.name}")
+        self._alive_path = os.path.join(path, "alive.u8")
+        self._graph_path = os.path.join(path, "graph.hnsw")
+        self._vectors_fd = os.open(self._vectors_path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._alive_fd = os.open(self._alive_path, os.O_RDWR | os.O_CREAT, 0o644)
+        self._vectors: Optional[np.ndarray] = None
+        self._alive: Optional[np.ndarray] = None
+        self._mapped_rows = 0
+        self._graph = None
+        self._graph_rows = 0
+        self._array_indexes = {
+            name[len("payload_values_") :]
+            for (name,) in self.conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+            if name.startswith("payload_values_") and not name.endswith(("_update", "_delete"))
+        }
+
+    @staticmethod
+    def create(path: str, config: VectorParams, dtype: str, hnsw_config: Optional[HnswConfigDiff] = None):
+        if config.distance not in (Distance.COSINE, Distance.DOT):
+            raise ValueError(f"Local vector store supports cosine and dot distance, not {config.distance}")
+        if dtype not in _DTYPES:
+            raise ValueError(f"Local vector store dtype must be one of {_DTYPES}, not {dtype!r}")
+        os.makedirs(path)
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "dim": config.size,
+                    "dtype": dtype,
+                    "distance": config.distance.value,
+                    "hnsw_m": (hnsw_config and hnsw_config.m) or GRAPH_M,
+                    "hnsw_ef_construct": (hnsw_config and hnsw_config.ef_construct) or GRAPH_EF_CONSTRUCTION,
+                },
+                f,
+            )
+
+    def close(self):
+        os.close(self._vectors_fd)
+        os.close(self._alive_fd)
+        self.conn.close()
+        self._vectors = self._alive = self._graph = None
+
+    # -- bookkeeping --------------------------------------------------------
+
+    def _meta(self, key: str) -> int:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def _set_meta(self, key: str, value: int):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def rows(self) -> int:
+        return self._meta("rows")
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM points").fetchone()[0]
+
+    def _rows_for(self, ids: Sequence[str]) -> Dict[str, int]:
+        found: Dict[str, int] = {}
+        for start in range(0, len(ids), _SQL_BATCH):
+            part = ids[start : start + _SQL_BATCH]
+            marks = ",".join("?" * len(part))
+            found.update(self.conn.execute(f"SELECT id, row FROM points WHERE id IN ({marks})", part).fetchall())
+        return found
+
+    def _view(self, rows: int):
+        """Memory-map the first `rows` rows (remapping after the files grew)."""
+        if rows > self._mapped_rows:
+            self._vectors = np.memmap(self._vectors_path, dtype=self.dtype, mode="r", shape=(rows, self.dim))
+            self._alive = np.memmap(self._alive_path, dtype=np.uint8, mode="r", shape=(rows,))
+            self._mapped_rows = rows
+        return self._vectors[:rows], self._alive[:rows]
+
+    def _normalize(self, vectors: np.ndarray) -> np.ndarray:
+        if self.distance == Distance.COSINE.value:
+            norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+            vectors = vectors / np.where(norms == 0, 1, norms)
+        return vectors
+
+    # -- writes -------------------------------------------------------------
+
+    def upsert(self, points: List[PointStruct]):
+        latest = {str(p.id): p for p in points}
+        ids = list(latest)
+        vectors = np.asarray([latest[pid].vector for pid in ids], dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of dimension {self.dim}, got shape {vectors.shape}")
+        vectors = self._normalize(vectors).astype(self.dtype)
+        with self.lock:
+            existing = self._rows_for(ids)
+            rows = self.rows()
+            new = [i for i, pid in enumerate(ids) if pid not in existing]
+            # New points are appended as one contiguous block.
+            if new:
+                os.pwrite(self._vectors_fd, vectors[new].tobytes(), rows * self.row_bytes)
+                os.pwrite(self._alive_fd, b"\x01" * len(new), rows)
+            assigned = {ids[i]: rows + n for n, i in enumerate(new)}
+            for i, pid in enumerate(ids):
+                row = existing.get(pid)
+                if row is not None:
+                    os.pwrite(self._vectors_fd, vectors[i].tobytes(), row * self.row_bytes)
+                    assigned[pid] = row
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO points (id, row, payload) VALUES (?, ?, ?)",
+                [(pid, assigned[pid], json.dumps(latest[pid].payload or {})) for pid in ids],
+            )
+            self._set_meta("rows", rows + len(new))
+            self.conn.commit()
+
+    def delete(self, ids: List[str]):
+        with self.lock:
+            found = self._rows_for([str(pid) for pid in ids])
+            for row in found.values():
+                # Row slots are not reused; the byte just hides them from search.
+                os.pwrite(self._alive_fd, b"\x00", row)
+            self.conn.executemany("DELETE FROM points WHERE id = ?", [(pid,) for pid in found])
+            self.conn.commit()
+
+    def set_payload(self, payload: Dict, ids: List[str]):
+        with self.lock:
+            for pid in ids:
+                row = self.conn.execute("SELECT payload FROM points WHERE id = ?", (str(pid),)).fetchone()
+                if row:
+                    merged = {**json.loads(row[0]), **payload}
+                    self.conn.execute("UPDATE points SET payload = ? WHERE id = ?", (json.dumps(merged), str(pid)))
+            self.conn.commit()
+
+    # -- search -------------------------------------------------------------
+
+    def create_payload_index(self, field: str):
+        """Index a payload field in SQLite so filters on it don't scan every payload.
+
+        Scalar fields get an expression index that also covers the row, so
+        matching rows come straight out of the index. The elements of array
+        fields (filters.ARRAY_FIELDS) go to a payload_values table, which
+        triggers keep in step with the points table.
+        """
+        if not re.fullmatch(r"\w+", field):
+            raise ValueError(f"Invalid payload field name: {field!r}")
+        path = f"'$.\"{field}\"'"
+        with self.lock:
+            if field not in ARRAY_FIELDS:
+                # Same expression filters.filter_sql emits, so SQLite picks the index up.
+                self.conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS payload_{field} ON points(json_extract(payload, {path}), row)"
+                )
+                self.conn.commit()
+                return
+            if field in self._array_indexes:
+                return
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS payload_values (field TEXT NOT NULL, value NOT NULL, row INTEGER NOT NULL,"
+                " PRIMARY KEY (field, value, row)) WITHOUT ROWID"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS payload_values_row ON payload_values(row)")
+            # A row keeps its slot when its point is replaced, so clearing by row is enough.
+            insert = (
+                f"DELETE FROM payload_values WHERE field = '{field}' AND row = NEW.row; "
+                f"INSERT OR IGNORE INTO payload_values (field, value, row) "
+                f"SELECT '{field}', value, NEW.row FROM json_each(NEW.payload, {path});"
+            )
+            self.conn.execute(f"CREATE TRIGGER payload_values_{field} AFTER INSERT ON points BEGIN {insert} END")
+            self.conn.execute(
+                f"CREATE TRIGGER payload_values_{field}_update AFTER UPDATE OF payload ON points BEGIN {insert} END"
+            )
+            self.conn.execute(
+                f"CREATE TRIGGER payload_values_{field}_delete AFTER DELETE ON points BEGIN "
+                f"DELETE FROM payload_values WHERE field = '{field}' AND row = OLD.row; END"
+            )
+            self.conn.execute(
+                f"INSERT OR IGNORE INTO payload_values (field, value, row) "
+                f"SELECT '{field}', j.value, p.row FROM points p, json_each(p.payload, {path}) j"
+            )
+            self.conn.commit()
+            self._array_indexes.add(field)
+
+    def filtered_rows(self, query_filter) -> np.ndarray:
+        """Rows of the points whose payload matches `query_filter`, ascending."""
+        where, params = filter_sql(query_filter, indexed_arrays=self._array_indexes)
+        with self.lock:
+            found = self.conn.execute(f"SELECT row FROM points WHERE {where}", params).fetchall()
+        return np.sort(np.fromiter((r[0] for r in found), dtype=np.int64, count=len(found)))
+
+    def search(
+        self, query: Sequence[float], limit: int, ef: Optional[int] = None, only_rows: Optional[np.ndarray] = None
+    ) -> List[tuple]:
+        """Return (score, row) pairs of the best `limit` live rows, best first.
+
+        With `only_rows` (a filter's matches) just those rows are scored,
+        exactly; the graph is only used for unfiltered searches.
+        """
+        q = self._normalize(np.asarray(query, dtype=np.float32))
+        with self.lock:
+            rows = self.rows()
+            if rows == 0 or limit <= 0:
+                return []
+            vectors, alive = self._view(rows)
+            if only_rows is not None:
+                candidates = self._scan_rows(vectors, alive, q, limit, only_rows[only_rows < rows])
+                candidates.sort(reverse=True)
+                return candidates[:limit]
+            graph = self._load_graph()
+            candidates = []
+            scan_from = 0
+            # The graph holds the rows alive when it was built; deletes since
+            # only flip their alive byte. hnswlib raises when asked for more
+            # neighbours than it holds.
+            if graph is not None and np.count_nonzero(alive[: self._graph_rows]) >= limit:
+                # Ask for extra neighbours to make up for deleted rows.
+                # hnswlib's "ip" distance is 1 - dot product.
+                k = min(graph.get_current_count(), limit * 2)
+                graph.set_ef(max(ef or GRAPH_EF_SEARCH, k))
+                labels, distances = graph.knn_query(q, k=k)
+                found = [(1.0 - float(d), int(row)) for row, d in zip(labels[0], distances[0]) if alive[row]]
+                # Too many neighbours deleted: fall back to the exact scan.
+                if len(found) >= limit:
+                    candidates = found
+                    # Rows added since the graph was built are scanned exactly.
+                    scan_from = self._graph_rows
+        candidates.extend(self._scan(vectors, alive, q, limit, scan_from))
+        candidates.sort(reverse=True)
+        return candidates[:limit]
+
+    def _scan(self, vectors: np.ndarray, alive: np.ndarray, q: np.ndarray, limit: int, start: int):
+        """Exact top-k by blocks of rows, so a float16 matrix is upcast one block at a time."""
+        out = []
+        for block_start in range(start, len(vectors), _SCAN_ROWS):
+            block = np.asarray(vectors[block_start : block_start + _SCAN_ROWS], dtype=np.float32)
+            scores = block @ q
+            scores[alive[block_start : block_start + len(block)] == 0] = -np.inf
+            k = min(limit, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            out.extend((float(scores[i]), block_start + int(i)) for i in top if scores[i] > -np.inf)
+        return out
+
+    def _scan_rows(self, vectors: np.ndarray, alive: np.ndarray, q: np.ndarray, limit: int, rows: np.ndarray):
+        out = []
+        for block_start in range(0, len(rows), _SCAN_ROWS):
+            part = rows[block_start : block_start + _SCAN_ROWS]
+            scores = np.asarray(vectors[part], dtype=np.float32) @ q
+            scores[alive[part] == 0] = -np.inf
+            k = min(limit, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            out.extend((float(scores[i]), int(part[i])) for i in top if scores[i] > -np.inf)
+        return out
+
+    def _load_graph(self):
+        graph_rows = self._meta("graph_rows")
+        if hnswlib is None or not graph_rows:
+            return None
+        if self._graph is None or self._graph_rows != graph_rows:
+            # Built by optimize(), possibly in another process.
+            graph = hnswlib.Index(space="ip", dim=self.dim)
+            graph.load_index(self._graph_path, max_elements=graph_rows)
+            self._graph, self._graph_rows = graph, graph_rows
+        return self._graph
+
+    def optimize(self, graph_min_points: int) -> bool:
+        """(Re)build the HNSW graph if the collection is big enough and the
+        graph is missing or stale. Returns True if a graph was built."""
+        with self.lock:
+            rows = self.rows()
+            graph_rows = self._meta("graph_rows")
+            if hnswlib is None or self.count() < graph_min_points:
+                return False
+            if graph_rows and rows - graph_rows <= GRAPH_STALE_FRACTION * graph_rows:
+                return False
+            vectors, alive = self._view(rows)
+            live = np.flatnonzero(alive)
+            graph = hnswlib.Index(space="ip", dim=self.dim)
+            graph.init_index(max_elements=rows, ef_construction=self.hnsw_ef_construct, M=self.hnsw_m)
+            for start in range(0, len(live), _SCAN_ROWS):
+                part = live[start : start + _SCAN_ROWS]
+                graph.add_items(np.asarray(vectors[part], dtype=np.float32), part)
+            # Write to a temporary file so readers never load a partial graph.
+            tmp_path = self._graph_path + ".tmp"
+            graph.save_index(tmp_path)
+            os.replace(tmp_path, self._graph_path)
+            self._set_meta("graph_rows", rows)
+            self.conn.commit()
+            self._graph, self._graph_rows = graph, rows
+            return True
+
+    def payloads(self, rows: List[int]) -> Dict[int, tuple]:
+        """Map rows to (id, payload)."""
+        marks = ",".join("?" * len(rows))
+        result = self.conn.execute(f"SELECT row, id, payload FROM points WHERE row IN ({marks})", rows).fetchall()
+        return {row: (pid, json.loads(payload)) for row, pid, payload in result}
+
+
+class LocalVectorStore:
+    """In-process vector store with the subset of the QdrantClient API used here.
+
+    Each collection lives in its own directory under `path`. Vectors are kept
+    in a memory-mapped float32 matrix, so opening a store is instant regardless
+    of its size; float16 halves disk and page cache at the cost of slower
+    scans (NumPy upcasts each block before the dot product). Search is an
+    exact, vectorized dot-product scan. With `hnswlib` installed, `optimize()`
+    builds an HNSW graph for collections of at least `graph_min_points`
+    points, and searches then go through it (approximate); rows added since
+    the last build are still scanned exactly. Filtered searches (the `must`
+    conditions filters.build_filter produces) select matching rows in SQLite,
+    using payload indexes when present, and score only those.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        dtype: str = DEFAULT_DTYPE,
+        graph_min_points: int = DEFAULT_GRAPH_MIN_POINTS,
+    ):
+        if dtype not in _DTYPES:
+            raise ValueError(f"Local vector store dtype must be one of {_DTYPES}, not {dtype!r}")
+        self.path = path
+        self.dtype = dtype
+        self.graph_min_points = graph_min_points
+        self._collections: Dict[str, _Collection] = {}
+        self._lock = threading.Lock()
+        os.makedirs(path, exist_ok=True)
+
+    def _dir(self, name: str) -> str:
+        if not name or os.sep in name or name.startswith("."):
+            raise ValueError(f"Invalid collection name: {name!r}")
+        return os.path.join(self.path, name)
+
+    def _collection(self, name: str) -> _Collection:
+        with self._lock:
+            coll = self._collections.get(name)
+            if coll is None:
+                if not self.collection_exists(name):
+                    raise ValueError(f"Collection {name} not found")
+                coll = self._collections[name] = _Collection(self._dir(name))
+            return coll
+
+    # -- collections --------------------------------------------------------
+
+    def collection_exists(self, collection_name: str) -> bool:
+        return os.path.exists(os.path.join(self._dir(collection_name), "meta.json"))
+
+    def get_collection(self, collection_name: str) -> Dict:
+        coll = self._collection(collection_name)
+        return {"dim": coll.dim, "dtype": coll.dtype.name, "distance": coll.distance, "points_count": coll.count()}
+
+    def create_collection(
+        self,
+        collection_name: str,
+        vectors_config: VectorParams,
+        hnsw_config: Optional[HnswConfigDiff] = None,
+        **kwargs,
+    ) -> bool:
+        """Create a collection. `hnsw_config` sizes the optional graph index;
+        `quantization_config` and `on_disk` are Qdrant-only and ignored here
+        (LOCAL_STORE_DTYPE=float16 is the local way to save memory)."""
+        if self.collection_exists(collection_name):
+            raise ValueError(f"Collection {collection_name} already exists")
+        _Collection.create(self._dir(collection_name), vectors_config, self.dtype, hnsw_config)
+        return True
+
+    def delete_collection(self, collection_name: str, **kwargs) -> bool:
+        with self._lock:
+            coll = self._collections.pop(collection_name, None)
+            if coll:
+                coll.close()
+            if not self.collection_exists(collection_name):
+                return False
+            shutil.rmtree(self._dir(collection_name))
+            return True
+
+    def recreate_collection(self, collection_name: str, vectors_config: VectorParams, **kwargs) -> bool:
+        self.delete_collection(collection_name)
+        return self.create_collection(collection_name, vectors_config, **kwargs)
+
+    # -- points -------------------------------------------------------------
+
+    def upsert(self, collection_name: str, points: List[PointStruct], wait: bool = True, **kwargs) -> UpdateResult:
+        self._collection(collection_name).upsert(points)
+        return UpdateResult(status=UpdateStatus.COMPLETED)
+
+    def delete(self, collection_name: str, points_selector: PointIdsList, wait: bool = True, **kwargs) -> UpdateResult:
+        if not isinstance(points_selector, PointIdsList):
+            raise TypeError("Local vector store only deletes by PointIdsList")
+        self._collection(collection_name).delete(points_selector.points)
+        return UpdateResult(status=UpdateStatus.COMPLETED)
+
+    def batch_update_points(self, collection_name: str, update_operations: List, wait: bool = True, **kwargs):
+        coll = self._collection(collection_name)
+        for op in update_operations:
+            if not isinstance(op, SetPayloadOperation):
+                raise TypeError(f"Local vector store does not support {type(op).__name__}")
+            coll.set_payload(op.set_payload.payload, op.set_payload.points)
+        return [UpdateResult(status=UpdateStatus.COMPLETED) for _ in update_operations]
+
+    def count(self, collection_name: str, exact: bool = True, **kwargs) -> CountResult:
+        return CountResult(count=self._collection(collection_name).count())
+
+    def search(
+        self,
+        collection_name: str,
+        query_vector: Sequence[float],
+        limit: int = 10,
+        score_threshold: Optional[float] = None,
+        with_payload: bool = True,
+        with_vectors: bool = False,
+        query_filter=None,
+        search_params: Optional[SearchParams] = None,
+        **kwargs,
+    ) -> List[ScoredPoint]:
+        coll = self._collection(collection_name)
+        only_rows = coll.filtered_rows(query_filter) if query_filter is not None else None
+        if only_rows is not None and not len(only_rows):
+            return []
+        hits = coll.search(query_vector, limit, ef=search_params and search_params.hnsw_ef, only_rows=only_rows)
+        if score_threshold is not None:
+            hits = [(score, row) for score, row in hits if score >= score_threshold]
+        if not hits:
+            return []
+        with coll.lock:
+            found = coll.payloads([row for _, row in hits])
+            vectors = coll._view(coll.rows())[0] if with_vectors else None
+        return [
+            ScoredPoint(
+                id=found[row][0],
+                version=0,
+                score=score,
+                payload=found[row][1] if with_payload else None,
+                # Stored vectors are normalized for cosine collections, as in Qdrant.
+                vector=np.asarray(vectors[row], dtype=np.float32).tolist() if with_vectors else None,
+            )
+            for score, row in hits
+            # A point deleted since the scan has no payload row any more.
+            if row in found
+        ]
+
+    def create_payload_index(self, collection_name: str, field_name: str, field_schema=None, **kwargs) -> UpdateResult:
+        """Index a payload field for filtered search; `field_schema` only matters to Qdrant."""
+        self._collection(collection_name).create_payload_index(field_name)
+        return UpdateResult(status=UpdateStatus.COMPLETED)
+
+    def optimize(self, collection_name: str) -> bool:
+        """Build or refresh the collection's approximate graph index (see `_Collection.optimize`)."""
+        return self._collection(collection_name).optimize(self.graph_min_points)
+
+    def close(self):
+        with self._lock:
+            for coll in self._collections.values():
+                coll.close()
+            self._collections.clear()
@@ -0,0 +1,94 @@
+import hashlib
+import json
+import os
+import uuid
+from typing import Dict, Iterable, List
+
+
+# Local bookkeeping for the importer (manifests, journals) lives here.
+STATE_DIR = ".rag_state"
+MANIFEST_VERSION = 1
+
+# Fixed namespace so the same (source, content) pair always maps to the same point ID.
+POINT_NAMESPACE = uuid.UUID("6f1c2a9e-3b8d-5c47-9a0e-2d4b7c1e8f53")
+
+# {normalized source path: {point_id: chunk_index}}
+Manifest = Dict[str, Dict[str, int]]
+
+
+def default_manifest_path(collection: str) -> str:
+    return os.path.join(STATE_DIR, f"{collection}.manifest.json")
+
+
+def source_key(source: str) -> str:
+    return os.path.normpath(source)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def point_id_for(source: str, text: str) -> str:
+    """Deterministic Qdrant point ID derived from source path and chunk content."""
+    return str(uuid.uuid5(POINT_NAMESPACE, f"{source_key(source)}:{content_hash(text)}"))
+
+
+def load_manifest(path: str) -> Manifest:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    if data.get("version") != MANIFEST_VERSION:
+        return {}
+    return {src: dict(points) for src, points in data.get("sources", {}).items()}
+
+
+def save_manifest(path: str, manifest: Manifest):
+    """Write the manifest atomically so a crash never leaves a half-written file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "sources": manifest}, f)
+    os.replace(tmp_path, path)
+
+
+def collection_version(collection: str) -> str:
+    """Token that changes whenever the importer modified `collection` ("" if never)."""
+    try:
+        with open(os.path.join(STATE_DIR, f"{collection}.version"), "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
+
+
+def bump_collection_version(collection: str) -> str:
+    """Record that `collection` changed, invalidating cached search results."""
+    path = os.path.join(STATE_DIR, f"{collection}.version")
+    os.makedirs(STATE_DIR, exist_ok=True)
+    token = uuid.uuid4().hex
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(token)
+    os.replace(tmp_path, path)
+    return token
+
+
+def in_scope(source: str, file: str = None, dir: str = None) -> bool:
+    """True if `source` is covered by the --file/--dir arguments of this run."""
+    key = source_key(source)
+    if file and key == source_key(file):
+        return True
+    if dir:
+        root = source_key(dir)
+        return root == "." or key == root or key.startswith(root + os.sep)
+    return False
+
+
+def stale_point_ids(previous: Manifest, current: Manifest, scope: Iterable[str]) -> List[str]:
+    """Point IDs recorded previously for in-scope sources that this run no longer produced."""
+    stale = []
+    for src in scope:
+        keep = current.get(src, {})
+        stale.extend(pid for pid in previous.get(src, {}) if pid not in keep)
+    return stale
@@ -1,16 +1,55 @@
+import asyncio
 import os
 import json
-from typing import List
+import hashlib
+import re
+from array import array
+from typing import Dict, List, Optional, Union
 
 from dotenv import load_dotenv
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import Filter, FieldCondition, MatchValue
+from qdrant_client.http.models import Filter
 
-from session_1.primitives.shared_utils import create_azure_openai_client, embed_query
+from session_1.primitives.async_core import ToolChatSession
+from session_1.primitives.client_registry import close_async_clients, warm_up_from_env_async
+from session_1.primitives.shared_utils import (
+    TextPrinter,
+    embed_query,
+    embed_query_async,
+    format_timing,
+    streaming_enabled,
+)
+from session_1.primitives.tool_executor import ToolExecutor
+from session_1.primitives.tracing import format_stage_summary, span, tracing_enabled
+from session_1.primitives.ttl_cache import TTLCache
+from session_2.rag.collection_profiles import collection_profile, search_params
+from session_2.rag.context_packer import DEFAULT_CONTEXT_TOKENS, DEFAULT_MMR_LAMBDA, Candidate, pack_context
+from session_2.rag.filters import build_filter
+from session_2.rag.manifest import collection_version
+from session_2.rag.sparse_index import SparseIndex, open_sparse_index, reciprocal_rank_fusion
+from session_2.rag.vector_store import create_async_vector_store, create_vector_store, store_url
 
 
 load_dotenv()
 
+SCORE_THRESHOLD = 0.4
+# Hybrid search and context packing draw from this many times top_k
+# candidates per retriever; RRF_K damps the weight of the top fused ranks.
+HYBRID_CANDIDATES = 3
+RRF_K = 60
+
+# Repeated (or re-cased / re-spaced) queries within a conversation skip the
+# embedding call; identical searches skip the vector store. Size 0 disables.
+_query_vectors = TTLCache(
+    int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("QUERY_EMBEDDING_CACHE_TTL", "3600")),
+)
+# Entries are keyed by the collection version the importer bumps on every
+# change; the TTL bounds staleness when the importer runs on another machine.
+_search_results = TTLCache(
+    int(os.getenv("SEARCH_RESULT_CACHE_SIZE", "256")),
+    ttl=float(os.getenv("SEARCH_RESULT_CACHE_TTL", "300")),
+)
+
 
 def _require_env(key: str, hint: str) -> str:
     val = os.getenv(key)
@@ -21,38 +60,219 @@ def _require_env(key: str, hint: str) -> str:
     return val
 
 
-def _embed_query(text: str) -> List[float]:
+def _normalize_query(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().casefold()
+
+
+def _query_key(text: str):
     embedding_deployment = _require_env(
         "AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME",
         "Set it to your Azure embedding deployment name (not the base model id), e.g. 'emb-small'.",
     )
-    return embed_query(text, model=embedding_deployment)
+    return embedding_deployment, _normalize_query(text)
+
+
+def _embed_query(text: str) -> List[float]:
+    key = _query_key(text)
+    vec = _query_vectors.get(key)
+    if vec is None:
+        vec = embed_query(text, model=key[0])
+        _query_vectors.put(key, vec)
+    return vec
+
+
+async def _embed_query_async(text: str) -> List[float]:
+    key = _query_key(text)
+    vec = _query_vectors.get(key)
+    if vec is None:
+        vec = await embed_query_async(text, model=key[0])
+        _query_vectors.put(key, vec)
+    return vec
+
+
+def _vector_digest(vec: List[float]) -> str:
+    return hashlib.blake2b(array("f", vec).tobytes(), digest_size=16).hexdigest()
+
+
+def hybrid_enabled() -> bool:
+    return os.getenv("HYBRID_SEARCH", "true").strip().lower() not in ("0", "false", "no", "off")
+
 
+def _sparse_index(collection: str) -> Optional[SparseIndex]:
+    """The collection's BM25 index when hybrid search is on and the importer built one."""
+    return open_sparse_index(collection) if hybrid_enabled() else None
 
-def retrieve_passages(query: str, top_k: int = 4, collection: str = "session2_rag") -> str:
-    qdrant_url = os.getenv("QDRANT_URL", "http://localhost:6333")
-    qdrant_api_key = os.getenv("QDRANT_API_KEY")
-    vec = _embed_query(query)
-    client = QdrantClient(url=qdrant_url, api_key=qdrant_api_key)
 
-    search_result = client.search(
-        collection_name=collection,
-        query_vector=vec,
-        limit=max(1, min(top_k, 10)),
-        score_threshold=0.4,
+def packing_settings() -> Optional[Dict]:
+    """Context packer settings (CONTEXT_PACKING, CONTEXT_TOKEN_BUDGET, MMR_LAMBDA), or None when off."""
+    if os.getenv("CONTEXT_PACKING", "true").strip().lower() in ("0", "false", "no", "off"):
+        return None
+    return {
+        "budget_tokens": int(os.getenv("CONTEXT_TOKEN_BUDGET", DEFAULT_CONTEXT_TOKENS)),
+        "lambda_": float(os.getenv("MMR_LAMBDA", DEFAULT_MMR_LAMBDA)),
+    }
+
+
+def _limit(top_k) -> int:
+    return max(1, min(int(top_k), 10))
+
+
+def _search_request(
+    vec: List[float],
+    top_k: int,
+    collection: str,
+    hybrid_query: Optional[str] = None,
+    query_filter: Optional[Filter] = None,
+):
+    """The search arguments for one retrieval and the result-cache key for them.
+
+    `hybrid_query` is the query text for the BM25 side of a hybrid search.
+    With context packing on, stored vectors come back for MMR.
+    """
+    hybrid = hybrid_query is not None
+    packing = packing_settings()
+    limit = _limit(top_k)
+    request = {
+        "collection_name": collection,
+        "query_vector": vec,
+        "limit": limit * HYBRID_CANDIDATES if hybrid or packing else limit,
+        "score_threshold": SCORE_THRESHOLD,
+        # Oversampling/rescoring for quantized collections; see collection_profiles.
+        "search_params": search_params(collection_profile(collection)),
+    }
+    if packing:
+        request["with_vectors"] = True
+    if query_filter is not None:
+        # Applied inside the search (through the payload indexes the importer
+        # creates), so a narrow filter still fills `limit`.
+        request["query_filter"] = query_filter
+    key = (
+        store_url(),
+        collection,
+        collection_version(collection),
+        _vector_digest(vec),
+        limit,
+        # BM25 results depend on the words, not just the embedding.
+        _normalize_query(hybrid_query) if hybrid else None,
+        SCORE_THRESHOLD,
+        str(request["search_params"]),
+        str(packing),
+        str(query_filter),
     )
+    return request, key
+
+
+def _candidates(dense_points, sparse_hits=None) -> List[Candidate]:
+    """Hits ranked best first; with BM25 hits, fused by reciprocal rank (score = fused score)."""
+    dense = [
+        # Named-vector collections return a dict; MMR then compares texts instead.
+        Candidate(str(p.id), p.score, p.payload or {}, p.vector if isinstance(p.vector, list) else None)
+        for p in dense_points
+    ]
+    if sparse_hits is None:
+        return dense
+    by_id = {c.id: c for c in dense}
+    for _, pid, payload in sparse_hits:
+        by_id.setdefault(pid, Candidate(pid, 0.0, payload))
+    fused = reciprocal_rank_fusion([[c.id for c in dense], [pid for _, pid, _ in sparse_hits]], RRF_K)
+    return [by_id[pid]._replace(score=score) for pid, score in fused]
+
+
+def _result_items(candidates: List[Candidate], top_k) -> List[Dict]:
+    """The tool result: packed passages (see context_packer), or the top hits as they are."""
+    packing = packing_settings()
+    if packing:
+        return pack_context(candidates, _limit(top_k), **packing)
+    return [
+        {"text": c.payload.get("text"), "source": c.payload.get("source"), "score": c.score}
+        for c in candidates[: _limit(top_k)]
+    ]
 
-    items = []
-    for p in search_result:
-        items.append(
-            {
-                "text": p.payload.get("text"),
-                "source": p.payload.get("source"),
-                "score": p.score,
-            }
-        )
-    
-    return json.dumps({"results": items})
+
+def retrieve_passages(
+    query: str,
+    top_k: int = 4,
+    collection: str = "session2_rag",
+    source: Union[str, List[str], None] = None,
+    path_prefix: Optional[str] = None,
+    doc_type: Union[str, List[str], None] = None,
+    modified_after: Union[str, float, None] = None,
+    modified_before: Union[str, float, None] = None,
+) -> str:
+    """Dense vector search, fused with BM25 keyword search when the collection has a sparse index.
+
+    The keyword side catches exact names and numbers the embedding misses,
+    so the model rarely needs to retry with a reworded query. The other
+    arguments restrict the search to matching chunks (see filters.build_filter).
+    """
+    with span("retrieval"):
+        sparse = _sparse_index(collection)
+        query_filter = build_filter(source, path_prefix, doc_type, modified_after, modified_before)
+        with span("retrieval.embed_query"):
+            vec = _embed_query(query)
+        request, key = _search_request(vec, top_k, collection, query if sparse is not None else None, query_filter)
+        items = _search_results.get(key)
+        if items is None:
+            # VECTOR_STORE_URL / QDRANT_URL; "local:<dir>" searches the embedded store.
+            client = create_vector_store()
+            with span("retrieval.vector_search"):
+                points = client.search(**request)
+            sparse_hits = _keyword_search(sparse, query, request["limit"], query_filter) if sparse is not None else None
+            with span("retrieval.pack"):
+                items = _result_items(_candidates(points, sparse_hits), top_k)
+            _search_results.put(key, items)
+
+        return json.dumps({"results": items})
+
+
+async def retrieve_passages_async(
+    query: str,
+    top_k: int = 4,
+    collection: str = "session2_rag",
+    source: Union[str, List[str], None] = None,
+    path_prefix: Optional[str] = None,
+    doc_type: Union[str, List[str], None] = None,
+    modified_after: Union[str, float, None] = None,
+    modified_before: Union[str, float, None] = None,
+) -> str:
+    """retrieve_passages() on the async clients; shares its caches and trace stages."""
+    with span("retrieval"):
+        sparse = _sparse_index(collection)
+        query_filter = build_filter(source, path_prefix, doc_type, modified_after, modified_before)
+        with span("retrieval.embed_query"):
+            vec = await _embed_query_async(query)
+        request, key = _search_request(vec, top_k, collection, query if sparse is not None else None, query_filter)
+        items = _search_results.get(key)
+        if items is None:
+            client = create_async_vector_store()
+            if sparse is None:
+                points, sparse_hits = await _traced("retrieval.vector_search", client.search(**request)), None
+            else:
+                # The keyword search runs in a thread while the vector store answers.
+                points, sparse_hits = await asyncio.gather(
+                    _traced("retrieval.vector_search", client.search(**request)),
+                    asyncio.to_thread(_keyword_search, sparse, query, request["limit"], query_filter),
+                )
+            with span("retrieval.pack"):
+                items = _result_items(_candidates(points, sparse_hits), top_k)
+            _search_results.put(key, items)
+
+        return json.dumps({"results": items})
+
+
+async def _traced(stage: str, awaitable):
+    with span(stage):
+        return await awaitable
+
+
+def _keyword_search(sparse: SparseIndex, query: str, limit: int, query_filter: Optional[Filter]):
+    with span("retrieval.keyword_search"):
+        return sparse.search(query, limit, query_filter)
+
+
+def retrieval_cache_stats() -> Dict[str, Dict[str, float]]:
+    """Hit rates and sizes of the query-embedding and search-result caches."""
+    return {"query_embeddings": _query_vectors.stats(), "search_results": _search_results.stats()}
 
 
 tools = [
@@ -67,6 +287,17 @@ tools = [
                     "query": {"type": "string", "description": "Natural language query. Improve it to get better results."},
                     "top_k": {"type": "number", "description": "Number of chunks to retrieve (1-10)", "default": 4},
                     "collection": {"type": "string", "description": "Qdrant collection name", "default": "session2_rag"},
+                    "source": {"type": "string", "description": "Only search this source file (path as imported)"},
+                    "path_prefix": {"type": "string", "description": "Only search sources under this directory"},
+                    "doc_type": {"type": "string", "description": "Only search this file type, e.g. 'md' or 'txt'"},
+                    "modified_after": {
+                        "type": "string",
+                        "description": "Only search sources modified on or after this ISO date, e.g. '2024-05-01'",
+                    },
+                    "modified_before": {
+                        "type": "string",
+                        "description": "Only search sources modified before this ISO date",
+                    },
                 },
                 "required": ["query"],
             },
@@ -75,90 +306,80 @@ tools = [
 ]
 
 
+def _print_cache_stats():
+    for name, stats in retrieval_cache_stats().items():
+        print(
+            f"🗃️  {name}: {stats['hits']} hits / {stats['misses']} misses "
+            f"({stats['hit_rate']:.0%}), {stats['entries']}/{stats['max_entries']} entries"
+        )
+
+
+def _print_retrieval(step, turn):
+    print("🔎 Retrieving relevant passages...")
+    if len(turn.results) > 1:
+        print(f"⏱️  {turn.summary()}")
+
+
 def demonstrate_rag_agent():
+    asyncio.run(_rag_agent())
+
+
+async def _rag_agent():
     print("\n" + "=" * 60)
     print("RAG AGENT (Retriever as Tool)")
     print("Ask questions about your imported texts.")
     print("Type 'quit' to exit")
     print("=" * 60 + "\n")
 
-    client = create_azure_openai_client()
+    await warm_up_from_env_async()
     deployment_name = _require_env(
         "AZURE_DEPLOYMENT_NAME",
         "Set it to your Azure chat/completions deployment name (not the base model id).",
     )
+    session = ToolChatSession(
+        (
+            "You are a helpful assistant that answers using a retriever tool when helpful."
+            " When tool results are available, cite relevant snippets concisely."
+        ),
+        deployment_name,
+        tools,
+        ToolExecutor({"retrieve_passages": retrieve_passages_async}),
+        temperature=0.3,
+        stream=streaming_enabled(),
+    )
 
-    messages = [
-        {
-            "role": "system",
-            "content": (
-                "You are a helpful assistant that answers using a retriever tool when helpful."
-                " When tool results are available, cite relevant snippets concisely."
-            ),
-        }
-    ]
+    questions = retrievals = 0
+    try:
+        while True:
+            user_input = await asyncio.to_thread(input, "\nYou: ")
+            if user_input.strip().lower() == "quit":
+                print("Goodbye!")
+                _print_cache_stats()
+                if tracing_enabled():
+                    print("⏱️  Stages:\n" + format_stage_summary())
+                if questions:
+                    print(f"🔁 {retrievals} retrieval(s) for {questions} question(s)")
+                break
 
-    while True:
-        user_input = input("\nYou: ")
-        if user_input.strip().lower() == "quit":
-            print("Goodbye!")
-            break
-
-        messages.append({"role": "user", "content": user_input})
-
-        try:
-            response = client.chat.completions.create(
-                model=deployment_name,
-                messages=messages,
-                tools=tools,
-                tool_choice="auto",
-                temperature=0.3,
-            )
-
-            first = response.choices[0].message
-            tool_calls = first.tool_calls
-
-            if tool_calls:
-                messages.append(first)
-                for call in tool_calls:
-                    fn = call.function.name
-                    args = json.loads(call.function.arguments or "{}")
-                    if fn == "retrieve_passages":
-                        print("🔎 Retrieving relevant passages...")
-                        result = retrieve_passages(**args)
-                        messages.append(
-                            {
-                                "tool_call_id": call.id,
-                                "role": "tool",
-                                "name": fn,
-                                "content": result,
-                            }
-                        )
-
-                follow_up = client.chat.completions.create(
-                    model=deployment_name,
-                    messages=messages,
-                    temperature=0.3,
-                )
-                final = follow_up.choices[0].message.content
-                usage = follow_up.usage
-                print(f"\nAssistant: {final}")
+            try:
+                printer = TextPrinter("\nAssistant: ")
+                result = await session.send(user_input, on_turn=_print_retrieval, on_text=printer)
+                questions += 1
+                retrievals += sum(len(turn.results) for turn in result.turns)
+                usage = result.usage
+                if not printer.finish():
+                    print(f"\nAssistant: {result.content}")
                 print(
-                    f"📊 Tokens - Input: {usage.prompt_tokens}, Output: {usage.completion_tokens}, Total: {usage.total_tokens}"
+                    f"📊 Tokens - Input: {usage['input_tokens']}, Output: {usage['output_tokens']}, Total: {usage['total_tokens']}"
                 )
-                messages.append({"role": "assistant", "content": final})
-            else:
-                msg = first.content
-                usage = response.usage
-                print(f"Assistant: {msg}")
-                print(
-                    f"📊 Tokens - Input: {usage.prompt_tokens}, Output: {usage.completion_tokens}, Total: {usage.total_tokens}"
-                )
-                messages.append({"role": "assistant", "content": msg})
-
-        except Exception as e:
-            print(f"Error: {e}")
-            break
+                if "ttft_seconds" in usage:
+                    print(format_timing(usage))
+                if session.history.describe_fold():
+                    print(session.history.describe_fold())
+            except Exception as e:
+                print(f"Error: {e}")
+    finally:
+        await close_async_clients()
 
     print("\n✅ RAG agent demo complete.")
 
@@ -0,0 +1,229 @@
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from qdrant_client.http.models import PointStruct
+
+from session_2.rag.filters import filter_sql
+from session_2.rag.manifest import STATE_DIR
+
+
+# Okapi BM25 parameters (the usual Lucene defaults).
+BM25_K1 = 1.2
+BM25_B = 0.75
+_SQL_BATCH = 500
+
+_TOKEN = re.compile(r"\w+")
+# Frequent function words match nearly every chunk: scoring them costs a full
+# postings scan for almost no ranking signal.
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from had has have he her his i in is it its of on or she so that the "
+    "their them they this to was we were what when where which who will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Case-folded word and number tokens, stopwords removed."""
+    return [t for t in _TOKEN.findall(text.casefold()) if t not in STOPWORDS]
+
+
+def default_sparse_index_path(collection: str) -> str:
+    return os.path.join(STATE_DIR, f"{collection}.sparse.sqlite")
+
+
+class SparseIndex:
+    """BM25 inverted index over a collection's chunk texts, stored in SQLite.
+
+    It sits next to the dense collection and uses the same point ids and
+    payloads, so its hits can be fused with vector search results without
+    a round trip to the vector store. Exact terms such as names and model
+    numbers ("Stormcleaver 300") rank high here even when their embedding
+    is not close to the query's. Thread-safe.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS docs (id TEXT PRIMARY KEY, length INTEGER NOT NULL, payload TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS postings (term TEXT NOT NULL, id TEXT NOT NULL, tf INTEGER NOT NULL,"
+            " PRIMARY KEY (term, id)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS postings_id ON postings(id)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._conn.commit()
+
+    def _meta(self, key: str) -> int:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def _add_meta(self, key: str, delta: int):
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = value + excluded.value",
+            (key, delta),
+        )
+
+    def _remove(self, ids: Sequence[str]):
+        for start in range(0, len(ids), _SQL_BATCH):
+            part = list(ids[start : start + _SQL_BATCH])
+            marks = ",".join("?" * len(part))
+            found = self._conn.execute(f"SELECT COUNT(*), SUM(length) FROM docs WHERE id IN ({marks})", part).fetchone()
+            if not found[0]:
+                continue
+            self._add_meta("docs", -found[0])
+            self._add_meta("tokens", -(found[1] or 0))
+            self._conn.execute(f"DELETE FROM postings WHERE id IN ({marks})", part)
+            self._conn.execute(f"DELETE FROM docs WHERE id IN ({marks})", part)
+
+    def add(self, points: Iterable[PointStruct]):
+        """Index (or re-index) points by the "text" of their payload."""
+        latest = {str(p.id): p.payload or {} for p in points}
+        if not latest:
+            return
+        docs, postings, tokens = [], [], 0
+        for pid, payload in latest.items():
+            terms = tokenize(payload.get("text") or "")
+            tokens += len(terms)
+            docs.append((pid, len(terms), json.dumps(payload)))
+            postings.extend((term, pid, tf) for term, tf in Counter(terms).items())
+        with self._lock:
+            self._remove(list(latest))
+            self._conn.executemany("INSERT INTO docs (id, length, payload) VALUES (?, ?, ?)", docs)
+            self._conn.executemany("INSERT INTO postings (term, id, tf) VALUES (?, ?, ?)", postings)
+            self._add_meta("docs", len(docs))
+            self._add_meta("tokens", tokens)
+            self._conn.commit()
+
+    def delete(self, ids: Sequence[str]):
+        with self._lock:
+            self._remove([str(pid) for pid in ids])
+            self._conn.commit()
+
+    def set_payload(self, payload: Dict, ids: Sequence[str]):
+        """Merge `payload` into the stored payloads (the text, and so the postings, stay as they are)."""
+        with self._lock:
+            for pid in ids:
+                row = self._conn.execute("SELECT payload FROM docs WHERE id = ?", (str(pid),)).fetchone()
+                if row:
+                    merged = {**json.loads(row[0]), **payload}
+                    self._conn.execute("UPDATE docs SET payload = ? WHERE id = ?", (json.dumps(merged), str(pid)))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM docs")
+            self._conn.execute("DELETE FROM meta")
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._meta("docs")
+
+    def search(self, query: str, limit: int, query_filter=None) -> List[Tuple[float, str, Dict]]:
+        """The best `limit` (BM25 score, point id, payload) matches, best first.
+
+        `query_filter` (see filters.build_filter) restricts the matches; term
+        statistics stay those of the whole collection.
+        """
+        terms = Counter(tokenize(query))
+        where, params = filter_sql(query_filter, "d.payload")
+        with self._lock:
+            docs = self._meta("docs")
+            if not terms or not docs or limit <= 0:
+                return []
+            avg_length = max(1.0, self._meta("tokens") / docs)
+            scores: Dict[str, float] = defaultdict(float)
+            for term, query_tf in terms.items():
+                rows = self._conn.execute(
+                    "SELECT p.id, p.tf, d.length FROM postings p JOIN docs d ON d.id = p.id"
+                    f" WHERE p.term = ? AND {where}",
+                    (term, *params),
+                ).fetchall()
+                if not rows:
+                    continue
+                df = len(rows) if query_filter is None else self._doc_frequency(term)
+                idf = math.log(1 + (docs - df + 0.5) / (df + 0.5))
+                for pid, tf, length in rows:
+                    norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+                    scores[pid] += query_tf * idf * tf * (BM25_K1 + 1) / norm
+            top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+            if not top:
+                return []
+            marks = ",".join("?" * len(top))
+            payloads = dict(
+                self._conn.execute(f"SELECT id, payload FROM docs WHERE id IN ({marks})", [pid for pid, _ in top])
+            )
+        return [(score, pid, json.loads(payloads[pid])) for pid, score in top]
+
+    def _doc_frequency(self, term: str) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM postings WHERE term = ?", (term,)).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_indexes: Dict[str, SparseIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def open_sparse_index(collection: str, create: bool = False) -> Optional[SparseIndex]:
+    """The process-wide sparse index of `collection`; None if it was never built (unless `create`).
+
+    An index whose file was removed since it was opened (see
+    remove_sparse_index) is dropped rather than served.
+    """
+    path = default_sparse_index_path(collection)
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is not None and not os.path.exists(path):
+            _indexes.pop(path).close()
+            index = None
+        if index is None:
+            if not create and not os.path.exists(path):
+                return None
+            index = _indexes[path] = SparseIndex(path)
+        return index
+
+
+def remove_sparse_index(collection: str) -> bool:
+    """Delete the sparse index of `collection`, e.g. once the collection changed without it.
+
+    Returns True if there was one.
+    """
+    path = default_sparse_index_path(collection)
+    with _indexes_lock:
+        index = _indexes.pop(path, None)
+        if index is not None:
+            index.close()
+        existed = os.path.exists(path)
+        for name in (path, path + "-wal", path + "-shm"):
+            if os.path.exists(name):
+                os.remove(name)
+    return existed
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists: each id scores sum(1 / (k + rank)) over the lists it appears in.
+
+    Only ranks matter, so cosine similarities and BM25 scores, which live on
+    unrelated scales, can be combined without calibration.
+    """
+    fused: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, pid in enumerate(ranking, start=1):
+            fused[pid] += 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
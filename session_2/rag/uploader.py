@@ -0,0 +1,108 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Callable, List, Optional
+
+from qdrant_client.http.models import PointStruct
+
+from session_1.primitives.tracing import span
+from session_2.rag.vector_store import VectorStore
+
+
+DEFAULT_UPLOAD_BATCH_SIZE = 256
+DEFAULT_UPLOAD_WORKERS = 2
+
+
+def _is_local(qdrant: VectorStore) -> bool:
+    options = getattr(qdrant, "init_options", None) or {}
+    return options.get("location") == ":memory:" or bool(options.get("path"))
+
+
+class PointUploader:
+    """Buffers points and upserts them in fixed-size batches on worker threads.
+
+    With `wait=False` Qdrant acknowledges each batch as soon as it is accepted
+    into its write-ahead log. `flush()` is the barrier: it waits for every
+    in-flight batch and sends the final batch with `wait=True`. Qdrant applies
+    a collection's updates in order, so once that call returns, everything
+    uploaded before it is applied too.
+    """
+
+    def __init__(
+        self,
+        qdrant: VectorStore,
+        collection: str,
+        batch_size: int = DEFAULT_UPLOAD_BATCH_SIZE,
+        workers: int = DEFAULT_UPLOAD_WORKERS,
+        wait: bool = False,
+        on_uploaded: Optional[Callable[[List[PointStruct]], None]] = None,
+    ):
+        self.qdrant = qdrant
+        self.collection = collection
+        self.batch_size = max(1, batch_size)
+        self.wait = wait
+        # Called (from a worker thread) with each batch once Qdrant acknowledged it.
+        self.on_uploaded = on_uploaded
+        self.uploaded = 0
+        self._buffer: List[PointStruct] = []
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="qdrant-upload")
+        # Bound the batches queued behind the workers so memory stays flat.
+        self._slots = threading.BoundedSemaphore(max(1, workers) * 2)
+        self._futures: List[Future] = []
+        # The embedded (":memory:" / path) Qdrant is not thread-safe; serialize its writes.
+        self._write_lock = threading.Lock() if _is_local(qdrant) else nullcontext()
+
+    def add(self, points: List[PointStruct]):
+        self._buffer.extend(points)
+        # Keep at least one point back so flush() always has a batch to wait on.
+        while len(self._buffer) > self.batch_size:
+            batch = self._buffer[: self.batch_size]
+            del self._buffer[: self.batch_size]
+            self._submit(batch)
+
+    def _submit(self, batch: List[PointStruct]):
+        self._collect_done()
+        self._slots.acquire()
+        future = self._pool.submit(self._upsert, batch, self.wait)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+
+    def _upsert(self, batch: List[PointStruct], wait: bool):
+        with self._write_lock:
+            with span("import.upsert"):
+                self.qdrant.upsert(collection_name=self.collection, points=batch, wait=wait)
+        if self.on_uploaded:
+            self.on_uploaded(batch)
+        return len(batch)
+
+    def _collect_done(self):
+        pending = []
+        for future in self._futures:
+            if not future.done():
+                pending.append(future)
+                continue
+            self.uploaded += future.result()
+        self._futures = pending
+
+    def flush(self):
+        for future in self._futures:
+            future.result()
+        self._collect_done()
+        if self._buffer:
+            batch, self._buffer = self._buffer, []
+            self.uploaded += self._upsert(batch, wait=True)
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._pool.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,98 @@
+import asyncio
+import os
+from functools import lru_cache
+from typing import List, Optional, Protocol, Sequence
+
+from qdrant_client.http.models import CountResult, PointIdsList, PointStruct, ScoredPoint, VectorParams
+
+from session_1.primitives.client_registry import get_async_qdrant_client, get_qdrant_client
+from session_2.rag.local_store import DEFAULT_DTYPE, DEFAULT_GRAPH_MIN_POINTS, LocalVectorStore
+
+
+LOCAL_SCHEME = "local:"
+
+
+class VectorStore(Protocol):
+    """The part of the QdrantClient API the importer and retriever rely on.
+
+    QdrantClient implements it as is; LocalVectorStore is the in-process backend.
+    """
+
+    def collection_exists(self, collection_name: str) -> bool: ...
+
+    def get_collection(self, collection_name: str): ...
+
+    def create_collection(self, collection_name: str, vectors_config: VectorParams, **kwargs) -> bool: ...
+
+    def recreate_collection(self, collection_name: str, vectors_config: VectorParams, **kwargs) -> bool: ...
+
+    def delete_collection(self, collection_name: str, **kwargs) -> bool: ...
+
+    def upsert(self, collection_name: str, points: List[PointStruct], wait: bool = True, **kwargs): ...
+
+    def delete(self, collection_name: str, points_selector: PointIdsList, wait: bool = True, **kwargs): ...
+
+    def batch_update_points(self, collection_name: str, update_operations: List, wait: bool = True, **kwargs): ...
+
+    def count(self, collection_name: str, exact: bool = True, **kwargs) -> CountResult: ...
+
+    def create_payload_index(self, collection_name: str, field_name: str, field_schema=None, **kwargs): ...
+
+    def search(
+        self,
+        collection_name: str,
+        query_vector: Sequence[float],
+        limit: int = 10,
+        score_threshold: Optional[float] = None,
+        **kwargs,
+    ) -> List[ScoredPoint]: ...
+
+
+@lru_cache(maxsize=None)
+def _local_store(path: str, dtype: str, graph_min_points: int) -> LocalVectorStore:
+    # One instance per directory and process: it owns the write lock.
+    return LocalVectorStore(path, dtype=dtype, graph_min_points=graph_min_points)
+
+
+def store_url(url: str = None) -> str:
+    return url or os.getenv("VECTOR_STORE_URL") or os.getenv("QDRANT_URL", "http://localhost:6333")
+
+
+def create_vector_store(url: str = None, api_key: str = None, prefer_grpc: bool = False) -> VectorStore:
+    """Open the vector store at `url` (default: VECTOR_STORE_URL, then QDRANT_URL).
+
+    "local:<dir>" is the embedded NumPy store, ":memory:" an in-process
+    Qdrant, and anything else a Qdrant server. Clients are shared per
+    process (see client_registry), so calling this per request is cheap.
+    """
+    url = store_url(url)
+    if url.startswith(LOCAL_SCHEME):
+        path = os.path.abspath(url[len(LOCAL_SCHEME) :] or os.path.join(".rag_state", "vectors"))
+        return _local_store(
+            path,
+            os.getenv("LOCAL_STORE_DTYPE", DEFAULT_DTYPE),
+            int(os.getenv("LOCAL_STORE_GRAPH_MIN_POINTS", DEFAULT_GRAPH_MIN_POINTS)),
+        )
+    return get_qdrant_client(url, api_key or os.getenv("QDRANT_API_KEY"), prefer_grpc=prefer_grpc)
+
+
+class _ThreadedSearch:
+    """Async search over an in-process store, run off the event loop."""
+
+    def __init__(self, store: VectorStore):
+        self.store = store
+
+    async def search(self, **kwargs) -> List[ScoredPoint]:
+        return await asyncio.to_thread(self.store.search, **kwargs)
+
+
+def create_async_vector_store(url: str = None, api_key: str = None, prefer_grpc: bool = False):
+    """Like create_vector_store(), but with an awaitable `search`.
+
+    A Qdrant server gets the running loop's AsyncQdrantClient; the local
+    store and ":memory:" are in-process, so their searches go to a thread.
+    """
+    url = store_url(url)
+    if url.startswith(LOCAL_SCHEME) or url == ":memory:":
+        return _ThreadedSearch(create_vector_store(url, api_key, prefer_grpc))
+    return get_async_qdrant_client(url, api_key or os.getenv("QDRANT_API_KEY"), prefer_grpc=prefer_grpc)
@@ -0,0 +1,31 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path, monkeypatch):
+    """Each test runs in its own directory (.rag_state lands there) with the disk caches off."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("EMBEDDING_CACHE_PATH", "")
+    monkeypatch.delenv("RESPONSE_CACHE", raising=False)
+    monkeypatch.delenv("TRACING", raising=False)
+
+
+@pytest.fixture(scope="session")
+def fake_azure():
+    """A local fake of the Azure OpenAI endpoints (see fake_azure.FakeAzureServer)."""
+    from session_1.primitives.fake_azure import FakeAzureServer
+
+    with FakeAzureServer(chat_latency=0, embedding_latency=0, embedding_dim=64) as server:
+        yield server
+
+
+@pytest.fixture
+def async_client(fake_azure):
+    from openai import AsyncAzureOpenAI
+
+    env = fake_azure.env()
+    return AsyncAzureOpenAI(
+        azure_endpoint=env["AZURE_OPENAI_ENDPOINT"],
+        api_key=env["AZURE_OPENAI_API_KEY"],
+        api_version=env["AZURE_OPENAI_API_VERSION"],
+    )
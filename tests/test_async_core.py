@@ -0,0 +1,59 @@
+import asyncio
+
+import pytest
+
+from session_1.primitives.async_core import STEP_LIMIT_REPLY, ToolChatSession, run_tool_loop
+from session_1.primitives.tool_executor import ToolExecutor
+
+TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "lookup",
+            "description": "Look something up",
+            "parameters": {"type": "object", "properties": {"query": {"type": "string"}}, "required": ["query"]},
+        },
+    }
+]
+FUNCTIONS = {"lookup": lambda query: f"found {query}"}
+
+
+def rounds(n):
+    return [[{"name": "lookup", "arguments": {"query": f"{{user}} {i}"}}] for i in range(n)]
+
+
+def assert_valid_history(messages):
+    for m in messages:
+        role = m["role"] if isinstance(m, dict) else m.role
+        if role == "assistant":
+            content = m["content"] if isinstance(m, dict) else m.content
+            tool_calls = m.get("tool_calls") if isinstance(m, dict) else m.tool_calls
+            assert content or tool_calls, m
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_answer_after_one_tool_round(fake_azure, async_client, stream):
+    fake_azure.configure(tool_script=rounds(1))
+    messages = [{"role": "user", "content": "paris"}]
+    result = asyncio.run(
+        run_tool_loop(async_client, "chat", messages, TOOLS, ToolExecutor(FUNCTIONS), stream=stream)
+    )
+    assert not result.step_limit_reached and result.steps == 1
+    assert result.turns[0].results[0].content == "found paris 0"
+    assert result.content and messages[-1] == {"role": "assistant", "content": result.content}
+    assert [m["role"] if isinstance(m, dict) else m.role for m in messages] == ["user", "assistant", "tool", "assistant"]
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_step_limit_leaves_a_valid_history(fake_azure, async_client, stream):
+    fake_azure.configure(tool_script=rounds(3))
+    session = ToolChatSession(
+        "system", "chat", TOOLS, ToolExecutor(FUNCTIONS), max_steps=2, tools_in_follow_up=True,
+        client=async_client, stream=stream,
+    )
+    result = asyncio.run(session.send("paris"))
+    assert result.step_limit_reached and result.steps == 2
+    assert result.content == STEP_LIMIT_REPLY.format(steps=2)
+    history = session.messages
+    assert history[-1] == {"role": "assistant", "content": result.content}
+    assert_valid_history(history)
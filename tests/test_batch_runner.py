@@ -0,0 +1,51 @@
+import asyncio
+import json
+
+from session_1.primitives.batch_runner import run_batch
+
+
+class FlakyPipeline:
+    """Answers every prompt except those in `failing`, which raise."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.prompts = []
+
+    async def run(self, prompt):
+        self.prompts.append(prompt)
+        if prompt in self.failing:
+            raise RuntimeError(f"failed {prompt}")
+        return {"response": prompt.upper(), "usage": {"input_tokens": 1, "output_tokens": 1}}
+
+
+def read(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_resume_retries_failures_and_keeps_one_record_per_id(tmp_path):
+    prompts = tmp_path / "prompts.jsonl"
+    prompts.write_text("".join(json.dumps({"id": f"p{i}", "prompt": f"q{i}"}) + "\n" for i in range(5)))
+    output = tmp_path / "out.jsonl"
+
+    first = asyncio.run(run_batch(str(prompts), str(output), FlakyPipeline({"q1", "q3"}), concurrency=2))
+    assert (first["ok"], first["errors"]) == (3, 2)
+    assert [r["error"] is None for r in read(output)] == [True, False, True, False, True]
+
+    retry = FlakyPipeline()
+    second = asyncio.run(run_batch(str(prompts), str(output), retry, concurrency=2))
+    assert sorted(retry.prompts) == ["q1", "q3"]
+    assert (second["ok"], second["skipped"]) == (2, 3)
+    records = read(output)
+    assert sorted(r["id"] for r in records) == [f"p{i}" for i in range(5)]
+    assert all(r["error"] is None for r in records)
+
+
+def test_torn_last_line_is_dropped_and_rerun(tmp_path):
+    prompts = tmp_path / "prompts.jsonl"
+    prompts.write_text("".join(json.dumps({"id": f"p{i}", "prompt": f"q{i}"}) + "\n" for i in range(2)))
+    output = tmp_path / "out.jsonl"
+    output.write_text(json.dumps({"id": "p0", "response": "Q0", "error": None}) + '\n{"id": "p1", "resp')
+    pipeline = FlakyPipeline()
+    asyncio.run(run_batch(str(prompts), str(output), pipeline))
+    assert pipeline.prompts == ["q1"]
+    assert [r["id"] for r in read(output)] == ["p0", "p1"]
@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+from session_1.primitives.tokens import CHARS_PER_TOKEN
+from session_2.rag.chunking import chunk_text_tokens, iter_token_chunks
+
+
+def corpus(seed=0):
+    rng = random.Random(seed)
+    words = "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda".split()
+    paragraphs = []
+    for p in range(30):
+        sentences = []
+        for s in range(rng.randint(1, 6)):
+            text = " ".join(rng.choice(words) for _ in range(rng.randint(3, 25)))
+            sentences.append(f"{text.capitalize()} {p}-{s}{rng.choice(['.', '!', '?', '.”'])}")
+        paragraphs.append(" ".join(sentences))
+    # A run-on "sentence" far longer than a chunk must still be split.
+    paragraphs.append(" ".join(words * 40))
+    return "\n\n".join(paragraphs) + "\n"
+
+
+def windows(text, size):
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 7, 64, 1000])
+def test_windowed_input_chunks_like_the_whole_text(size):
+    text = corpus()
+    assert list(iter_token_chunks(windows(text, size), max_tokens=40, overlap_tokens=10)) == chunk_text_tokens(
+        text, max_tokens=40, overlap_tokens=10
+    )
+
+
+def test_spans_are_slices_of_the_source_that_cover_it():
+    text = corpus(1)
+    spans = chunk_text_tokens(text, max_tokens=40, overlap_tokens=10)
+    assert all(text[s.start : s.end] == s.text for s in spans)
+    assert all(s.text == s.text.strip() for s in spans)
+    # Nothing but whitespace is left out between (or around) the chunks.
+    covered = set()
+    for s in spans:
+        covered.update(range(s.start, s.end))
+    assert all(text[i].isspace() for i in range(len(text)) if i not in covered)
+
+
+def test_chunks_respect_the_token_budget():
+    text = corpus(2)
+    for max_tokens in (16, 40, 128):
+        for span in chunk_text_tokens(text, max_tokens=max_tokens, overlap_tokens=max_tokens // 4):
+            # Units are budgeted without the single spaces that join them.
+            assert len(span.text.replace(" ", "")) <= max_tokens * CHARS_PER_TOKEN
+
+
+def test_consecutive_chunks_overlap_by_whole_sentences():
+    text = " ".join(f"Sentence number {i} is here." for i in range(100))
+    spans = chunk_text_tokens(text, max_tokens=40, overlap_tokens=10)
+    assert len(spans) > 3
+    for prev, nxt in zip(spans, spans[1:]):
+        assert nxt.start < prev.end
+        assert nxt.start > prev.start
+        overlap = text[nxt.start : prev.end]
+        assert overlap.startswith("Sentence") and overlap.endswith("here.")
+        assert len(overlap) <= 10 * CHARS_PER_TOKEN
+    disjoint = chunk_text_tokens(text, max_tokens=40, overlap_tokens=0)
+    assert all(nxt.start > prev.end for prev, nxt in zip(disjoint, disjoint[1:]))
+
+
+def test_chunks_end_at_paragraph_and_sentence_breaks():
+    first = "First paragraph sentence one. Sentence two here."
+    second = "Second paragraph that is long enough to need a chunk of its own. And more."
+    spans = chunk_text_tokens(f"{first}\n\n{second}", max_tokens=25, overlap_tokens=0)
+    # Half full at the paragraph break: cut there rather than mid-paragraph.
+    assert spans[0].text == first
+    assert spans[1].text.startswith("Second paragraph")
+    sentences = " ".join(f"Short sentence {i}." for i in range(20))
+    assert all(s.text.endswith(".") for s in chunk_text_tokens(sentences, max_tokens=20, overlap_tokens=0))
+
+
+def test_empty_and_blank_text_yield_nothing():
+    assert chunk_text_tokens("") == []
+    assert chunk_text_tokens(" \n\n  ") == []
@@ -0,0 +1,25 @@
+from session_2.rag import rag_agent
+from session_2.rag.collection_profiles import PROFILES, collection_profile, record_collection_profile, search_params
+
+
+def test_recorded_profile_round_trips():
+    assert collection_profile("docs") is None
+    record_collection_profile("docs", "binary")
+    assert collection_profile("docs") is PROFILES["binary"]
+
+
+def test_oversampling_comes_from_the_profile_unless_overridden(monkeypatch):
+    monkeypatch.delenv("QDRANT_SEARCH_OVERSAMPLING", raising=False)
+    assert search_params().quantization.oversampling == 2.0
+    assert search_params(PROFILES["binary"]).quantization.oversampling == 3.0
+    assert search_params(PROFILES["full"]).quantization.oversampling == 2.0
+    monkeypatch.setenv("QDRANT_SEARCH_OVERSAMPLING", "5")
+    assert search_params(PROFILES["binary"]).quantization.oversampling == 5.0
+    assert search_params(PROFILES["binary"], oversampling=1.5).quantization.oversampling == 1.5
+
+
+def test_search_request_uses_the_collection_profile(monkeypatch):
+    monkeypatch.delenv("QDRANT_SEARCH_OVERSAMPLING", raising=False)
+    record_collection_profile("docs", "binary")
+    request, _ = rag_agent._search_request([0.0] * 4, 3, "docs")
+    assert request["search_params"].quantization.oversampling == 3.0
@@ -0,0 +1,37 @@
+from session_2.rag.chunking import iter_token_chunks
+from session_2.rag.context_packer import Candidate, merge_adjacent
+
+TEXT = " ".join(f"Sentence number {i} talks about topic {i % 7}." for i in range(60))
+
+
+def candidates(spans, source="doc.md", skip=()):
+    return [
+        Candidate(
+            f"{source}-{i}",
+            1.0 - i / 100,
+            {"source": source, "chunk_index": i, "text": s.text, "char_start": s.start, "char_end": s.end},
+        )
+        for i, s in enumerate(spans)
+        if i not in skip
+    ]
+
+
+def test_overlap_between_consecutive_chunks_is_dropped():
+    spans = list(iter_token_chunks([TEXT], max_tokens=40, overlap_tokens=10))
+    assert len(spans) > 3 and spans[1].start < spans[0].end
+    [passage] = merge_adjacent(candidates(spans))
+    assert passage.text == TEXT
+    assert passage.chunks == list(range(len(spans)))
+    assert passage.score == 1.0
+
+
+def test_gaps_and_sources_start_new_passages():
+    spans = list(iter_token_chunks([TEXT], max_tokens=40, overlap_tokens=10))
+    passages = merge_adjacent(candidates(spans[:4], skip={1}) + candidates(spans[:1], source="other.md"))
+    assert [(p.source, p.chunks) for p in passages] == [("doc.md", [0]), ("doc.md", [2, 3]), ("other.md", [0])]
+    assert passages[1].text == TEXT[spans[2].start : spans[3].end]
+
+
+def test_chunks_without_offsets_are_not_merged():
+    legacy = [Candidate(str(i), 1.0, {"source": "doc.md", "chunk_index": i, "text": f"chunk {i}"}) for i in range(2)]
+    assert [p.text for p in merge_adjacent(legacy)] == ["chunk 0", "chunk 1"]
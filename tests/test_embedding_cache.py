@@ -0,0 +1,61 @@
+import pytest
+
+from session_1.primitives import embedding_cache
+from session_1.primitives.embedding_cache import EmbeddingCache, get_embedding_cache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+
+    def tick():
+        now[0] += 1
+        return now[0]
+
+    monkeypatch.setattr(embedding_cache.time, "time", tick)
+
+
+def vec(i):
+    return [float(i), i / 4, -1.5]
+
+
+def test_vectors_survive_a_reopen(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    EmbeddingCache(path).put_many("embed", None, ["a", "b"], [vec(1), vec(2)])
+    reopened = EmbeddingCache(path)
+    assert reopened.get_many("embed", None, ["b", "c", "a", "b"]) == {0: vec(2), 2: vec(1), 3: vec(2)}
+    assert reopened.stats() == {"hits": 3, "misses": 1, "hit_rate": 0.75, "entries": 2, "evictions": 0}
+
+
+def test_entries_are_separated_by_deployment_and_dimensions():
+    cache = EmbeddingCache(":memory:")
+    cache.put_many("small", None, ["a"], [vec(1)])
+    cache.put_many("small", 2, ["a"], [vec(2)[:2]])
+    cache.put_many("large", None, ["a"], [vec(3)])
+    assert cache.get_many("small", None, ["a"]) == {0: vec(1)}
+    assert cache.get_many("small", 2, ["a"]) == {0: vec(2)[:2]}
+    assert cache.get_many("large", None, ["a"]) == {0: vec(3)}
+    assert cache.get_many("other", None, ["a"]) == {}
+
+
+def test_least_recently_used_entries_are_evicted(clock):
+    cache = EmbeddingCache(":memory:", max_entries=20)
+    texts = [f"t{i}" for i in range(20)]
+    for i, text in enumerate(texts):
+        cache.put_many("embed", None, [text], [vec(i)])
+    # Touch the two oldest so t2 and t3 become the least recently used.
+    cache.get_many("embed", None, ["t0", "t1"])
+    cache.put_many("embed", None, ["new"], [vec(99)])
+    # One over the cap evicts it plus max_entries // 20 extra.
+    assert cache.stats()["entries"] == 19 and cache.evictions == 2
+    found = cache.get_many("embed", None, texts + ["new"])
+    assert sorted(found) == [i for i in range(21) if i not in (2, 3)]
+
+
+def test_process_cache_follows_its_path(tmp_path, monkeypatch):
+    assert get_embedding_cache() is None
+    monkeypatch.setenv("EMBEDDING_CACHE_PATH", str(tmp_path / "one.sqlite"))
+    cache = get_embedding_cache()
+    assert cache is get_embedding_cache()
+    monkeypatch.setenv("EMBEDDING_CACHE_PATH", str(tmp_path / "two.sqlite"))
+    assert get_embedding_cache().path == str(tmp_path / "two.sqlite")
@@ -0,0 +1,62 @@
+import json
+import sqlite3
+
+import pytest
+from qdrant_client.http.models import FieldCondition, Filter, MatchText, MatchValue
+
+from session_2.rag.filters import build_filter, filter_sql, source_dirs
+
+DOCS = [
+    {"source": "data/a.md", "source_dirs": ["data"], "doc_type": "md", "mtime": 1_700_000_000.0},
+    {"source": "data/sub/b.txt", "source_dirs": ["data", "data/sub"], "doc_type": "txt", "mtime": 1_710_000_000.0},
+    {"source": "notes/c.md", "source_dirs": ["notes"], "doc_type": "md", "mtime": None},
+]
+
+
+@pytest.fixture(scope="module")
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE points (row INTEGER PRIMARY KEY, payload TEXT)")
+    conn.execute("CREATE TABLE payload_values (field TEXT, value TEXT, row INTEGER)")
+    for row, payload in enumerate(DOCS):
+        conn.execute("INSERT INTO points VALUES (?, ?)", (row, json.dumps(payload)))
+        conn.executemany(
+            "INSERT INTO payload_values VALUES ('source_dirs', ?, ?)", [(d, row) for d in payload["source_dirs"]]
+        )
+    return conn
+
+
+def matches(conn, query_filter, indexed_arrays=()):
+    where, params = filter_sql(query_filter, indexed_arrays=indexed_arrays)
+    rows = conn.execute(f"SELECT row FROM points WHERE {where} ORDER BY row", params).fetchall()
+    return [DOCS[row]["source"] for row, in rows]
+
+
+@pytest.mark.parametrize("indexed_arrays", [(), ("source_dirs",)])
+def test_filters_select_the_same_points_as_qdrant(conn, indexed_arrays):
+    assert matches(conn, None) == [d["source"] for d in DOCS]
+    assert matches(conn, build_filter(source=["data/a.md", "notes/c.md"]), indexed_arrays) == ["data/a.md", "notes/c.md"]
+    assert matches(conn, build_filter(path_prefix="data/sub/"), indexed_arrays) == ["data/sub/b.txt"]
+    assert matches(conn, build_filter(path_prefix="data", doc_type=".MD"), indexed_arrays) == ["data/a.md"]
+    # Points without an mtime never match a date range.
+    assert matches(conn, build_filter(modified_after="2024-01-01"), indexed_arrays) == ["data/sub/b.txt"]
+    assert matches(conn, build_filter(modified_before=1_705_000_000), indexed_arrays) == ["data/a.md"]
+
+
+def test_build_filter_without_arguments_is_none():
+    assert build_filter() is None
+    assert build_filter(source=[], path_prefix="") is None
+
+
+def test_unsupported_filters_raise():
+    with pytest.raises(ValueError, match="Only `must`"):
+        filter_sql(Filter(should=[FieldCondition(key="source", match=MatchValue(value="x"))]))
+    with pytest.raises(ValueError, match="Unsupported condition on 'source'"):
+        filter_sql(Filter(must=[FieldCondition(key="source")]))
+    with pytest.raises(TypeError, match="Unsupported match MatchText"):
+        filter_sql(Filter(must=[FieldCondition(key="source", match=MatchText(text="x"))]))
+
+
+def test_source_dirs_lists_every_ancestor():
+    assert source_dirs("./data/sub/b.txt") == ["data", "data/sub"]
+    assert source_dirs("b.txt") == []
@@ -0,0 +1,65 @@
+import asyncio
+import logging
+
+from session_1.primitives.history import SUMMARY_PREFIX, ConversationHistory, message_tokens
+
+
+def turn(i, size=200):
+    return [
+        {"role": "user", "content": f"question {i} " + "x" * size},
+        {"role": "assistant", "content": f"answer {i} " + "y" * size},
+    ]
+
+
+def fill(history, turns):
+    for i in range(turns):
+        history.commit(turn(i))
+
+
+class Summarizer:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.calls = []
+
+    async def __call__(self, previous, messages):
+        self.calls.append((previous, len(messages)))
+        if self.fail:
+            raise RuntimeError("summarizer down")
+        return f"summary of {len(messages)} messages"
+
+
+def test_nothing_is_folded_within_the_budget():
+    summarizer = Summarizer()
+    history = ConversationHistory("system", budget_tokens=10_000, summarizer=summarizer)
+    fill(history, 5)
+    prompt = asyncio.run(history.prepare({"role": "user", "content": "next"}))
+    assert len(prompt) == 1 + 10 + 1
+    assert not summarizer.calls and history.last_folded == 0
+
+
+def test_over_budget_folds_old_turns_into_the_summary():
+    summarizer = Summarizer()
+    history = ConversationHistory("system", budget_tokens=800, summary_tokens=100, summarizer=summarizer)
+    fill(history, 10)
+    user = {"role": "user", "content": "next"}
+    prompt = asyncio.run(history.prepare(user))
+    assert history.last_folded == summarizer.calls[0][1] // 2 > 0
+    assert history.folded_turns + len(history.turns) == 10
+    assert prompt[1]["content"].startswith(SUMMARY_PREFIX + "summary of")
+    assert sum(message_tokens(m) for m in prompt) <= 800
+    # Folding leaves room: the next few turns fit without another summary.
+    history.commit([user, {"role": "assistant", "content": "ok"}])
+    asyncio.run(history.prepare({"role": "user", "content": "again"}))
+    assert len(summarizer.calls) == 1
+
+
+def test_failed_summary_drops_the_turns_and_logs(caplog):
+    history = ConversationHistory("system", budget_tokens=800, summary_tokens=100, summarizer=Summarizer(fail=True))
+    fill(history, 10)
+    with caplog.at_level(logging.WARNING, logger="session_1.primitives.history"):
+        prompt = asyncio.run(history.prepare({"role": "user", "content": "next"}))
+    assert history.summary is None and history.omitted_turns == history.last_folded > 0
+    assert f"({history.omitted_turns} earlier turn(s) omitted)" in prompt[1]["content"]
+    assert sum(message_tokens(m) for m in prompt) <= 800
+    [record] = caplog.records
+    assert "Summarizing" in record.getMessage() and record.exc_info[0] is RuntimeError
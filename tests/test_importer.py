@@ -0,0 +1,80 @@
+import glob
+import os
+import sys
+import tempfile
+
+from session_2.rag import importer
+from session_2.rag.importer import READ_WINDOW_CHARS, iter_chunks, iter_chunks_parallel
+from session_2.rag.vector_store import create_vector_store
+
+
+def write_corpus(tmp_path):
+    sentence = "The quick brown fox jumps over the lazy dog. "
+    good = tmp_path / "good.txt"
+    good.write_text(sentence * 200, encoding="utf-8")
+    # Valid UTF-8 for more than one read window, then a byte that is not.
+    bad = tmp_path / "bad.txt"
+    bad.write_bytes((sentence * (READ_WINDOW_CHARS // len(sentence) + 100)).encode() + b"\xff\xfe tail")
+    return str(good), str(bad)
+
+
+def spools():
+    return glob.glob(os.path.join(tempfile.gettempdir(), "*.chunks"))
+
+
+def test_source_failing_partway_yields_no_chunks(tmp_path):
+    good, bad = write_corpus(tmp_path)
+    scanned, failed = [], []
+    chunks = list(iter_chunks([bad, good], scanned=scanned, failed=failed))
+    assert chunks and {c.source for c in chunks} == {good}
+    assert scanned == [good] and failed == [bad]
+
+
+def test_spool_files_are_removed(tmp_path):
+    good, bad = write_corpus(tmp_path)
+    before = set(spools())
+    list(iter_chunks([bad, good]))
+    chunks = iter_chunks_parallel([good, good, good], workers=2)
+    next(chunks)
+    chunks.close()
+    assert set(spools()) == before
+
+
+def test_parallel_reader_skips_the_same_sources(tmp_path):
+    good, bad = write_corpus(tmp_path)
+    sequential = list(iter_chunks([bad, good]))
+    scanned = []
+    assert list(iter_chunks_parallel([bad, good], workers=2, scanned=scanned)) == sequential
+    assert scanned == [good]
+
+
+def test_missing_source_is_skipped(tmp_path):
+    good, _ = write_corpus(tmp_path)
+    assert {c.source for c in iter_chunks([str(tmp_path / "nope.txt"), good])} == {good}
+
+
+def run_importer(monkeypatch, *args):
+    vector = [1.0] + [0.0] * (importer.EMBEDDING_DIM - 1)
+    monkeypatch.setattr(importer, "_embed_texts", lambda texts: [vector for _ in texts])
+    argv = ["importer", "--store", "local:store", "--collection", "docs", "--dir", "data", *args]
+    monkeypatch.setattr(sys, "argv", argv)
+    importer.main()
+    return create_vector_store("local:store").count(collection_name="docs").count
+
+
+def test_incremental_run_keeps_the_points_of_an_unreadable_source(tmp_path, monkeypatch, capsys):
+    data = tmp_path / "data"
+    data.mkdir()
+    for name in ("a", "b"):
+        (data / f"{name}.txt").write_text(" ".join(f"{name} sentence {i}." for i in range(200)), encoding="utf-8")
+    total = run_importer(monkeypatch, "--chunk-tokens", "60")
+    assert total > 2
+
+    (data / "b.txt").write_bytes(b"Beta, now undecodable \xff\xfe")
+    assert run_importer(monkeypatch, "--chunk-tokens", "60", "--incremental") == total
+    out = capsys.readouterr().out
+    assert "Skipping data/b.txt" in out and "0 stale points deleted" in out
+
+    # Once readable again, the source is reconciled as usual.
+    (data / "b.txt").write_text("Beta, short now.", encoding="utf-8")
+    assert run_importer(monkeypatch, "--chunk-tokens", "60", "--incremental") < total
@@ -0,0 +1,51 @@
+from session_2.rag.embedding_pipeline import Chunk
+from session_2.rag.importer import select_changed_chunks
+from session_2.rag.manifest import point_id_for, source_key, stale_point_ids
+
+
+def chunks(source, texts):
+    return [Chunk(source=source, index=i, text=t) for i, t in enumerate(texts)]
+
+
+def manifest_of(source, texts):
+    return {source_key(source): {point_id_for(source, t): i for i, t in enumerate(texts)}}
+
+
+def test_point_ids_depend_on_source_and_content():
+    assert point_id_for("a.txt", "hello") == point_id_for("./a.txt", "hello")
+    assert point_id_for("a.txt", "hello") != point_id_for("b.txt", "hello")
+    assert point_id_for("a.txt", "hello") != point_id_for("a.txt", "hello!")
+
+
+def test_first_run_yields_every_chunk():
+    current, reindexed = {}, {}
+    out = list(select_changed_chunks(iter(chunks("a.txt", ["one", "two"])), {}, current, reindexed))
+    assert [c.text for c in out] == ["one", "two"]
+    assert current == manifest_of("a.txt", ["one", "two"])
+    assert reindexed == {}
+
+
+def test_unchanged_chunks_are_skipped_and_moved_ones_reindexed():
+    previous = manifest_of("a.txt", ["one", "two", "three"])
+    current, reindexed = {}, {}
+    new = chunks("a.txt", ["zero", "one", "three"])
+    out = list(select_changed_chunks(iter(new), previous, current, reindexed))
+    assert [c.text for c in out] == ["zero"]
+    assert reindexed == {point_id_for("a.txt", "one"): 1}
+    assert current == manifest_of("a.txt", ["zero", "one", "three"])
+
+
+def test_repeated_text_within_a_source_maps_to_one_point():
+    current = {}
+    out = list(select_changed_chunks(iter(chunks("a.txt", ["same", "same"])), {}, current, {}))
+    assert len(out) == 1
+    assert current == {source_key("a.txt"): {point_id_for("a.txt", "same"): 0}}
+
+
+def test_stale_point_ids_only_covers_sources_in_scope():
+    previous = {**manifest_of("a.txt", ["one", "two"]), **manifest_of("b.txt", ["three"])}
+    current = manifest_of("a.txt", ["one"])
+    assert stale_point_ids(previous, current, [source_key("a.txt")]) == [point_id_for("a.txt", "two")]
+    # b.txt vanished from this run, but is out of scope: its points stay.
+    assert stale_point_ids(previous, current, []) == []
+    assert stale_point_ids(previous, current, [source_key("b.txt")]) == [point_id_for("b.txt", "three")]
@@ -0,0 +1,93 @@
+import json
+import os
+import sys
+
+import pytest
+
+from session_2.rag import importer
+from session_2.rag.journal import default_journal_path, load_journal
+from session_2.rag.vector_store import create_vector_store
+
+
+def write_journal(path, *records, tail=""):
+    with open(path, "w", encoding="utf-8") as f:
+        f.writelines(json.dumps(r) + "\n" for r in records)
+        f.write(tail)
+
+
+START = {"event": "start", "args": {"dir": "data"}, "recreated": True}
+
+
+def test_missing_journal_is_nothing_to_resume(tmp_path):
+    assert load_journal(str(tmp_path / "none.jsonl")) is None
+
+
+def test_batches_are_collected_per_source(tmp_path):
+    path = str(tmp_path / "j.jsonl")
+    write_journal(
+        path,
+        {"event": "batch", "points": [["early.md", "p0", 0]]},  # before any start: ignored
+        START,
+        {"event": "batch", "points": [["a.md", "p1", 0], ["b.md", "p2", 0]]},
+        {"event": "resume"},
+        {"event": "batch", "points": [["a.md", "p3", 1]]},
+    )
+    state = load_journal(path)
+    assert state.args == {"dir": "data"} and state.recreated
+    assert state.points == {"a.md": {"p1": 0, "p3": 1}, "b.md": {"p2": 0}}
+
+
+def test_torn_last_line_is_ignored(tmp_path):
+    path = str(tmp_path / "j.jsonl")
+    write_journal(path, START, {"event": "batch", "points": [["a.md", "p1", 0]]}, tail='{"event": "batch", "poi')
+    assert load_journal(path).points == {"a.md": {"p1": 0}}
+
+
+def test_finished_import_has_nothing_to_resume(tmp_path):
+    path = str(tmp_path / "j.jsonl")
+    write_journal(path, START, {"event": "batch", "points": [["a.md", "p1", 0]]}, {"event": "done"})
+    assert load_journal(path) is None
+
+
+def run_importer(monkeypatch, embed, *args):
+    monkeypatch.setattr(importer, "_embed_texts", embed)
+    argv = ["importer", "--store", "local:store", "--collection", "docs", "--batch-size", "4", *args]
+    monkeypatch.setattr(sys, "argv", argv)
+    importer.main()
+    return create_vector_store("local:store").count(collection_name="docs").count
+
+
+class Embedder:
+    def __init__(self, fail_on_call=None):
+        self.calls = 0
+        self.texts = 0
+        self.fail_on_call = fail_on_call
+
+    def __call__(self, texts):
+        self.calls += 1
+        if self.calls == self.fail_on_call:
+            raise RuntimeError("429 storm")
+        self.texts += len(texts)
+        return [[1.0] + [0.0] * (importer.EMBEDDING_DIM - 1) for _ in texts]
+
+
+def test_resume_skips_journaled_points_and_restores_the_run_arguments(tmp_path, monkeypatch):
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "doc.txt").write_text(" ".join(f"Sentence {i}." for i in range(400)), encoding="utf-8")
+    args = ("--dir", "data", "--chunk-tokens", "20", "--max-in-flight", "1", "--upload-batch-size", "4")
+    crashed = Embedder(fail_on_call=4)
+    with pytest.raises(RuntimeError, match="429 storm"):
+        run_importer(monkeypatch, crashed, *args)
+    state = load_journal(default_journal_path("docs"))
+    assert state.args["dir"] == "data" and state.args["chunk_tokens"] == 20
+    journaled = sum(map(len, state.points.values()))
+    assert 0 < journaled <= crashed.texts
+
+    # No --dir or --chunk-tokens: both come back from the journal.
+    resumed = Embedder()
+    total = run_importer(monkeypatch, resumed, "--resume", "--max-in-flight", "1")
+    assert not os.path.exists(default_journal_path("docs"))
+
+    fresh = Embedder()
+    assert run_importer(monkeypatch, fresh, *args, "--recreate") == total
+    assert resumed.texts == fresh.texts - journaled
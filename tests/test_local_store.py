@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+from qdrant_client.http.models import (
+    Distance,
+    FilterSelector,
+    PointIdsList,
+    PointStruct,
+    PointsList,
+    UpsertOperation,
+    VectorParams,
+)
+
+from session_2.rag.local_store import LocalVectorStore, hnswlib
+
+DIM = 8
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LocalVectorStore(str(tmp_path / "store"), graph_min_points=2)
+    store.create_collection("c", VectorParams(size=DIM, distance=Distance.COSINE))
+    yield store
+    store.close()
+
+
+def add_points(store, n, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((n, DIM))
+    store.upsert("c", [PointStruct(id=i, vector=v.tolist(), payload={"n": i}) for i, v in enumerate(vectors)])
+    return vectors
+
+
+def exact_top(vectors, live, query, k):
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = {i: float(normed[i] @ query) for i in live}
+    return sorted(scores, key=scores.get, reverse=True)[:k]
+
+
+def test_exact_search_skips_deleted_points(store):
+    vectors = add_points(store, 20)
+    store.delete("c", PointIdsList(points=list(range(10))))
+    query = vectors[3] / np.linalg.norm(vectors[3])
+    hits = store.search("c", query.tolist(), limit=4)
+    assert [h.payload["n"] for h in hits] == exact_top(vectors, range(10, 20), query, 4)
+
+
+@pytest.mark.skipif(hnswlib is None, reason="hnswlib not installed")
+def test_graph_built_after_deletes_holds_fewer_elements_than_rows(store):
+    vectors = add_points(store, 50)
+    store.delete("c", PointIdsList(points=list(range(47))))
+    assert store.optimize("c")
+    query = vectors[48] / np.linalg.norm(vectors[48])
+    assert [h.payload["n"] for h in store.search("c", query.tolist(), limit=4)] == exact_top(
+        vectors, [47, 48, 49], query, 4
+    )
+
+
+@pytest.mark.skipif(hnswlib is None, reason="hnswlib not installed")
+def test_deletes_after_the_graph_was_built_fall_back_to_the_exact_scan(store):
+    vectors = add_points(store, 50)
+    assert store.optimize("c")
+    store.delete("c", PointIdsList(points=list(range(3, 50))))
+    query = vectors[10] / np.linalg.norm(vectors[10])
+    assert [h.payload["n"] for h in store.search("c", query.tolist(), limit=4)] == exact_top(
+        vectors, [0, 1, 2], query, 4
+    )
+
+
+def test_unsupported_selectors_and_operations_are_type_errors(store):
+    with pytest.raises(TypeError, match="only deletes by PointIdsList"):
+        store.delete("c", FilterSelector(filter={"must": []}))
+    with pytest.raises(TypeError, match="does not support UpsertOperation"):
+        store.batch_update_points("c", [UpsertOperation(upsert=PointsList(points=[]))])
@@ -0,0 +1,85 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+from session_1.primitives import rate_limiter
+from session_1.primitives.rate_limiter import AsyncRateLimitedTransport, RateLimitedTransport
+
+URL = "https://example.openai.azure.com/openai/deployments/chat/chat/completions?api-version=2024-02-15-preview"
+
+
+def request():
+    return httpx.Request("POST", URL, json={"messages": [{"role": "user", "content": "hi"}], "max_tokens": 5})
+
+
+class Script:
+    """Plays failures (exceptions or status codes) before answering 200."""
+
+    def __init__(self, *steps):
+        self.steps = list(steps)
+        self.calls = 0
+
+    def next(self, request):
+        self.calls += 1
+        step = self.steps.pop(0) if self.steps else 200
+        if isinstance(step, type) and issubclass(step, Exception):
+            raise step("scripted failure", request=request)
+        return httpx.Response(step, request=request)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "backoff_delay", lambda attempt: 0.0)
+    monkeypatch.setattr(rate_limiter, "_limiters", {})
+    monkeypatch.setenv("RATE_LIMIT_MAX_RETRIES", "3")
+
+
+@pytest.mark.parametrize(
+    "failure", [httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadTimeout, httpx.WriteTimeout, httpx.RemoteProtocolError]
+)
+def test_transport_failures_are_retried(monkeypatch, failure):
+    script = Script(failure, 503)
+    monkeypatch.setattr(httpx.HTTPTransport, "handle_request", lambda self, req: script.next(req))
+    assert RateLimitedTransport().handle_request(request()).status_code == 200
+    assert script.calls == 3
+    assert rate_limiter.rate_limit_stats()["chat"]["retries"] == 2
+
+
+def test_async_transport_retries_read_timeouts(monkeypatch):
+    script = Script(httpx.ReadTimeout, httpx.RemoteProtocolError)
+
+    async def handle(self, req):
+        return script.next(req)
+
+    monkeypatch.setattr(httpx.AsyncHTTPTransport, "handle_async_request", handle)
+    response = asyncio.run(AsyncRateLimitedTransport().handle_async_request(request()))
+    assert response.status_code == 200 and script.calls == 3
+
+
+def test_gives_up_after_max_retries(monkeypatch):
+    script = Script(*[httpx.ReadTimeout] * 10)
+    monkeypatch.setattr(httpx.HTTPTransport, "handle_request", lambda self, req: script.next(req))
+    with pytest.raises(httpx.ReadTimeout):
+        RateLimitedTransport().handle_request(request())
+    assert script.calls == 4
+
+
+def test_other_hosts_pass_straight_through(monkeypatch):
+    script = Script(httpx.ReadTimeout)
+    monkeypatch.setattr(httpx.HTTPTransport, "handle_request", lambda self, req: script.next(req))
+    with pytest.raises(httpx.ReadTimeout):
+        RateLimitedTransport().handle_request(httpx.Request("GET", "http://localhost:6333/collections"))
+
+
+def test_describe_request_uses_the_shared_token_estimate():
+    body = httpx.Request("POST", URL.replace("chat/completions", "embeddings"), json={"input": ["abcde", "ab"]})
+    assert rate_limiter.describe_request(body) == ("chat", 2 + 1)
+
+
+def test_counters_add_up_across_threads():
+    limiter = rate_limiter.RateLimiter(None, None)
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda _: limiter.count("retries"), range(2000)))
+    assert limiter.snapshot()["retries"] == 2000
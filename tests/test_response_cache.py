@@ -0,0 +1,58 @@
+from session_1.primitives import response_cache, ttl_cache
+from session_1.primitives.response_cache import ResponseCache, get_response_cache, response_key
+
+MESSAGES = [{"role": "system", "content": "Be brief."}, {"role": "user", "content": "Hi"}]
+
+
+def test_key_is_stable_and_covers_every_input():
+    key = response_key("chat", MESSAGES, 0, 100)
+    reordered = [{"content": m["content"], "role": m["role"]} for m in MESSAGES]
+    assert response_key("chat", reordered, 0, 100) == key
+    variants = [
+        response_key("other", MESSAGES, 0, 100),
+        response_key("chat", MESSAGES, 0.7, 100),
+        response_key("chat", MESSAGES, 0, None),
+        response_key("chat", MESSAGES[1:], 0, 100),
+    ]
+    assert len({key, *variants}) == 5
+
+
+def test_policy_decides_what_is_cacheable():
+    assert ResponseCache("deterministic").cacheable(0) and not ResponseCache("deterministic").cacheable(0.7)
+    assert ResponseCache("always").cacheable(0.7)
+
+
+def test_entries_expire_after_ttl_in_both_tiers(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ttl_cache.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(response_cache.time, "time", lambda: now[0])
+    path = str(tmp_path / "responses.sqlite")
+    cache = ResponseCache(ttl=10, path=path)
+    cache.put("k", "answer", {"total_tokens": 3})
+    now[0] += 9
+    assert cache.get("k") == ("answer", {"total_tokens": 3})
+    # A fresh process only has the disk tier.
+    assert ResponseCache(ttl=10, path=path).get("k") == ("answer", {"total_tokens": 3})
+    now[0] += 2
+    assert cache.get("k") is None
+    assert ResponseCache(ttl=10, path=path).get("k") is None
+
+
+def test_disabled_unless_configured(monkeypatch):
+    assert get_response_cache() is None
+    monkeypatch.setenv("RESPONSE_CACHE", "off")
+    assert get_response_cache() is None
+
+
+def test_process_cache_is_rebuilt_when_settings_change(tmp_path, monkeypatch):
+    monkeypatch.setenv("RESPONSE_CACHE", "deterministic")
+    monkeypatch.setenv("RESPONSE_CACHE_PATH", "")
+    cache = get_response_cache()
+    assert cache is get_response_cache() and cache.path is None
+    monkeypatch.setenv("RESPONSE_CACHE", "always")
+    assert get_response_cache().policy == "always"
+    monkeypatch.setenv("RESPONSE_CACHE_TTL", "5")
+    assert get_response_cache().ttl == 5
+    monkeypatch.setenv("RESPONSE_CACHE_PATH", str(tmp_path / "r.sqlite"))
+    assert get_response_cache().path == str(tmp_path / "r.sqlite")
+    assert get_response_cache() is not cache
@@ -0,0 +1,90 @@
+import os
+import sys
+
+import pytest
+from qdrant_client.http.models import PointStruct
+
+from session_2.rag import importer
+from session_2.rag.filters import build_filter
+from session_2.rag.sparse_index import SparseIndex, default_sparse_index_path, open_sparse_index, remove_sparse_index
+
+
+def point(pid, text, **payload):
+    return PointStruct(id=pid, vector=[0.0], payload={"text": text, **payload})
+
+
+@pytest.fixture
+def index():
+    index = SparseIndex(":memory:")
+    index.add(
+        [
+            point("a", "The Stormcleaver 300 splits logs", source="tools.md"),
+            point("b", "An axe splits logs and kindling", source="tools.md"),
+            point("c", "Kindling catches fire quickly", source="fire.md"),
+        ]
+    )
+    return index
+
+
+def ids(hits):
+    return [pid for _, pid, _ in hits]
+
+
+def test_exact_terms_rank_first(index):
+    hits = index.search("stormcleaver logs", limit=3)
+    assert ids(hits) == ["a", "b"]
+    assert hits[0][2] == {"text": "The Stormcleaver 300 splits logs", "source": "tools.md"}
+    assert index.search("the and of", limit=3) == []
+
+
+def test_readding_a_point_replaces_its_postings(index):
+    index.add([point("a", "Chainsaw manual")])
+    assert len(index) == 3
+    assert index.search("stormcleaver", limit=3) == []
+    assert ids(index.search("chainsaw", limit=3)) == ["a"]
+
+
+def test_deleted_points_are_not_found(index):
+    index.delete(["b", "missing"])
+    assert len(index) == 2
+    assert ids(index.search("kindling axe", limit=3)) == ["c"]
+
+
+def test_filter_restricts_matches(index):
+    assert ids(index.search("kindling", limit=3, query_filter=build_filter(source="fire.md"))) == ["c"]
+
+
+def test_removed_index_is_not_served_from_the_cache():
+    open_sparse_index("docs", create=True).add([point("a", "kindling")])
+    assert open_sparse_index("docs") is not None
+    assert remove_sparse_index("docs")
+    assert not os.path.exists(default_sparse_index_path("docs"))
+    assert open_sparse_index("docs") is None
+    assert not remove_sparse_index("docs")
+
+
+def run_importer(monkeypatch, *args):
+    monkeypatch.setattr(importer, "_embed_texts", lambda texts: [[1.0] + [0.0] * (importer.EMBEDDING_DIM - 1) for _ in texts])
+    monkeypatch.setattr(sys, "argv", ["importer", "--store", "local:store", "--collection", "docs", *args])
+    importer.main()
+
+
+@pytest.mark.parametrize("second_run", [["--recreate"], ["--incremental"]])
+def test_no_sparse_run_removes_the_outdated_index(tmp_path, monkeypatch, second_run):
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "old.txt").write_text("Stormcleaver 300 splits logs.", encoding="utf-8")
+    run_importer(monkeypatch, "--dir", "data")
+    assert ids(open_sparse_index("docs").search("stormcleaver", limit=3))
+
+    (tmp_path / "data" / "old.txt").unlink()
+    (tmp_path / "data" / "new.txt").write_text("Kindling catches fire.", encoding="utf-8")
+    run_importer(monkeypatch, "--dir", "data", "--no-sparse", *second_run)
+    assert open_sparse_index("docs") is None
+
+
+def test_no_sparse_run_that_changes_nothing_keeps_the_index(tmp_path, monkeypatch):
+    (tmp_path / "data").mkdir()
+    (tmp_path / "data" / "old.txt").write_text("Stormcleaver 300 splits logs.", encoding="utf-8")
+    run_importer(monkeypatch, "--dir", "data")
+    run_importer(monkeypatch, "--dir", "data", "--no-sparse", "--incremental")
+    assert ids(open_sparse_index("docs").search("stormcleaver", limit=3))
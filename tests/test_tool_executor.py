@@ -0,0 +1,126 @@
+import asyncio
+import json
+import threading
+import time
+
+from openai.types.chat.chat_completion_message_tool_call import ChatCompletionMessageToolCall, Function
+
+from session_1.primitives.tool_executor import CachedTool, ToolExecutor, tool_cache_stats
+
+
+def call(name, call_id="c0", **arguments):
+    return ChatCompletionMessageToolCall(
+        id=call_id, type="function", function=Function(name=name, arguments=json.dumps(arguments))
+    )
+
+
+def slow(seconds):
+    time.sleep(seconds)
+    return f"slept {seconds}"
+
+
+def fail():
+    raise ValueError("boom")
+
+
+TOOLS = {"slow": slow, "fail": fail}
+
+
+def test_results_keep_the_order_of_the_calls():
+    calls = [call("slow", "a", seconds=0.2), call("slow", "b", seconds=0.0), call("slow", "c", seconds=0.1)]
+    turn = ToolExecutor(TOOLS).run(calls)
+    assert [r.tool_call_id for r in turn.results] == ["a", "b", "c"]
+    assert [r.content for r in turn.results] == ["slept 0.2", "slept 0.0", "slept 0.1"]
+    assert [m["tool_call_id"] for m in turn.messages()] == ["a", "b", "c"]
+
+
+def test_calls_run_concurrently():
+    turn = ToolExecutor(TOOLS).run([call("slow", str(i), seconds=0.2) for i in range(4)])
+    assert turn.wall_seconds < 0.6
+
+
+def test_timeout_errors_and_unknown_tools_become_error_results():
+    release = threading.Event()
+    executor = ToolExecutor({**TOOLS, "stuck": lambda: release.wait(5)}, timeout=5, timeouts={"stuck": 0.1})
+    try:
+        turn = executor.run([call("stuck", "a"), call("fail", "b"), call("nope", "c"), call("slow", "d", seconds=0)])
+    finally:
+        release.set()
+    stuck, failed, unknown, ok = turn.results
+    assert stuck.error == "timed out after 0.1s" and json.loads(stuck.content) == {"error": stuck.error}
+    assert failed.error == "boom" and "ValueError" in json.loads(failed.content)["error"]
+    assert unknown.error == "unknown tool 'nope'"
+    assert ok.error is None and ok.content == "slept 0"
+
+
+def test_invalid_json_arguments_are_reported():
+    bad = ChatCompletionMessageToolCall(id="x", type="function", function=Function(name="slow", arguments="{oops"))
+    (result,) = ToolExecutor(TOOLS).run([bad]).results
+    assert result.error.startswith("invalid JSON arguments")
+
+
+def test_run_async_awaits_coroutine_tools_and_times_them_out():
+    async def echo(text):
+        await asyncio.sleep(0.05)
+        return text
+
+    async def hang():
+        await asyncio.sleep(5)
+
+    executor = ToolExecutor({**TOOLS, "echo": echo, "hang": hang}, timeouts={"hang": 0.1})
+    turn = asyncio.run(executor.run_async([call("hang", "a"), call("echo", "b", text="hi"), call("slow", "c", seconds=0)]))
+    assert [r.tool_call_id for r in turn.results] == ["a", "b", "c"]
+    assert turn.results[0].error == "timed out after 0.1s"
+    assert [r.content for r in turn.results[1:]] == ["hi", "slept 0"]
+
+
+class Counted:
+    def __init__(self, fail_first=0):
+        self.calls = 0
+        self.fail_first = fail_first
+
+    def __call__(self, item, dimension="all"):
+        self.calls += 1
+        if self.calls <= self.fail_first:
+            raise RuntimeError("flaky")
+        return f"{item}/{dimension}"
+
+
+def test_cached_tool_key_fills_in_defaults():
+    tool = CachedTool(Counted())
+    assert tool.key({"item": "x"}) == tool.key({"dimension": "all", "item": "x"})
+    assert tool.key({"item": "x"}) != tool.key({"item": "x", "dimension": "size"})
+    assert tool.key({"nope": 1}) is None
+
+
+def test_repeated_calls_are_answered_from_the_cache():
+    counted = Counted()
+    executor = ToolExecutor({"lookup": CachedTool(counted)})
+    first = executor.run([call("lookup", "a", item="x")])
+    second = executor.run([call("lookup", "b", item="x", dimension="all")])
+    assert counted.calls == 1
+    assert [r.cached for r in first.results + second.results] == [False, True]
+    assert second.results[0].content == "x/all" and second.cache_hits == 1
+    assert tool_cache_stats(executor.functions)["lookup"]["entries"] == 1
+
+
+def test_identical_calls_in_one_turn_run_once():
+    counted = Counted()
+    executor = ToolExecutor({"lookup": CachedTool(counted)})
+    turn = executor.run([call("lookup", "a", item="x"), call("lookup", "b", item="x"), call("lookup", "c", item="y")])
+    assert counted.calls == 2
+    assert [r.content for r in turn.results] == ["x/all", "x/all", "y/all"]
+    assert [r.cached for r in turn.results] == [False, True, False]
+
+    counted = Counted()
+    executor = ToolExecutor({"lookup": CachedTool(counted)})
+    turn = asyncio.run(executor.run_async([call("lookup", "a", item="x"), call("lookup", "b", item="x")]))
+    assert counted.calls == 1 and [r.cached for r in turn.results] == [False, True]
+
+
+def test_failures_are_not_cached():
+    counted = Counted(fail_first=1)
+    executor = ToolExecutor({"lookup": CachedTool(counted)})
+    assert executor.run([call("lookup", item="x")]).results[0].error == "flaky"
+    assert executor.run([call("lookup", item="x")]).results[0].content == "x/all"
+    assert counted.calls == 2
@@ -0,0 +1,51 @@
+from session_1.primitives import ttl_cache
+from session_1.primitives.ttl_cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ttl_cache.time, "monotonic", clock)
+    cache = TTLCache(10, ttl=5)
+    cache.put("k", "v")
+    clock.now += 4.9
+    assert cache.get("k") == "v"
+    clock.now += 0.2
+    assert cache.get("k", "gone") == "gone"
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_put_refreshes_expiry(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ttl_cache.time, "monotonic", clock)
+    cache = TTLCache(10, ttl=5)
+    cache.put("k", 1)
+    clock.now += 4
+    cache.put("k", 2)
+    clock.now += 4
+    assert cache.get("k") == 2
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_zero_entries_disables_the_cache():
+    cache = TTLCache(0)
+    cache.put("a", 1)
+    assert cache.get("a") is None and len(cache) == 0
@@ -0,0 +1,96 @@
+import threading
+import uuid
+
+import pytest
+from qdrant_client import QdrantClient
+from qdrant_client.http.models import Distance, PointStruct, VectorParams
+
+from session_2.rag.journal import Journal, load_journal
+from session_2.rag.uploader import PointUploader
+
+
+def points(n, start=0):
+    return [
+        PointStruct(
+            id=str(uuid.UUID(int=i + 1)), vector=[1.0, float(i)], payload={"source": "doc.md", "chunk_index": i}
+        )
+        for i in range(start, start + n)
+    ]
+
+
+@pytest.fixture
+def qdrant():
+    client = QdrantClient(location=":memory:")
+    client.create_collection("docs", vectors_config=VectorParams(size=2, distance=Distance.COSINE))
+    calls = []
+    upsert = client.upsert
+
+    def recording_upsert(collection_name, points, wait=True, **kwargs):
+        calls.append((len(points), wait))
+        return upsert(collection_name=collection_name, points=points, wait=wait, **kwargs)
+
+    client.upsert = recording_upsert
+    client.calls = calls
+    return client
+
+
+def count(client):
+    return client.count("docs", exact=True).count
+
+
+def test_points_go_out_in_batches_and_flush_waits_for_the_rest(qdrant):
+    uploader = PointUploader(qdrant, "docs", batch_size=3, workers=2)
+    for start in range(0, 10, 4):
+        uploader.add(points(min(4, 10 - start), start))
+    uploader.flush()
+    assert count(qdrant) == 10 and uploader.uploaded == 10
+    assert sorted(qdrant.calls[:-1]) == [(3, False)] * 3
+    # The barrier: the last batch is sent with wait=True after the others returned.
+    assert qdrant.calls[-1] == (1, True)
+    uploader.close()
+
+
+def test_exact_multiple_still_ends_with_a_waited_batch(qdrant):
+    with PointUploader(qdrant, "docs", batch_size=2, workers=1) as uploader:
+        uploader.add(points(4))
+    assert qdrant.calls == [(2, False), (2, True)]
+    assert count(qdrant) == 4
+
+
+def test_on_uploaded_runs_after_each_upsert_and_feeds_the_journal(qdrant, tmp_path):
+    journal = Journal(str(tmp_path / "docs.journal.jsonl"))
+    journal.start({"collection": "docs"}, recreated=True)
+    seen = []
+    lock = threading.Lock()
+
+    def on_uploaded(batch):
+        ids = [p.id for p in batch]
+        # Every point of the batch is already in the collection.
+        assert len(qdrant.retrieve("docs", ids)) == len(ids)
+        with lock:
+            seen.extend(ids)
+        journal.record_batch(batch)
+
+    with PointUploader(qdrant, "docs", batch_size=2, workers=2, on_uploaded=on_uploaded) as uploader:
+        uploader.add(points(5))
+    assert sorted(seen) == sorted(p.id for p in points(5))
+    state = load_journal(journal.path)
+    assert state.points == {"doc.md": {p.id: p.payload["chunk_index"] for p in points(5)}}
+    journal.close()
+
+
+def test_failing_upsert_is_raised_and_not_reported_as_uploaded(qdrant):
+    upsert = qdrant.upsert
+
+    def failing_upsert(collection_name, points, wait=True, **kwargs):
+        if points[0].payload["chunk_index"] == 2:
+            raise RuntimeError("qdrant down")
+        return upsert(collection_name, points, wait, **kwargs)
+
+    qdrant.upsert = failing_upsert
+    uploaded = []
+    with pytest.raises(RuntimeError, match="qdrant down"):
+        with PointUploader(qdrant, "docs", batch_size=2, workers=1, on_uploaded=uploaded.extend) as uploader:
+            uploader.add(points(5))
+    # The failure stops the flush before the final batch goes out.
+    assert [p.payload["chunk_index"] for p in uploaded] == [0, 1]